@@ -0,0 +1,16 @@
+from .backends import (
+    InferenceBackend,
+    NumpyBackend,
+    OnnxBackend,
+    available_backends,
+    zscore,
+    intensity_window,
+    parse_normalization,
+    parse_patch_size,
+)
+
+from .sliding_window import (
+    gaussian_importance_map,
+    window_starts,
+    sliding_window_inference,
+)
@@ -0,0 +1,154 @@
+import numpy as np
+
+try:  # optional: ONNX models run only when onnxruntime is installed
+    import onnxruntime
+except ImportError:
+    onnxruntime = None
+
+
+def sigmoid(scores: np.ndarray):
+    return 0.5 * (1.0 + np.tanh(0.5 * scores))  # no overflow for large logits
+
+
+def softmax(scores: np.ndarray, axis=1):
+    scores = np.exp(scores - scores.max(axis=axis, keepdims=True))
+    return scores / scores.sum(axis=axis, keepdims=True)
+
+
+class InferenceBackend:
+    """
+    A segmentation model for sliding_window_inference. predict() maps a float32 batch of patches
+    (n, 1, z, y, x) to class probabilities (n, classes, z, y, x); patch_size is the (z, y, x)
+    patch the model takes (z = 1 for 2D models) and max_batch_size the largest batch it accepts.
+    """
+    name = 'backend'
+    patch_size = (1, 128, 128)
+    max_batch_size = None  # no limit
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+
+class NumpyBackend(InferenceBackend):
+    """
+    Reference model in plain NumPy: foreground (class 1) is the intensity above threshold, as a
+    probability that rises over `scale` intensity units. Needs no model file, so the tiling,
+    blending and streaming can be checked against a plain threshold of the volume.
+    """
+    name = 'numpy'
+
+    def __init__(self, threshold=0.0, scale=1.0, patch_size=(16, 64, 64)):
+        self.threshold = threshold
+        self.scale = scale
+        self.patch_size = tuple(patch_size)
+
+    def predict(self, batch):
+        foreground = sigmoid((batch - self.threshold) / self.scale)
+        return np.concatenate((1.0 - foreground, foreground), axis=1).astype(np.float32)
+
+
+def zscore(batch: np.ndarray):
+    """Each patch scaled to zero mean and unit variance."""
+    axes = tuple(range(1, batch.ndim))
+    mean = batch.mean(axis=axes, keepdims=True)
+    std = batch.std(axis=axes, keepdims=True)
+    return (batch - mean) / np.maximum(std, 1e-6)
+
+
+def intensity_window(low, high):
+    """Normalization clipping intensities to [low, high] (e.g. an HU window) and scaling them to [0, 1]."""
+    def normalize(batch: np.ndarray):
+        return (np.clip(batch, low, high) - low) / float(high - low)
+    return normalize
+
+
+def parse_normalization(spec):
+    """
+    Normalization named by spec: 'none' (raw intensities), 'zscore' or 'window:<low>,<high>'
+    (intensity_window). Raises ValueError for anything else.
+    """
+    spec = (spec or 'none').strip().lower()
+    if spec == 'none':
+        return None
+    if spec == 'zscore':
+        return zscore
+    if spec.startswith('window:'):
+        low, high = (float(value) for value in spec[len('window:'):].split(','))
+        if high <= low:
+            raise ValueError(f"Empty intensity window: {spec}")
+        return intensity_window(low, high)
+    raise ValueError(f"Unknown normalization: {spec}")
+
+
+def parse_patch_size(spec):
+    """(z, y, x) patch size from 'z,y,x' or, for 2D models, 'y,x'. Raises ValueError if malformed."""
+    try:
+        size = tuple(int(value) for value in str(spec).split(','))
+    except ValueError:
+        size = ()
+    if len(size) not in (2, 3) or min(size) < 1:
+        raise ValueError(f"Patch size must be 'z,y,x' or 'y,x' positive integers: {spec}")
+    return size if len(size) == 3 else (1, *size)
+
+
+class OnnxBackend(InferenceBackend):
+    """
+    ONNX model on the ONNX Runtime CPU provider. The model takes (n, 1, z, y, x) or, for 2D
+    models, (n, 1, y, x) float32 input and returns class logits; a single output channel is a
+    foreground logit. A fixed input shape gives the patch size; dynamic axes take patch_size.
+    Patches hold the raw intensities (HU for CT) unless normalize maps each batch to what the
+    model was trained on, e.g. zscore or intensity_window(-1000, 1000).
+    Without arguments, patch_size and normalize come from the model's metadata_props when it
+    has them: 'patch_size' ('z,y,x' or 'y,x') and 'normalize' (see parse_normalization).
+    """
+    name = 'onnx'
+
+    def __init__(self, model_path, patch_size=None, threads=0, normalize=None):
+        if onnxruntime is None:
+            raise RuntimeError("onnxruntime is not installed; run 'pip install onnxruntime' to use ONNX models.")
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = threads  # 0: one per core
+        self.session = onnxruntime.InferenceSession(str(model_path), sess_options=options,
+                                                    providers=['CPUExecutionProvider'])
+        self.metadata = dict(self.session.get_modelmeta().custom_metadata_map)
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        self.spatial_dims = len(model_input.shape) - 2
+        fixed = [size if isinstance(size, int) else None for size in model_input.shape]
+        self.max_batch_size = fixed[0]
+        self.fixed_patch_size = fixed[2:]  # None for dynamic axes
+        if patch_size is None:
+            patch_size = parse_patch_size(self.metadata.get('patch_size', '1,256,256'))
+        self.set_patch_size(patch_size)
+        if normalize is None:
+            normalize = parse_normalization(self.metadata.get('normalize'))
+        self.normalize = normalize
+
+    @property
+    def dynamic_patch_size(self):
+        """True if the model input has a dynamic spatial axis, whose size set_patch_size chooses."""
+        return None in self.fixed_patch_size
+
+    def set_patch_size(self, patch_size):
+        """Use patch_size (z, y, x) for the dynamic spatial axes; fixed axes keep the model's size."""
+        default = tuple(patch_size)[-self.spatial_dims:]
+        spatial = tuple(size or fallback for size, fallback in zip(self.fixed_patch_size, default))
+        self.patch_size = spatial if self.spatial_dims == 3 else (1, *spatial)
+
+    def predict(self, batch):
+        if self.normalize is not None:
+            batch = self.normalize(batch)
+        if self.spatial_dims == 2:
+            batch = batch[:, :, 0]
+        scores = self.session.run(None, {self.input_name: np.ascontiguousarray(batch, dtype=np.float32)})[0]
+        if self.spatial_dims == 2:
+            scores = scores[:, :, None]
+        if scores.shape[1] == 1:
+            foreground = sigmoid(scores)
+            return np.concatenate((1.0 - foreground, foreground), axis=1)
+        return softmax(scores, axis=1)
+
+
+def available_backends():
+    """Names of the backends that can run here."""
+    return ['numpy'] + (['onnx'] if onnxruntime is not None else [])
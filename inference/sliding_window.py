@@ -0,0 +1,98 @@
+import numpy as np
+from utils import LoadCancelled
+from interactors.segmentation.rasterizer import label_dtype
+
+
+def gaussian_importance_map(patch_size, sigma_scale=0.125):
+    """
+    Weights of a patch's predictions for blending: a Gaussian around the patch centre (sigma a
+    fraction of the patch size), so overlapping windows hand over smoothly and the less reliable
+    patch borders count least. Zeros are raised to the smallest weight; every voxel counts a bit.
+    """
+    weights = np.ones((), dtype=np.float64)
+    for size in patch_size:
+        coordinates = np.arange(size) - (size - 1) / 2.0
+        sigma = max(size * sigma_scale, 1e-6)
+        weights = np.multiply.outer(weights, np.exp(-0.5 * (coordinates / sigma) ** 2))
+    weights /= weights.max()
+    weights[weights == 0] = weights[weights > 0].min()
+    return weights.astype(np.float32)
+
+
+def window_starts(size, patch, overlap):
+    """Evenly spread start indices of windows of length patch over [0, size), overlapping by at least `overlap`."""
+    if size <= patch:
+        return [0]
+    step = max(int(patch * (1.0 - overlap)), 1)
+    count = int(np.ceil((size - patch) / step)) + 1
+    return np.round(np.linspace(0, size - patch, count)).astype(int).tolist()
+
+
+def sliding_window_inference(volume: np.ndarray, backend, overlap=0.5, batch_size=4, progress_callback=None,
+                             cancel_event=None, partial_callback=None):
+    """
+    (z, y, x) label volume (argmax over classes) of a model run on overlapping patches of volume,
+    their class probabilities blended with gaussian_importance_map. Patches are passed to the
+    backend batch_size at a time. Windows run slab by slab along z; only the slab of slices the
+    current windows cover is held (classes x patch depth x y x x), and the slices no later window
+    reaches are final and handed to partial_callback(first slice index, labels) right away.
+    progress_callback(done, total) counts windows; cancel_event raises LoadCancelled.
+    """
+    depth, rows, columns = volume.shape
+    patch_size = backend.patch_size
+    if backend.max_batch_size:
+        batch_size = min(batch_size, backend.max_batch_size)
+    # volumes smaller than a patch are padded to it; the labels are cropped back
+    padding = [(0, max(patch - size, 0)) for patch, size in zip(patch_size, volume.shape)]
+    if any(after for _, after in padding):
+        volume = np.pad(volume, padding, mode='edge')
+    padded_shape = volume.shape
+    patch_depth, patch_rows, patch_columns = patch_size
+
+    importance = gaussian_importance_map(patch_size)
+    z_starts = window_starts(padded_shape[0], patch_depth, overlap)
+    plane_windows = [(y, x) for y in window_starts(padded_shape[1], patch_rows, overlap)
+                     for x in window_starts(padded_shape[2], patch_columns, overlap)]
+    total = len(z_starts) * len(plane_windows)
+
+    labels = None
+    scores = None  # blended probabilities of the slab [slab_start, slab_start + patch_depth)
+    slab_start = 0
+    done = 0
+
+    def finish(stop):
+        """Labels of slices [slab_start, stop); no window is left that reaches them."""
+        nonlocal labels
+        stop = min(stop, depth)
+        if stop <= slab_start:
+            return
+        if labels is None:
+            labels = np.zeros((depth, rows, columns), dtype=label_dtype(len(scores) - 1))
+        # dividing by the summed weights would not change the argmax: it is the same for every class
+        np.argmax(scores[:, :stop - slab_start, :rows, :columns], axis=0, out=labels[slab_start:stop])
+        if partial_callback:
+            partial_callback(slab_start, labels[slab_start:stop].copy())
+
+    for z in z_starts:
+        if scores is not None and z > slab_start:
+            finish(z)
+            shifted = np.zeros_like(scores)
+            shifted[:, :patch_depth - (z - slab_start)] = scores[:, z - slab_start:]
+            scores = shifted
+        slab_start = z
+        for batch_start in range(0, len(plane_windows), batch_size):
+            if cancel_event is not None and cancel_event.is_set():
+                raise LoadCancelled()
+            windows = plane_windows[batch_start:batch_start + batch_size]
+            batch = np.stack([volume[z:z + patch_depth, y:y + patch_rows, x:x + patch_columns]
+                              for y, x in windows])[:, None].astype(np.float32)
+            probabilities = backend.predict(batch)
+            if scores is None:
+                scores = np.zeros((probabilities.shape[1], patch_depth, *padded_shape[1:]), dtype=np.float32)
+            for (y, x), window_probabilities in zip(windows, probabilities):
+                scores[:, :, y:y + patch_rows, x:x + patch_columns] += window_probabilities * importance
+            done += len(windows)
+            if progress_callback:
+                progress_callback(done, total)
+    finish(depth)
+    return labels
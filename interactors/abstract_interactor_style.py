@@ -1,6 +1,9 @@
+import logging
 from vtkmodules.all import vtkInteractorStyleImage
 from PySide6.QtCore import QObject, Signal
 
+logger = logging.getLogger(__name__)
+
 
 class InteractionSignal(QObject):
     interactionOccurred = Signal()
@@ -32,30 +35,23 @@ class AbstractInteractorStyle(vtkInteractorStyleImage):
         self.middle_button_down = False
         self.pan_active = False
         self.last_pos = None
-        self.widgets_by_slice = {} # widgets on per slice.
 
     def update_slice(self):
         """
-        Update the visibility of measurements when the slice changes.
+        Update the visibility of measurements when the slice changes. Widgets are registered per
+        slice in the viewer's AnnotationRegistry, so only the outgoing and incoming slices' widgets
+        are touched (ImageViewer2D.set_slice does this already).
         """
-        current_slice = self.image_viewer.GetSlice()
-        print(f"Updating ruler visibility for slice: {current_slice}")
-
-        # Show/hide widgets based on slice
-        # widgets = self.widgets_by_slice.values()
-
-        for slice, widgets in self.widgets_by_slice.items():
-            if slice == current_slice:
-                for widget in widgets:
-                    if hasattr(widget, 'measurement_slice'):
-                        widget.On()
-            else:
-                for widget in widgets:
-                    if hasattr(widget, 'measurement_slice'):
-                        widget.Off()
+        current_slice = self.image_viewer.get_slice()
+        logger.debug("Updating annotation visibility for slice: %d", current_slice)
+        self.image_viewer.annotations.show(self.image_viewer.slice_axis(), current_slice)
 
         # Render to update the display
-        self.image_viewer.GetRenderWindow().Render()
+        self.image_viewer.request_render()
+
+    def add_annotation(self, widget):
+        """Tie a measurement/contour widget to the displayed slice; it is hidden on other slices."""
+        self.image_viewer.annotations.add(widget, self.image_viewer.slice_axis(), self.image_viewer.get_slice())
 
     def on_left_button_press(self, obj, event):
         self.left_button_down = True
@@ -124,13 +120,14 @@ class AbstractInteractorStyle(vtkInteractorStyleImage):
             # step = 1 if dy > 0 else -1 if dy < 0 else 0  # determine increase/decrease slice
             step = round(dy / basis_slice_change)  # determine increase/decrease slice
 
-            next_slice = self.image_viewer.GetSlice() + step
+            next_slice = self.image_viewer.get_slice() + step
             max_slice = self.image_viewer.get_count_of_slices()
 
             if 0 <= next_slice < max_slice:  # if slice valid
-                self.image_viewer.SetSlice(next_slice)
+                if self.image_viewer.prefetcher is not None:  # warm the slices ahead of the drag
+                    self.image_viewer.prefetcher.on_slice_request(next_slice)
+                self.image_viewer.set_slice(next_slice)  # renders
 
-            self.image_viewer.Render()
             self.last_pos = current_pos
 
     def change_window_level_with_right_click(self):
@@ -152,7 +149,7 @@ class AbstractInteractorStyle(vtkInteractorStyleImage):
         new_window_width = window + new_x
 
         self.image_viewer.set_window_level(new_window_width, new_window_center)
-        self.image_viewer.Render()
+        self.image_viewer.request_render()
 
         self.last_pos = current_pos
 
@@ -170,7 +167,7 @@ class AbstractInteractorStyle(vtkInteractorStyleImage):
             zoom_factor = 1 / (1 + abs(dy) * zoom_sensitivity)
 
         camera.Zoom(zoom_factor)
-        self.image_viewer.Render()
+        self.image_viewer.request_render()
 
         self.last_pos = current_pos
 
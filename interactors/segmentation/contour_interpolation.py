@@ -0,0 +1,111 @@
+import numpy as np
+import SimpleITK as sitk
+from utils import LoadCancelled
+from interactors.segmentation.label_store import LabelStore, encode_runs, decode_runs, combine_runs
+
+
+def signed_distance(mask: np.ndarray, spacing=(1.0, 1.0)):
+    """
+    Signed Euclidean distance (mm) to the outline of a 2D (rows, columns) mask, negative inside.
+    Maurer's map is 0 on the inner border pixels; shifting it by half a pixel puts the outline
+    between the inside and outside pixels, so blending a mask with itself gives back the mask.
+    """
+    image = sitk.GetImageFromArray(mask.astype(np.uint8))
+    image.SetSpacing(tuple(float(value) for value in spacing))
+    distance = sitk.SignedMaurerDistanceMap(image, insideIsPositive=False, squaredDistance=False,
+                                            useImageSpacing=True)
+    return sitk.GetArrayFromImage(distance) - 0.5 * min(spacing)
+
+
+def _bounding_box(masks, margin=1):
+    """(row_slice, column_slice) around the True pixels of all masks, grown by margin and clipped."""
+    occupied = np.logical_or.reduce(masks)
+    rows, columns = np.flatnonzero(occupied.any(axis=1)), np.flatnonzero(occupied.any(axis=0))
+    height, width = occupied.shape
+    return (slice(max(rows[0] - margin, 0), min(rows[-1] + margin + 1, height)),
+            slice(max(columns[0] - margin, 0), min(columns[-1] + margin + 1, width)))
+
+
+def interpolate_gap(mask_a, mask_b, start_index, end_index, spacing=(1.0, 1.0), chunk_slices=32):
+    """
+    Shape-based interpolation between two key slices: the signed distance maps of mask_a (at
+    start_index) and mask_b (at end_index) are computed once over their common bounding box and
+    blended linearly for the slices in between, chunk_slices at a time; the blend is negative inside.
+    Yields (slice indices, (row_slice, column_slice), (n, rows, columns) masks) per chunk.
+    """
+    row_slice, column_slice = _bounding_box((mask_a, mask_b))
+    distance_a = signed_distance(mask_a[row_slice, column_slice], spacing)
+    distance_b = signed_distance(mask_b[row_slice, column_slice], spacing)
+    for chunk_start in range(start_index + 1, end_index, chunk_slices):  # bounds the blended stack's memory
+        gap_indices = range(chunk_start, min(chunk_start + chunk_slices, end_index))
+        weights = ((np.asarray(gap_indices, dtype=np.float32) - start_index) / (end_index - start_index))[:, None, None]
+        yield gap_indices, (row_slice, column_slice), distance_a * (1.0 - weights) + distance_b * weights < 0
+
+
+def key_planes(slices, shape, axis=2):
+    """
+    Sorted indices along axis of the planes a label ({slice index: runs}) occupies. A contour
+    fills one plane across the axis it was drawn on, so these are the label's key planes.
+    """
+    if axis == 2:
+        return sorted(slices)
+    occupied = np.zeros(shape[2 - axis], dtype=bool)  # axis 1: rows (y), axis 0: columns (x)
+    for runs in slices.values():
+        mask = decode_runs(runs, np.zeros(shape[1:], dtype=bool))
+        occupied |= mask.any(axis=1) if axis == 1 else mask.any(axis=0)
+    return np.flatnonzero(occupied).tolist()
+
+
+def interpolate_labels(label_slices, shape, spacing=(1.0, 1.0, 1.0), label_axes=None, chunk_slices=32,
+                       progress_callback=None, cancel_event=None):
+    """
+    Fill the planes between the key planes of every label. label_slices is a snapshot
+    {label: {slice index: runs}} of a LabelStore; label_axes maps a label to the axis its contours
+    were drawn on (2 axial, the default; 0 sagittal, 1 coronal) and the planes it occupies across
+    that axis are its key planes (see key_planes). spacing is the (x, y, z) voxel spacing. The
+    result is a LabelStore of shape (z, y, x) holding only the filled voxels, to be previewed and
+    merged. progress_callback(done, total) counts planes; cancel_event raises LoadCancelled.
+    """
+    label_axes = label_axes or {}
+    result = LabelStore(shape)
+    gaps = []
+    for label, slices in label_slices.items():
+        axis = label_axes.get(label, 2)
+        key_indices = key_planes(slices, shape, axis)
+        gaps.extend((label, axis, start, end) for start, end in zip(key_indices, key_indices[1:]) if end - start > 1)
+    total = sum(end - start - 1 for _, _, start, end in gaps)
+
+    done = 0
+    for label, axis, start, end in gaps:
+        if axis == 2:
+            plane_spacing = spacing[:2]  # (columns, rows) of the plane, as SimpleITK orders them
+            mask_a = decode_runs(label_slices[label][start], np.zeros(shape[1:], dtype=bool))
+            mask_b = decode_runs(label_slices[label][end], np.zeros(shape[1:], dtype=bool))
+        else:
+            plane_spacing = (spacing[1 - axis], spacing[2])  # sagittal (y, z), coronal (x, z)
+            label_store = LabelStore(shape)
+            label_store.slices = {label: label_slices[label]}
+            mask_a = label_store.decode_plane(axis, start) > 0
+            mask_b = label_store.decode_plane(axis, end) > 0
+        for gap_indices, (row_slice, column_slice), masks in interpolate_gap(mask_a, mask_b, start, end,
+                                                                             plane_spacing, chunk_slices):
+            if cancel_event is not None and cancel_event.is_set():
+                raise LoadCancelled()
+            if axis == 2:
+                for slice_index, mask in zip(gap_indices, masks):
+                    result.set_runs(label, slice_index,
+                                    encode_runs(mask, row_slice.start, column_slice.start, shape[2]))
+            else:
+                # plane rows are axial slices: each slice gets the rows (coronal) or columns (sagittal)
+                # of the chunk's planes, next to those of earlier chunks
+                for row, slice_index in enumerate(range(row_slice.start, row_slice.stop)):
+                    if axis == 1:
+                        runs = encode_runs(masks[:, row], gap_indices[0], column_slice.start, shape[2])
+                    else:
+                        runs = encode_runs(masks[:, row].T, column_slice.start, gap_indices[0], shape[2])
+                    result.set_runs(label, slice_index,
+                                    combine_runs(result.get_runs(label, slice_index), runs, 'union'))
+            done += len(gap_indices)
+            if progress_callback:
+                progress_callback(done, total)
+    return result
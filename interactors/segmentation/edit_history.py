@@ -0,0 +1,120 @@
+import zlib
+from collections import deque
+from contextlib import contextmanager
+import numpy as np
+from interactors.segmentation.label_store import combine_runs
+
+
+def compress_runs(runs: np.ndarray):
+    """zlib stream of the run offsets as differences (small, repetitive numbers compress well)."""
+    return zlib.compress(np.diff(runs.ravel(), prepend=0).astype(np.int32).tobytes(), 1)
+
+
+def decompress_runs(data):
+    return np.cumsum(np.frombuffer(zlib.decompress(data), dtype=np.int32), dtype=np.int32).reshape(-1, 2)
+
+
+class EditHistory:
+    """
+    Undo / redo of the edits of a LabelStore, which reports every change to it (see record).
+    An operation (one tool action, e.g. filling a contour or accepting an interpolation) keeps
+    only its changed voxels: per touched slice the XOR of the runs before and after, compressed.
+    XOR-ing it into the store again undoes the operation and once more redoes it, so both take
+    O(changed runs) whatever the volume size. memory_limit bounds the compressed bytes of all
+    operations; the oldest are dropped first (the latest one is always kept).
+    """
+
+    def __init__(self, label_store, memory_limit=64 * 1024 * 1024):
+        self.label_store = label_store
+        label_store.edit_history = self
+        self.memory_limit = memory_limit
+        self.undo_stack = deque()  # (description, [(label, slice index, compressed XOR runs)])
+        self.redo_stack = []
+        self.nbytes = 0  # compressed bytes on both stacks
+        self.current = None  # (description, {(label, slice index): XOR runs}) of the open operation
+        self.depth = 0
+        self.replaying = False
+
+    @contextmanager
+    def operation(self, description='Edit'):
+        """Group the changes made inside into one undo step; nested operations join the outer one."""
+        if self.depth == 0:
+            self.current = (description, {})
+        self.depth += 1
+        try:
+            yield
+        finally:
+            self.depth -= 1
+            if self.depth == 0:
+                operation, self.current = self.current, None
+                self.push(operation)
+
+    def record(self, label, slice_index, changed_runs):
+        """The label store reports a change as its XOR runs; a change outside operation() is a step of its own."""
+        if self.replaying:
+            return
+        if self.current is None:
+            self.push(('Edit', {(label, slice_index): changed_runs}))
+            return
+        changes = self.current[1]
+        previous = changes.get((label, slice_index))
+        changes[(label, slice_index)] = (changed_runs if previous is None
+                                         else combine_runs(previous, changed_runs, 'xor'))
+
+    def push(self, operation):
+        description, changes = operation
+        compressed = [(label, slice_index, compress_runs(runs))
+                      for (label, slice_index), runs in changes.items() if len(runs)]
+        if not compressed:
+            return
+        for redo_operation in self.redo_stack:  # a new edit ends the redo branch
+            self.nbytes -= self.operation_nbytes(redo_operation)
+        self.redo_stack.clear()
+        self.undo_stack.append((description, compressed))
+        self.nbytes += self.operation_nbytes(self.undo_stack[-1])
+        while self.nbytes > self.memory_limit and len(self.undo_stack) > 1:
+            self.nbytes -= self.operation_nbytes(self.undo_stack.popleft())
+
+    @staticmethod
+    def operation_nbytes(operation):
+        return sum(len(data) for _, _, data in operation[1])
+
+    def apply(self, operation):
+        label_store = self.label_store
+        self.replaying = True
+        try:
+            for label, slice_index, data in operation[1]:
+                changed = decompress_runs(data)
+                runs = combine_runs(label_store.get_runs(label, slice_index), changed, 'xor')
+                label_store.set_runs(label, slice_index, runs, changed)
+        finally:
+            self.replaying = False
+
+    def undo(self):
+        """Revert the latest operation. Returns its description, None if there is nothing to undo."""
+        if not self.undo_stack:
+            return None
+        operation = self.undo_stack.pop()
+        self.apply(operation)
+        self.redo_stack.append(operation)
+        return operation[0]
+
+    def redo(self):
+        """Repeat the latest undone operation. Returns its description, None if there is nothing to redo."""
+        if not self.redo_stack:
+            return None
+        operation = self.redo_stack.pop()
+        self.apply(operation)
+        self.undo_stack.append(operation)
+        return operation[0]
+
+    def can_undo(self):
+        return bool(self.undo_stack)
+
+    def can_redo(self):
+        return bool(self.redo_stack)
+
+    def clear(self):
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+        self.nbytes = 0
@@ -0,0 +1,300 @@
+from collections import deque
+from contextlib import nullcontext
+import numpy as np
+from interactors.segmentation.rasterizer import label_dtype
+
+
+# predicates on the combined state code (1 inside a, 2 inside b) for combine()
+OPERATIONS = {
+    'union': lambda code: code != 0,
+    'intersection': lambda code: code == 3,
+    'difference': lambda code: code == 1,
+    'xor': lambda code: (code == 1) | (code == 2),
+}
+
+EMPTY_RUNS = np.zeros((0, 2), dtype=np.int32)
+
+CHANGE_LOG_LENGTH = 4096  # changes kept for LabelStore.changes_since; older readers refresh fully
+
+
+def encode_runs(mask: np.ndarray, row_offset=0, column_offset=0, columns=None):
+    """
+    Run-length encoding of a boolean (rows, columns) mask as an (n, 2) int32 array of [start, end)
+    offsets into the flattened slice. The mask may be a bounding box at (row_offset, column_offset)
+    of a slice `columns` wide; runs touching across row ends are merged, so the encoding is unique.
+    """
+    rows, width = mask.shape
+    columns = width if columns is None else columns
+    if mask.size == 0:
+        return EMPTY_RUNS
+    padded = np.zeros((rows, width + 2), dtype=np.int8)
+    padded[:, 1:-1] = mask
+    changes = np.diff(padded, axis=1)
+    start_rows, start_columns = np.nonzero(changes == 1)
+    end_rows, end_columns = np.nonzero(changes == -1)
+    starts = (start_rows + row_offset) * columns + start_columns + column_offset
+    ends = (end_rows + row_offset) * columns + end_columns + column_offset
+    if len(starts) > 1:
+        keep = np.ones(len(starts), dtype=bool)
+        keep[1:] = starts[1:] != ends[:-1]  # a run reaching the row end continues on the next row
+        starts, ends = starts[keep], ends[np.append(keep[1:], True)]
+    return np.stack((starts, ends), axis=1).astype(np.int32)
+
+
+def decode_runs(runs: np.ndarray, out: np.ndarray, value=True):
+    """Write value into the flattened view of out inside runs."""
+    flat = out.reshape(-1)
+    if len(runs) < 4096:  # slice assignments; a cumulative sum pays off only for very fragmented masks
+        for start, end in runs.tolist():
+            flat[start:end] = value
+        return out
+    toggles = np.zeros(flat.size + 1, dtype=np.int8)
+    toggles[runs[:, 0]] += 1
+    toggles[runs[:, 1]] -= 1
+    flat[np.cumsum(toggles[:-1], dtype=np.int8).view(bool)] = value
+    return out
+
+
+def clip_runs(runs: np.ndarray, start, stop):
+    """The parts of runs inside flat offsets [start, stop), relative to start."""
+    first = np.searchsorted(runs[:, 1], start, side='right')
+    last = np.searchsorted(runs[:, 0], stop, side='left')
+    return np.clip(runs[first:last], start, stop) - start
+
+
+def combine_runs(runs_a: np.ndarray, runs_b: np.ndarray, operation):
+    """Set operation ('union', 'intersection', 'difference' a - b, 'xor') on two run encodings."""
+    positions = np.concatenate((runs_a[:, 0], runs_a[:, 1], runs_b[:, 0], runs_b[:, 1]))
+    if len(positions) == 0:
+        return EMPTY_RUNS
+    deltas = np.concatenate((np.full(len(runs_a), 1), np.full(len(runs_a), -1),
+                             np.full(len(runs_b), 2), np.full(len(runs_b), -2)))
+    order = np.argsort(positions, kind='stable')
+    positions, deltas = positions[order], deltas[order]
+    boundaries = np.flatnonzero(np.diff(positions)) + 1
+    unique_positions = positions[np.concatenate(([0], boundaries))]
+    code = np.cumsum(np.add.reduceat(deltas, np.concatenate(([0], boundaries))))  # state right of each position
+
+    inside = OPERATIONS[operation](code).astype(np.int8)
+    changes = np.diff(np.concatenate(([0], inside)))
+    starts = unique_positions[changes == 1]
+    ends = unique_positions[changes == -1]
+    return np.stack((starts, ends), axis=1).astype(np.int32)
+
+
+class LabelStore:
+    """
+    Segmentation labels of a (z, y, x) volume as run-length encoded axial slices: label ->
+    {slice index: (n, 2) int32 runs}. Memory follows the segmented area's outline rather than
+    the volume size, so dozens of labels on a large CT cost kilobytes to a few megabytes, and
+    empty slices cost nothing. Slices decode in O(runs) for display; set operations work on the
+    runs directly; dense arrays are only built by to_dense().
+    Labels may overlap; decode_slice paints higher label IDs over lower ones.
+    """
+
+    def __init__(self, shape):
+        self.shape = tuple(shape)  # (z, y, x)
+        self.slices = {}  # label -> {slice_index: runs}
+        self.version = 0  # bumped by every change (e.g. to invalidate decoded overlays)
+        self.changes = deque(maxlen=CHANGE_LOG_LENGTH)  # (version, slice index or None for all, first row, last row)
+        self.edit_history = None  # EditHistory recording the changes, if any
+
+    def labels(self):
+        return sorted(self.slices)
+
+    def max_label(self):
+        return max(self.slices, default=0)
+
+    def slice_indices(self, label):
+        return sorted(self.slices.get(label, ()))
+
+    def get_runs(self, label, slice_index):
+        return self.slices.get(label, {}).get(slice_index, EMPTY_RUNS)
+
+    def set_runs(self, label, slice_index, runs, changed=None):
+        """The label's runs on a slice; changed, the XOR with the current runs, may be passed if known."""
+        if changed is None:
+            changed = combine_runs(self.get_runs(label, slice_index), runs, 'xor')
+        if not len(changed):
+            return
+        label_slices = self.slices.setdefault(label, {})
+        if len(runs):
+            label_slices[slice_index] = runs
+        else:
+            label_slices.pop(slice_index, None)
+            if not label_slices:
+                del self.slices[label]
+        if self.edit_history is not None:
+            self.edit_history.record(label, slice_index, changed)
+        columns = self.shape[2]
+        self.log_change(slice_index, int(changed[0, 0]) // columns, (int(changed[-1, 1]) - 1) // columns)
+
+    def edit(self, description='Edit'):
+        """Context grouping the changes made inside into one undo step of edit_history, if there is one."""
+        if self.edit_history is None:
+            return nullcontext()
+        return self.edit_history.operation(description)
+
+    def log_change(self, slice_index=None, first_row=0, last_row=None):
+        """Bump the version and record the changed rows of a slice (slice_index None: everything changed)."""
+        self.version += 1
+        self.changes.append((self.version, slice_index, first_row,
+                             self.shape[1] - 1 if last_row is None else last_row))
+
+    def changes_since(self, version):
+        """
+        [(slice index, first row, last row)] changed after version, for redrawing only those rows;
+        a slice index of None means all slices. None if the change log no longer reaches back that far.
+        """
+        if version == self.version:
+            return []
+        if not self.changes or self.changes[0][0] > version + 1:
+            return None
+        first = version + 1 - self.changes[0][0]  # one entry per version
+        return [change[1:] for change in list(self.changes)[first:]]
+
+    def set_slice(self, label, slice_index, mask, row_slice=slice(None), column_slice=slice(None)):
+        """The label's mask on axial slice slice_index; mask may cover only row_slice/column_slice of it."""
+        row_offset = row_slice.start or 0
+        column_offset = column_slice.start or 0
+        self.set_runs(label, slice_index, encode_runs(mask, row_offset, column_offset, self.shape[2]))
+
+    def set_plane(self, label, axis, index, mask):
+        """
+        The label's mask on a plane across the volume: axis 2 is an axial slice (y, x); axis 0 a
+        sagittal plane (z, y) and axis 1 a coronal plane (z, x), which update one column / row of
+        every axial slice.
+        """
+        if axis == 2:
+            self.set_slice(label, index, mask)
+            return
+        with self.edit():
+            for slice_index in range(self.shape[0]):
+                slice_mask = self.get_slice(label, slice_index)
+                if axis == 0:
+                    slice_mask[:, index] = mask[slice_index]
+                else:
+                    slice_mask[index, :] = mask[slice_index]
+                self.set_slice(label, slice_index, slice_mask)
+
+    def get_slice(self, label, slice_index):
+        """Boolean (y, x) mask of the label on axial slice slice_index."""
+        return decode_runs(self.get_runs(label, slice_index), np.zeros(self.shape[1:], dtype=bool))
+
+    def decode_slice(self, slice_index, out=None, labels=None, rows=None):
+        """
+        (y, x) label image of axial slice slice_index (0 = background) for display, into out if
+        given; rows=(start, stop) decodes only those rows.
+        """
+        start, stop = (0, self.shape[1]) if rows is None else rows
+        columns = self.shape[2]
+        if out is None:
+            out = np.zeros((stop - start, columns), dtype=label_dtype(self.max_label()))
+        else:
+            out[:] = 0
+        for label in (self.labels() if labels is None else sorted(labels)):
+            runs = self.get_runs(label, slice_index)
+            if rows is not None:
+                runs = clip_runs(runs, start * columns, stop * columns)
+            decode_runs(runs, out, label)
+        return out
+
+    def decode_plane(self, axis, index, out=None, rows=None):
+        """
+        Label image of a plane for display: axis 2 an axial (y, x) slice, axis 0 a sagittal (z, y)
+        and axis 1 a coronal (z, x) plane; rows=(start, stop) decodes only those rows of it.
+        Off-axial planes look up one line of positions in the runs of every labelled slice
+        (a binary search), without decoding the slices.
+        """
+        if axis == 2:
+            return self.decode_slice(index, out, rows=rows)
+        depth, volume_rows, columns = self.shape
+        start, stop = (0, depth) if rows is None else rows
+        if axis == 0:
+            positions = np.arange(volume_rows) * columns + index
+        else:
+            positions = index * columns + np.arange(columns)
+        if out is None:
+            out = np.zeros((stop - start, len(positions)), dtype=label_dtype(self.max_label()))
+        else:
+            out[:] = 0
+        for label in self.labels():
+            for slice_index, runs in self.slices[label].items():
+                if not start <= slice_index < stop:
+                    continue
+                run_index = np.searchsorted(runs[:, 0], positions, side='right') - 1
+                inside = (run_index >= 0) & (positions < runs[np.maximum(run_index, 0), 1])
+                out[slice_index - start][inside] = label
+        return out
+
+    def combine(self, operation, label_a, label_b, result_label):
+        """result_label = label_a <operation> label_b slice by slice (see OPERATIONS)."""
+        slice_indices = set(self.slices.get(label_a, ())) | set(self.slices.get(label_b, ()))
+        results = {
+            slice_index: combine_runs(self.get_runs(label_a, slice_index), self.get_runs(label_b, slice_index), operation)
+            for slice_index in slice_indices
+        }
+        with self.edit(operation.capitalize()):
+            self.remove_label(result_label)
+            for slice_index, runs in results.items():
+                self.set_runs(result_label, slice_index, runs)
+
+    def union(self, label_a, label_b, result_label):
+        self.combine('union', label_a, label_b, result_label)
+
+    def intersection(self, label_a, label_b, result_label):
+        self.combine('intersection', label_a, label_b, result_label)
+
+    def difference(self, label_a, label_b, result_label):
+        self.combine('difference', label_a, label_b, result_label)
+
+    def remove_label(self, label):
+        label_slices = self.slices.pop(label, None)
+        if label_slices is None:
+            return
+        with self.edit('Remove label'):
+            if self.edit_history is not None:
+                for slice_index, runs in label_slices.items():
+                    self.edit_history.record(label, slice_index, runs)
+            self.log_change()
+
+    def clear(self):
+        with self.edit('Clear'):
+            for label in self.labels():
+                self.remove_label(label)
+
+    def voxel_count(self, label):
+        return int(sum(int((runs[:, 1] - runs[:, 0]).sum()) for runs in self.slices.get(label, {}).values()))
+
+    def to_dense(self, label=None):
+        """Boolean (z, y, x) mask of one label, or the (z, y, x) label volume of all of them."""
+        if label is not None:
+            volume = np.zeros(self.shape, dtype=bool)
+            for slice_index, runs in self.slices.get(label, {}).items():
+                decode_runs(runs, volume[slice_index])
+            return volume
+        volume = np.zeros(self.shape, dtype=label_dtype(self.max_label()))
+        for label in self.labels():
+            for slice_index, runs in self.slices[label].items():
+                decode_runs(runs, volume[slice_index], label)
+        return volume
+
+    @classmethod
+    def from_dense(cls, label_volume: np.ndarray):
+        store = cls(label_volume.shape)
+        for label in np.unique(label_volume).tolist():
+            if label == 0:
+                continue
+            for slice_index in range(label_volume.shape[0]):
+                store.set_slice(label, slice_index, label_volume[slice_index] == label)
+        return store
+
+    def nbytes(self, label=None):
+        """Bytes held by the run encodings of one label, or of all labels."""
+        labels = self.slices if label is None else [label]
+        return sum(runs.nbytes for label in labels for runs in self.slices.get(label, {}).values())
+
+    def memory_usage(self):
+        """{label: (bytes, bytes of a dense uint8 mask of the volume)}; see also nbytes()."""
+        dense_nbytes = int(np.prod(self.shape))
+        return {label: (self.nbytes(label), dense_nbytes) for label in self.labels()}
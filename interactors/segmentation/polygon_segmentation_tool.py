@@ -1,5 +1,7 @@
+import numpy as np
 import vtkmodules.all as vtk
 from interactors.abstract_interactor_style import AbstractInteractorStyle
+from interactors.segmentation.rasterizer import world_to_slice_index, polygon_mask
 
 
 class ContourWidget(vtk.vtkContourWidget):
@@ -28,6 +30,9 @@ class ContourWidget(vtk.vtkContourWidget):
         ###
 
         self.closed = False
+        self.slice_axis = None  # slice the contour is drawn on, set when drawing starts
+        self.slice_index = None
+        self.label = None  # set when it closes
         self.ClosedForFirstTimeEvent = vtk.vtkCommand.UserEvent + 1
         self.AddObserver(vtk.vtkCommand.EndInteractionEvent, self.OnEndInteraction)
 
@@ -41,6 +46,14 @@ class ContourWidget(vtk.vtkContourWidget):
         self.ContinuousDrawOff()
         self.SetAllowNodePicking(False)
 
+    def get_world_nodes(self):
+        position = [0.0, 0.0, 0.0]
+        nodes = []
+        for index in range(self.repr.GetNumberOfNodes()):
+            self.repr.GetNthNodeWorldPosition(index, position)
+            nodes.append(tuple(position))
+        return nodes
+
 
 class PolygonSegmentationTool(AbstractInteractorStyle):
     def __init__(self, image_viewer, on_polygon_finished=None):
@@ -48,6 +61,7 @@ class PolygonSegmentationTool(AbstractInteractorStyle):
         self.active_widget = self.create_contour_widget()
         self.active_widget.Off()
         self.active_contours = []
+        self.label = 1  # label ID the next closed contour is filled with
 
     def On(self):  # ON
         self.active_widget.On()
@@ -66,9 +80,46 @@ class PolygonSegmentationTool(AbstractInteractorStyle):
         widget.On()
         return widget
 
+    def set_label(self, label):
+        self.label = label
+
     def on_contour_closed(self, obj: ContourWidget, event, calldata=None):
         self.active_widget = self.create_contour_widget()
+        obj.label = self.label
         self.active_contours.append(obj)
+        self.rasterize_slice(obj.slice_index, obj.label)
+
+    def rasterize_slice(self, slice_index, label):
+        """
+        Fill the label's closed contours on slice_index into the viewer's label store, replacing
+        the label on that slice. All of them are filled together (even-odd), so a contour drawn
+        inside another one cuts a hole. Returns the number of voxels inside.
+        """
+        viewer = self.image_viewer
+        slice_axis = viewer.slice_axis()
+        axes = [axis for axis in range(3) if axis != slice_axis]  # columns, rows of the slice
+        origin, spacing = viewer.output_geometry()
+        polygons = [
+            world_to_slice_index(contour.get_world_nodes(), origin, spacing, viewer.image_reslice.axis_signs,
+                                 viewer.volume_dimensions(), axes)
+            for contour in viewer.annotations.widgets(slice_axis, slice_index)  # also of earlier tool sessions
+            if isinstance(contour, ContourWidget) and contour.closed and contour.label == label
+        ]
+        label_store = viewer.get_label_store()
+        plane_shape = tuple(label_store.shape[2 - axis] for axis in reversed(axes))  # (rows, columns)
+        row_slice, column_slice, mask = polygon_mask(polygons, plane_shape)
+        with label_store.edit('Polygon'):
+            if slice_axis == 2:
+                label_store.set_slice(label, slice_index, mask, row_slice, column_slice)
+            else:
+                plane = np.zeros(plane_shape, dtype=bool)
+                plane[row_slice, column_slice] = mask
+                label_store.set_plane(label, slice_axis, viewer.volume_slice_index(slice_index), plane)
+        viewer.update_label_overlays()
+        return int(np.count_nonzero(mask))
 
     def on_interaction_start(self, obj: ContourWidget, event, calldata=None):
-        self.image_viewer.GetMeasurements().AddItem(obj)
+        if obj.slice_index is None:  # the first node ties the contour to the displayed slice
+            obj.slice_axis = self.image_viewer.slice_axis()
+            obj.slice_index = self.image_viewer.get_slice()
+            self.add_annotation(obj)
@@ -0,0 +1,88 @@
+import numpy as np
+
+
+def label_dtype(max_label):
+    """uint8 label volumes for up to 255 labels, uint16 beyond."""
+    return np.uint8 if max_label < 256 else np.uint16
+
+
+def world_to_slice_index(points, origin, spacing, axis_signs, dims, axes=(0, 1)):
+    """
+    (column, row) continuous volume indices of display-space world points on a slice whose
+    columns / rows run along volume axes `axes` (x, y for axial slices). Contours are drawn on the
+    resliced image (origin/spacing of ImageViewer2D.output_geometry); axes the reslice flips
+    (axis_signs, see ImageReslice) are flipped back so the indices address the volume's slice.
+    """
+    axes = list(axes)
+    points = np.asarray(points, dtype=np.float64)[:, axes]
+    indices = (points - np.asarray(origin)[axes]) / np.asarray(spacing)[axes]
+    for column, axis in enumerate(axes):
+        if axis_signs[axis] < 0:
+            indices[:, column] = (dims[axis] - 1) - indices[:, column]
+    return indices
+
+
+def polygon_mask(polygons, shape):
+    """
+    Even-odd fill of closed polygons given as (n, 2) arrays of (column, row) indices, clipped to a
+    (rows, columns) slice. Returns (row_slice, column_slice, mask) for the bounding box only.
+
+    Scanline without sorting: only the rows each edge actually crosses are generated (a few per
+    edge), every crossing toggles the pixels whose centre lies at or right of it in a difference
+    image, and a running XOR along the rows gives the crossing parity.
+    Overlapping polygons therefore cancel, which makes a contour inside another one a hole.
+    """
+    rows, columns = shape
+    polygons = [np.asarray(polygon, dtype=np.float64) for polygon in polygons if len(polygon) >= 3]
+    if not polygons:
+        return slice(0, 0), slice(0, 0), np.zeros((0, 0), dtype=bool)
+
+    # edges of all polygons, each closed back to its first node
+    starts = np.concatenate(polygons)
+    ends = np.concatenate([np.roll(polygon, -1, axis=0) for polygon in polygons])
+    low = np.minimum(starts[:, 1], ends[:, 1])
+    high = np.maximum(starts[:, 1], ends[:, 1])
+
+    first_row = max(int(np.ceil(low.min())), 0)
+    last_row = min(int(np.floor(high.max())), rows - 1)
+    first_column = max(int(np.ceil(min(starts[:, 0].min(), ends[:, 0].min()))), 0)
+    last_column = min(int(np.floor(max(starts[:, 0].max(), ends[:, 0].max()))), columns - 1)
+    if first_row > last_row or first_column > last_column:
+        return slice(0, 0), slice(0, 0), np.zeros((0, 0), dtype=bool)
+
+    # rows whose centre each edge crosses: low <= y < high (half-open, so shared vertices count once)
+    first_crossed = np.clip(np.ceil(low), first_row, last_row + 1).astype(np.intp)
+    crossed = np.clip(np.ceil(high), first_row, last_row + 1).astype(np.intp) - first_crossed
+    edge_index = np.repeat(np.arange(len(starts)), crossed)
+    offsets = np.arange(len(edge_index)) - np.repeat(np.cumsum(crossed) - crossed, crossed)
+    row = first_crossed[edge_index] + offsets
+
+    start, end = starts[edge_index], ends[edge_index]
+    t = (row - start[:, 1]) / (end[:, 1] - start[:, 1])
+    crossing_x = start[:, 0] + t * (end[:, 0] - start[:, 0])
+
+    height, width = last_row - first_row + 1, last_column - first_column + 1
+    toggle_column = np.clip(np.ceil(crossing_x).astype(np.intp) - first_column, 0, width)
+
+    # column-major toggles, rows padded to whole 8-byte words: the running XOR along the columns
+    # then runs on uint64 words, eight independent rows at a time
+    padded_height = -(-height // 8) * 8
+    toggles = np.zeros((width + 1, padded_height), dtype=np.uint8)
+    np.bitwise_xor.at(toggles.ravel(), toggle_column * padded_height + (row - first_row), 1)
+    parity = np.bitwise_xor.accumulate(toggles[:width].view(np.uint64), axis=0).view(np.uint8)
+    mask = parity[:, :height].T.view(bool)
+    return slice(first_row, last_row + 1), slice(first_column, last_column + 1), mask
+
+
+def fill_polygons(slice_array: np.ndarray, polygons, label, replace=False):
+    """
+    Write label into the (rows, columns) label slice inside polygons (even-odd). With replace,
+    pixels of the same label outside the polygons are cleared, so the slice holds exactly the
+    polygons' area for that label (e.g. after a hole was drawn into an outline).
+    Returns the number of pixels inside.
+    """
+    row_slice, column_slice, mask = polygon_mask(polygons, slice_array.shape)
+    if replace:
+        slice_array[slice_array == label] = 0
+    slice_array[row_slice, column_slice][mask] = label
+    return int(np.count_nonzero(mask))
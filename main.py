@@ -1,3 +1,4 @@
+import os
 import sys
 from PySide6.QtWidgets import QApplication
 from ui.main_window import MainWindow
@@ -7,6 +8,7 @@ import vtkmodules.vtkCommonCore as vtkCommonCore
 if __name__ == "__main__":
     vtkCommonCore.vtkObject.GlobalWarningDisplayOff()
     app = QApplication(sys.argv)
-    window = MainWindow()
+    # decoded volumes are cached on disk only when a directory is given, e.g. ~/.cache/ai-medical/volumes
+    window = MainWindow(disk_cache_dir=os.environ.get('AI_MEDICAL_DISK_CACHE'))
     window.show()
     sys.exit(app.exec())
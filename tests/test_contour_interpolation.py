@@ -0,0 +1,67 @@
+import threading
+
+import numpy as np
+import pytest
+
+from interactors.segmentation.contour_interpolation import interpolate_labels, key_planes
+from interactors.segmentation.label_store import LabelStore
+from utils import LoadCancelled
+
+
+def disk(shape, centre, radius):
+    rows, columns = np.mgrid[:shape[0], :shape[1]]
+    return (rows - centre[0]) ** 2 + (columns - centre[1]) ** 2 < radius ** 2
+
+
+def drawn_store(shape, axis, planes):
+    """A label 1 contoured on planes {index: mask} across axis, as the polygon tool writes it."""
+    store = LabelStore(shape)
+    for index, mask in planes.items():
+        if axis == 2:
+            store.set_slice(1, index, mask)
+        else:
+            store.set_plane(1, axis, index, mask)
+    return store
+
+
+def snapshot(store):
+    return {label: dict(slices) for label, slices in store.slices.items()}
+
+
+@pytest.mark.parametrize('axis', [0, 1, 2])
+def test_key_planes_are_the_drawn_planes(axis):
+    shape = (12, 20, 16)
+    plane_shape = {2: (20, 16), 1: (12, 16), 0: (12, 20)}[axis]
+    store = drawn_store(shape, axis, {3: disk(plane_shape, (6, 8), 3), 9: disk(plane_shape, (6, 8), 4)})
+    assert key_planes(store.slices[1], shape, axis) == [3, 9]
+
+
+@pytest.mark.parametrize('axis, order', [(1, (1, 0, 2)), (0, (2, 0, 1))])
+def test_interpolates_across_the_contour_axis(axis, order):
+    """Across coronal / sagittal planes the result is the axial interpolation of the transposed volume."""
+    shape = (20, 30, 25)
+    plane_shape = {1: (20, 25), 0: (20, 30)}[axis]
+    spacing = (0.7, 0.9, 2.0)
+    store = drawn_store(shape, axis, {4: disk(plane_shape, (6, 10), 4), 21: disk(plane_shape, (12, 14), 6)})
+    result = interpolate_labels(snapshot(store), shape, spacing, label_axes={1: axis}, chunk_slices=5)
+
+    transposed = store.to_dense(1).transpose(order)
+    transposed_spacing = {1: (spacing[0], spacing[2]), 0: (spacing[1], spacing[2])}[axis]
+    expected = interpolate_labels(snapshot(LabelStore.from_dense(transposed.astype(np.uint8))), transposed.shape,
+                                  transposed_spacing)
+    filled = result.to_dense(1).transpose(order)
+    assert np.array_equal(filled, expected.to_dense(1))
+    assert [index for index in range(filled.shape[0]) if filled[index].any()] == list(range(5, 21))
+
+
+def test_progress_and_cancel():
+    shape = (10, 16, 16)
+    store = drawn_store(shape, 2, {1: disk((16, 16), (8, 8), 4), 8: disk((16, 16), (8, 8), 6)})
+    progress = []
+    interpolate_labels(snapshot(store), shape, progress_callback=lambda done, total: progress.append((done, total)))
+    assert progress[-1] == (6, 6)
+
+    cancel_event = threading.Event()
+    cancel_event.set()
+    with pytest.raises(LoadCancelled):
+        interpolate_labels(snapshot(store), shape, cancel_event=cancel_event)
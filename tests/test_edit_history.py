@@ -0,0 +1,97 @@
+import numpy as np
+
+from interactors.segmentation.label_store import LabelStore
+from interactors.segmentation.edit_history import EditHistory
+
+
+def random_mask(rng, shape, density=0.3):
+    return rng.random(shape) < density
+
+
+def random_volume(rng, shape=(6, 12, 10), labels=3):
+    volume = rng.integers(0, labels + 1, size=shape).astype(np.uint8)
+    volume[rng.random(shape) < 0.4] = 0
+    return volume
+
+
+def test_undo_redo_round_trip():
+    rng = np.random.default_rng(6)
+    store = LabelStore((4, 8, 8))
+    history = EditHistory(store)
+    states = [store.to_dense()]
+    for _ in range(5):
+        with store.edit('Paint'):
+            for slice_index in rng.choice(4, size=2, replace=False).tolist():
+                store.set_slice(int(rng.integers(1, 3)), slice_index, random_mask(rng, (8, 8)))
+        states.append(store.to_dense())
+
+    for state in reversed(states[:-1]):
+        assert history.undo() == 'Paint'
+        assert np.array_equal(store.to_dense(), state)
+    assert history.undo() is None
+    for state in states[1:]:
+        assert history.redo() == 'Paint'
+        assert np.array_equal(store.to_dense(), state)
+    assert history.redo() is None
+
+
+def test_new_edit_ends_the_redo_branch():
+    store = LabelStore((1, 4, 4))
+    history = EditHistory(store)
+    store.set_slice(1, 0, np.eye(4, dtype=bool))
+    history.undo()
+    assert history.can_redo()
+    store.set_slice(1, 0, np.ones((4, 4), dtype=bool))
+    assert not history.can_redo()
+
+
+def test_remove_label_is_one_undo_step():
+    volume = random_volume(np.random.default_rng(7))
+    store = LabelStore.from_dense(volume)
+    history = EditHistory(store)
+    store.remove_label(2)
+    assert len(history.undo_stack) == 1
+    assert 2 not in store.slices
+    history.undo()
+    assert np.array_equal(store.to_dense(), volume)
+    history.redo()
+    assert np.array_equal(store.to_dense(), np.where(volume == 2, 0, volume))
+
+
+def test_set_plane_is_one_undo_step():
+    store = LabelStore((5, 6, 7))
+    history = EditHistory(store)
+    store.set_plane(1, 1, 2, np.ones((5, 7), dtype=bool))
+    assert len(history.undo_stack) == 1
+    history.undo()
+    assert not store.slices
+    history.redo()
+    assert store.voxel_count(1) == 5 * 7
+
+
+def test_memory_limit_drops_the_oldest_operations():
+    rng = np.random.default_rng(8)
+    store = LabelStore((1, 64, 64))
+    history = EditHistory(store, memory_limit=2048)
+    for _ in range(20):
+        store.set_slice(1, 0, random_mask(rng, (64, 64), 0.5))
+    assert 1 <= len(history.undo_stack) < 20
+    assert history.nbytes <= 2048 or len(history.undo_stack) == 1
+    assert history.nbytes == sum(history.operation_nbytes(operation) for operation in history.undo_stack)
+
+    states = []
+    while history.can_undo():
+        states.append(store.to_dense())
+        history.undo()
+    for state in reversed(states):
+        history.redo()
+        assert np.array_equal(store.to_dense(), state)
+
+
+def test_history_keeps_the_latest_operation_over_the_limit():
+    store = LabelStore((1, 64, 64))
+    history = EditHistory(store, memory_limit=1)
+    store.set_slice(1, 0, np.random.default_rng(9).random((64, 64)) < 0.5)
+    assert len(history.undo_stack) == 1
+    history.undo()
+    assert not store.slices
@@ -0,0 +1,142 @@
+import numpy as np
+import pytest
+
+from interactors.segmentation.label_store import LabelStore, encode_runs, decode_runs, combine_runs, clip_runs
+
+
+def random_mask(rng, shape, density=0.3):
+    return rng.random(shape) < density
+
+
+def random_volume(rng, shape=(6, 12, 10), labels=3):
+    volume = rng.integers(0, labels + 1, size=shape).astype(np.uint8)
+    volume[rng.random(shape) < 0.4] = 0
+    return volume
+
+
+@pytest.mark.parametrize('density', [0.0, 0.05, 0.5, 1.0])
+def test_encode_decode_round_trip(density):
+    rng = np.random.default_rng(0)
+    mask = random_mask(rng, (17, 23), density)
+    runs = encode_runs(mask)
+    assert runs.dtype == np.int32 and runs.shape[1] == 2
+    assert np.all(runs[:, 0] < runs[:, 1])
+    assert np.all(runs[1:, 0] > runs[:-1, 1])  # sorted, disjoint and not touching
+    assert np.array_equal(decode_runs(runs, np.zeros_like(mask)), mask)
+
+
+def test_encode_bounding_box_matches_full_slice():
+    rng = np.random.default_rng(1)
+    mask = np.zeros((20, 30), dtype=bool)
+    mask[4:11, 7:19] = random_mask(rng, (7, 12), 0.6)
+    assert np.array_equal(encode_runs(mask[4:11, 7:19], 4, 7, 30), encode_runs(mask))
+
+
+def test_encode_merges_runs_across_row_ends():
+    mask = np.zeros((3, 4), dtype=bool)
+    mask[0, 2:] = True
+    mask[1, :] = True
+    mask[2, :1] = True
+    assert encode_runs(mask).tolist() == [[2, 9]]
+
+
+def test_decode_cumulative_sum_path():
+    mask = np.zeros((200, 200), dtype=bool)
+    mask[:, ::2] = True  # 20000 runs, above the slice-assignment limit
+    runs = encode_runs(mask)
+    assert len(runs) >= 4096
+    assert np.array_equal(decode_runs(runs, np.zeros_like(mask)), mask)
+
+
+@pytest.mark.parametrize('operation, expected', [
+    ('union', np.logical_or),
+    ('intersection', np.logical_and),
+    ('difference', lambda a, b: a & ~b),
+    ('xor', np.logical_xor),
+])
+def test_combine_runs_matches_dense(operation, expected):
+    rng = np.random.default_rng(2)
+    for _ in range(20):
+        a, b = random_mask(rng, (9, 13)), random_mask(rng, (9, 13))
+        combined = combine_runs(encode_runs(a), encode_runs(b), operation)
+        assert np.array_equal(combined, encode_runs(expected(a, b)))  # the encoding is unique
+
+
+def test_combine_runs_with_empty():
+    runs = encode_runs(np.eye(4, dtype=bool))
+    empty = encode_runs(np.zeros((4, 4), dtype=bool))
+    assert np.array_equal(combine_runs(runs, empty, 'union'), runs)
+    assert len(combine_runs(runs, empty, 'intersection')) == 0
+    assert len(combine_runs(empty, empty, 'xor')) == 0
+
+
+def test_clip_runs():
+    runs = np.array([[2, 5], [8, 12], [15, 16]], dtype=np.int32)
+    assert clip_runs(runs, 4, 10).tolist() == [[0, 1], [4, 6]]
+    assert clip_runs(runs, 12, 15).tolist() == []
+
+
+def test_from_dense_to_dense_round_trip():
+    volume = random_volume(np.random.default_rng(3))
+    store = LabelStore.from_dense(volume)
+    assert np.array_equal(store.to_dense(), volume)
+    assert np.array_equal(store.to_dense(2), volume == 2)
+    assert store.voxel_count(1) == int((volume == 1).sum())
+
+
+@pytest.mark.parametrize('axis', [0, 1, 2])
+def test_decode_plane_matches_dense(axis):
+    volume = random_volume(np.random.default_rng(4))
+    store = LabelStore.from_dense(volume)
+    for index in range(volume.shape[2 - axis]):
+        expected = {2: lambda: volume[index], 1: lambda: volume[:, index, :], 0: lambda: volume[:, :, index]}[axis]()
+        assert np.array_equal(store.decode_plane(axis, index), expected)
+        assert np.array_equal(store.decode_plane(axis, index, rows=(1, 4)), expected[1:4])
+
+
+def test_decode_slice_paints_higher_labels_over_lower():
+    store = LabelStore((1, 4, 4))
+    store.set_slice(1, 0, np.ones((4, 4), dtype=bool))
+    store.set_slice(2, 0, np.eye(4, dtype=bool))
+    image = store.decode_slice(0)
+    assert np.array_equal(image, np.where(np.eye(4, dtype=bool), 2, 1))
+
+
+@pytest.mark.parametrize('axis', [0, 1])
+def test_set_plane_updates_one_line_of_every_slice(axis):
+    rng = np.random.default_rng(5)
+    store = LabelStore((5, 6, 7))
+    plane = random_mask(rng, (5, 6 if axis == 0 else 7), 0.5)
+    store.set_plane(1, axis, 3, plane)
+    expected = np.zeros((5, 6, 7), dtype=bool)
+    if axis == 0:
+        expected[:, :, 3] = plane
+    else:
+        expected[:, 3, :] = plane
+    assert np.array_equal(store.to_dense(1), expected)
+
+
+def test_changes_since():
+    store = LabelStore((4, 10, 10))
+    version = store.version
+    mask = np.zeros((10, 10), dtype=bool)
+    mask[3:5, 2:8] = True
+    store.set_slice(1, 2, mask)
+    assert store.changes_since(version) == [(2, 3, 4)]
+    assert store.changes_since(store.version) == []
+
+    version = store.version
+    store.set_slice(1, 2, mask)  # no change: nothing logged
+    assert store.version == version
+    store.remove_label(1)
+    assert store.changes_since(version) == [(None, 0, 9)]
+
+
+def test_changes_since_beyond_the_log():
+    store = LabelStore((1, 4, 4))
+    mask = np.zeros((4, 4), dtype=bool)
+    for step in range(store.changes.maxlen + 2):
+        mask[step % 4, (step // 4) % 4] ^= True
+        store.set_slice(1, 0, mask)
+    assert store.changes_since(0) is None
+    assert len(store.changes_since(store.version - 3)) == 3
@@ -0,0 +1,88 @@
+import threading
+
+import numpy as np
+import pytest
+
+from inference import NumpyBackend, sliding_window_inference, window_starts, zscore, intensity_window
+from inference import parse_normalization, parse_patch_size
+from utils import LoadCancelled
+
+
+def random_volume(rng, shape):
+    return rng.normal(0, 100, shape).astype(np.int16)
+
+
+@pytest.mark.parametrize('shape', [(40, 100, 90), (7, 30, 300), (16, 64, 64)])
+def test_matches_plain_threshold(shape):
+    volume = random_volume(np.random.default_rng(0), shape)
+    labels = sliding_window_inference(volume, NumpyBackend(threshold=0, scale=5.0), batch_size=3)
+    assert labels.shape == volume.shape
+    assert np.array_equal(labels, volume > 0)
+
+
+def test_partial_slabs_match_final_labels():
+    volume = random_volume(np.random.default_rng(1), (50, 70, 80))
+    partials = []
+    labels = sliding_window_inference(volume, NumpyBackend(threshold=0, scale=5.0),
+                                      partial_callback=lambda first_slice, slab: partials.append((first_slice, slab)))
+    assert len(partials) > 1
+    first_slices = [first_slice for first_slice, _ in partials]
+    assert first_slices == sorted(first_slices) and first_slices[0] == 0
+    stitched = np.concatenate([slab for _, slab in partials])
+    assert np.array_equal(stitched, labels)
+
+
+@pytest.mark.parametrize('shape', [(3, 20, 25), (1, 64, 10), (16, 5, 64)])
+def test_volume_smaller_than_patch_is_padded(shape):
+    volume = random_volume(np.random.default_rng(2), shape)
+    progress = []
+    labels = sliding_window_inference(volume, NumpyBackend(threshold=0, scale=5.0, patch_size=(16, 64, 64)),
+                                      progress_callback=lambda done, total: progress.append((done, total)))
+    assert labels.shape == shape
+    assert np.array_equal(labels, volume > 0)
+    assert progress[-1] == (1, 1)
+
+
+def test_cancel_raises_load_cancelled():
+    cancel_event = threading.Event()
+    progress = []
+
+    def on_progress(done, total):
+        progress.append(done)
+        if done >= 3:
+            cancel_event.set()
+
+    with pytest.raises(LoadCancelled):
+        sliding_window_inference(random_volume(np.random.default_rng(3), (64, 128, 128)), NumpyBackend(),
+                                 batch_size=1, progress_callback=on_progress, cancel_event=cancel_event)
+    assert max(progress) < 8
+
+
+def test_window_starts_cover_the_axis():
+    assert window_starts(20, 32, 0.5) == [0]
+    for size, patch in ((100, 32), (64, 64), (65, 64), (300, 64)):
+        starts = window_starts(size, patch, 0.5)
+        assert starts[0] == 0 and starts[-1] == size - patch
+        assert all(0 < later - earlier <= patch // 2 for earlier, later in zip(starts, starts[1:]))
+
+
+def test_normalizations():
+    batch = np.random.default_rng(4).normal(40, 300, (2, 1, 4, 8, 8)).astype(np.float32)
+    normalized = zscore(batch)
+    assert np.allclose(normalized.mean(axis=(1, 2, 3, 4)), 0, atol=1e-5)
+    assert np.allclose(normalized.std(axis=(1, 2, 3, 4)), 1, atol=1e-4)
+    windowed = intensity_window(-100, 100)(batch)
+    assert windowed.min() >= 0 and windowed.max() <= 1
+    assert parse_normalization('none') is None and parse_normalization(None) is None
+    assert parse_normalization('zscore') is zscore
+    assert np.allclose(parse_normalization('window:-100,100')(batch), windowed)
+    with pytest.raises(ValueError):
+        parse_normalization('window:100,-100')
+
+
+def test_parse_patch_size():
+    assert parse_patch_size('8,96,96') == (8, 96, 96)
+    assert parse_patch_size('128,128') == (1, 128, 128)
+    for spec in ('0,64,64', '64', '1,2,3,4', '8,x,8'):
+        with pytest.raises(ValueError):
+            parse_patch_size(spec)
@@ -5,5 +5,7 @@ from .right_dock import RightDock
 from .left_dock import LeftDock
 from .image_details_page import ImageDetailsPage
 from .train_status_page import TrainStatusPage
-from .split_viewer_page import create_viewer_split_page
-from .visualizer_page import VisualizerPage
\ No newline at end of file
+from .split_viewer_page import SplitViewerPage
+from .visualizer_page import VisualizerPage
+from .histogram_widget import HistogramWidget
+from .filter_panel import FilterPanel
@@ -0,0 +1,107 @@
+from PySide6.QtCore import Qt, Signal
+from PySide6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel, QComboBox, QSlider, QCheckBox, QPushButton
+from utils import FILTERS
+
+
+# filter name -> (parameter label, slider minimum, slider maximum, slider default, slider value -> node parameters)
+FILTER_CONTROLS = {
+    'Gaussian smoothing': ("Sigma (mm)", 1, 50, 10, lambda value: {'sigma': value / 10.0}),
+    'Median smoothing': ("Radius (voxels)", 1, 5, 1, lambda value: {'radius': value}),
+    'Resample': ("Spacing (mm)", 5, 50, 10, lambda value: {'spacing': (value / 10.0,) * 3}),
+    'Threshold': ("Lower", -1024, 3071, 300, lambda value: {'lower': float(value), 'upper': None}),
+    'Normalize': ("Z-score / min-max", 0, 1, 0, lambda value: {'mode': ('zscore', 'minmax')[value]}),
+    'CLAHE': ("Clip limit", 1, 100, 10, lambda value: {'clip_limit': value / 1000.0}),
+}
+
+
+class FilterPanel(QWidget):
+    """
+    Filter choice and parameter for the filter graph (utils.FILTERS). Every parameter change is
+    emitted; the owner previews it on the displayed slice while Preview is checked and runs the
+    filter on the whole volume only on Apply.
+    """
+    filter_changed = Signal(str, object)  # filter name, node parameters
+    preview_toggled = Signal(bool)
+    apply_requested = Signal(str, object)
+    revert_requested = Signal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+
+        title_label = QLabel("Filters")
+        title_label.setStyleSheet("color: #FF8C00; font-size: 13px; font-weight: bold;")
+        layout.addWidget(title_label)
+
+        self.filter_combo = QComboBox()
+        self.filter_combo.addItems([name for name in FILTERS if name in FILTER_CONTROLS])
+        self.filter_combo.setStyleSheet("color: #ddd; background-color: #2b2b2b;")
+        self.filter_combo.currentTextChanged.connect(self.on_filter_selected)
+        layout.addWidget(self.filter_combo)
+
+        self.parameter_label = QLabel()
+        self.parameter_label.setStyleSheet("color: #ccc; font-size: 11px;")
+        layout.addWidget(self.parameter_label)
+
+        self.slider = QSlider(Qt.Orientation.Horizontal)
+        self.slider.valueChanged.connect(self.on_value_changed)
+        layout.addWidget(self.slider)
+
+        self.preview_check = QCheckBox("Preview slice")
+        self.preview_check.setStyleSheet("color: #ccc;")
+        self.preview_check.toggled.connect(self.preview_toggled)
+        layout.addWidget(self.preview_check)
+
+        buttons_layout = QHBoxLayout()
+        self.apply_button = QPushButton("Apply")
+        self.apply_button.clicked.connect(lambda: self.apply_requested.emit(self.filter_name(), self.parameters()))
+        self.revert_button = QPushButton("Original")
+        self.revert_button.clicked.connect(self.revert_requested)
+        for button in (self.apply_button, self.revert_button):
+            button.setStyleSheet("""
+                QPushButton {
+                    background-color: #2b2b2b;
+                    border: 1px solid #FF8C00;
+                    color: #FF8C00;
+                    border-radius: 4px;
+                    padding: 3px;
+                }
+                QPushButton:disabled {
+                    border: 1px solid #444;
+                    color: #666;
+                }
+            """)
+            buttons_layout.addWidget(button)
+        layout.addLayout(buttons_layout)
+
+        self.on_filter_selected(self.filter_name())
+
+    def filter_name(self):
+        return self.filter_combo.currentText()
+
+    def parameters(self):
+        return FILTER_CONTROLS[self.filter_name()][4](self.slider.value())
+
+    def on_filter_selected(self, name):
+        _, minimum, maximum, default, _ = FILTER_CONTROLS[name]
+        self.slider.blockSignals(True)
+        self.slider.setRange(minimum, maximum)
+        self.slider.setValue(default)
+        self.slider.blockSignals(False)
+        self.on_value_changed(default)
+
+    def on_value_changed(self, value):
+        parameters = self.parameters()
+        shown = next(iter(parameters.values()))  # the parameter the slider sets
+        shown = shown[0] if isinstance(shown, tuple) else shown
+        self.parameter_label.setText(f"{FILTER_CONTROLS[self.filter_name()][0]}: {shown}")
+        self.filter_changed.emit(self.filter_name(), parameters)
+
+    def is_previewing(self):
+        return self.preview_check.isChecked()
+
+    def set_busy(self, busy):
+        """Disable the controls while a full-volume run is in progress."""
+        for widget in (self.filter_combo, self.slider, self.preview_check, self.apply_button, self.revert_button):
+            widget.setEnabled(not busy)
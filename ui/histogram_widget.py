@@ -0,0 +1,111 @@
+import math
+import vtkmodules.all as vtk
+from PySide6.QtCore import Qt, Signal, Slot, QRectF
+from PySide6.QtGui import QPainter, QColor
+from PySide6.QtWidgets import QWidget, QVBoxLayout, QGridLayout, QLabel, QPushButton
+
+
+class HistogramPlot(QWidget):
+    """Bars of a utils.VolumeHistogram (log counts), merged to the widget width."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.histogram = None
+        self.setMinimumHeight(120)
+
+    def set_histogram(self, histogram):
+        self.histogram = histogram
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), QColor('#111'))
+        if self.histogram is None:
+            return
+        counts, _ = self.histogram.reduced(bins=max(self.width() // 2, 1))
+        if len(counts) == 0:
+            return
+
+        heights = [math.log1p(count) for count in counts.tolist()]
+        max_height = max(heights) or 1.0
+        bar_width = self.width() / len(heights)
+        painter.setPen(Qt.PenStyle.NoPen)
+        painter.setBrush(QColor('#FF8C00'))
+        for index, height in enumerate(heights):
+            bar_height = height / max_height * (self.height() - 4)
+            painter.drawRect(QRectF(index * bar_width, self.height() - bar_height, bar_width, bar_height))
+
+
+class HistogramWidget(QWidget):
+    """
+    Histogram of the loaded volume with auto window/level (1st-99th percentile) and CT tissue presets.
+    window_level_selected carries (window center, window width).
+    """
+    window_level_selected = Signal(float, float)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.histogram = None
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+
+        title_label = QLabel("Histogram")
+        title_label.setStyleSheet("color: #FF8C00; font-size: 13px; font-weight: bold;")
+        layout.addWidget(title_label)
+
+        self.plot = HistogramPlot(self)
+        layout.addWidget(self.plot)
+
+        self.range_label = QLabel("No image loaded.")
+        self.range_label.setStyleSheet("color: #ccc; font-size: 11px;")
+        self.range_label.setWordWrap(True)
+        layout.addWidget(self.range_label)
+
+        buttons_layout = QGridLayout()
+        self.buttons = {}
+        for position, name in enumerate(('auto', 'lung', 'bone', 'brain')):
+            button = QPushButton(name.capitalize())
+            button.setStyleSheet("""
+                QPushButton {
+                    background-color: #2b2b2b;
+                    border: 1px solid #FF8C00;
+                    color: #FF8C00;
+                    border-radius: 4px;
+                    padding: 3px;
+                }
+                QPushButton:disabled {
+                    border: 1px solid #444;
+                    color: #666;
+                }
+            """)
+            button.setEnabled(False)
+            button.clicked.connect(lambda checked=False, preset=name: self.select_window_level(preset))
+            buttons_layout.addWidget(button, position // 2, position % 2)
+            self.buttons[name] = button
+        layout.addLayout(buttons_layout)
+
+    @Slot(dict, vtk.vtkImageData)
+    def update_histogram(self, metadata, image_data):
+        """Slot for VisualizerPage.image_loaded."""
+        self.histogram = metadata.get('histogram')
+        self.plot.set_histogram(self.histogram)
+        if self.histogram is None:
+            self.range_label.setText("No histogram.")
+        else:
+            low, median, high = (self.histogram.percentile(q) for q in (1, 50, 99))
+            self.range_label.setText(f"1%: {low:.0f}   50%: {median:.0f}   99%: {high:.0f}")
+
+        is_ct = self.histogram is not None and self.histogram.is_hounsfield()
+        for name, button in self.buttons.items():
+            button.setEnabled(self.histogram is not None and (name == 'auto' or is_ct))
+
+    def select_window_level(self, preset):
+        if self.histogram is None:
+            return
+        if preset == 'auto':
+            window_level = self.histogram.auto_window_level()
+        else:
+            window_level = self.histogram.preset(preset)
+        if window_level is not None:
+            self.window_level_selected.emit(*window_level)
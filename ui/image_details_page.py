@@ -46,6 +46,9 @@ class ImageDetailsPage(QWidget):
         # Add new labels with details from the metadata
         orientation = metadata.get('orientation', 'N/A')
         dims = image_data.GetDimensions()
+        lazy_volume = metadata.get('lazy_volume')  # image_data is then a single decoded slice
+        if lazy_volume is not None:
+            dims = (dims[0], dims[1], lazy_volume.count)
         slice_count = dims[2]
 
         orientation_label = QLabel(f"Orientation: {orientation}")
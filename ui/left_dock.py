@@ -2,6 +2,7 @@ from PySide6.QtWidgets import (
     QDockWidget, QTabWidget, QWidget,
     QVBoxLayout, QLabel, QScrollArea
 )
+from ui.histogram_widget import HistogramWidget
 
 class LeftDock(QDockWidget):
     def __init__(self, parent=None):
@@ -56,9 +57,8 @@ class LeftDock(QDockWidget):
         image_tools = QWidget()
         layout = QVBoxLayout(image_tools)
 
-        label = QLabel("Image Details Tools Area")
-        label.setStyleSheet("color: #ccc; font-size: 13px;")
-        layout.addWidget(label)
+        self.histogram_widget = HistogramWidget(image_tools)
+        layout.addWidget(self.histogram_widget)
         layout.addStretch()
 
         self.tabs.addTab(image_tools, "Image Details Tools")
@@ -1,13 +1,17 @@
 import sys
+import itertools
+import numpy as np
 from PySide6.QtCore import Qt, QPoint, QPropertyAnimation, QEasingCurve
-from PySide6.QtGui import QMouseEvent
+from PySide6.QtGui import QMouseEvent, QKeySequence, QShortcut
 from PySide6.QtWidgets import (
     QMainWindow, QStackedWidget, QWidget, QFileDialog, QApplication,
-    QHBoxLayout, QVBoxLayout, QPushButton, QLabel
+    QHBoxLayout, QVBoxLayout, QPushButton, QLabel, QInputDialog
 )
 
 from interactors.abstract_interactor_style import AbstractInteractorStyle
 from ui.top_bar import TopBar
+from utils import VolumeCache, DiskVolumeCache, SourceNode, Clahe, FILTERS, apply_filter_graph
+from ui.workers import TaskWorker, InferenceWorker
 
 from ui.left_dock import LeftDock
 from ui.right_dock import RightDock
@@ -15,11 +19,27 @@ from ui.visualizer_page import VisualizerPage
 from ui.navigation_sidebar import NavigationBar
 from ui.train_status_page import TrainStatusPage
 from ui.image_details_page import ImageDetailsPage
-from ui.split_viewer_page import create_viewer_split_page
-from interactors.segmentation.polygon_segmentation_tool import PolygonSegmentationTool
+from ui.split_viewer_page import SplitViewerPage
+from interactors.segmentation.polygon_segmentation_tool import PolygonSegmentationTool, ContourWidget
+from interactors.segmentation.contour_interpolation import interpolate_labels, key_planes
+from interactors.segmentation.label_store import LabelStore, combine_runs
+from inference import (OnnxBackend, available_backends, sliding_window_inference, parse_normalization,
+                       parse_patch_size)
+from viewers.label_overlay import LabelOverlay
+
+MODEL_NORMALIZATIONS = {  # choices offered for models whose metadata does not name one, see parse_normalization
+    "None (raw intensities)": 'none',
+    "Z-score per patch": 'zscore',
+    "CT soft tissue window (-160, 240 HU) to [0, 1]": 'window:-160,240',
+    "CT wide window (-1000, 1000 HU) to [0, 1]": 'window:-1000,1000',
+}
 
 class MainWindow(QMainWindow):
-    def __init__(self):
+    def __init__(self, disk_cache_dir=None):
+        """
+        disk_cache_dir enables the persistent cache of decoded volumes (DiskVolumeCache) in that
+        directory. It is off by default: the cache writes patient image data to local disk.
+        """
         super().__init__()
         self.drag_pos = QPoint()
         self.setWindowFlags(Qt.WindowType.FramelessWindowHint)
@@ -28,9 +48,25 @@ class MainWindow(QMainWindow):
         self.current_nav_selection = "Home"
         self.current_menu_selection = ""
         self.active_tool = None  # 'polygon' or None
-        
+        self.filter_worker = None
+        self.filter_source = None  # SourceNode of the unfiltered displayed volume, built on first use
+        self.filter_source_image = None  # vtkImageData filter_source belongs to
+        self.filter_nodes = {}  # filter name -> node on filter_source, keeps its cached results
+        self.interpolation_worker = None
+        self.interpolation_store = None  # label store the running interpolation was started on
+        self.interpolation_overlay = None  # preview of the interpolated slices until accepted
+        self.progress_steps = {}  # task -> last reported 10% step, see report_progress
+        self.inference_worker = None
+        self.inference_store = None  # label store the running AI segmentation merges into
+        self.inference_overlay = None  # labels of a running AI segmentation, streamed in by slab
+        self.volume_cache = VolumeCache(max_bytes=2 * 1024 ** 3)  # recently opened studies
+        self.disk_cache = (DiskVolumeCache(cache_dir=disk_cache_dir, max_bytes=20 * 1024 ** 3)
+                           if disk_cache_dir else None)  # decoded volumes across sessions, opt-in
+
         self.setup_strategies()
         self.setup_ui()
+        QShortcut(QKeySequence.StandardKey.Undo, self, self.handle_undo)
+        QShortcut(QKeySequence.StandardKey.Redo, self, self.handle_redo)
 
     def setup_ui(self):
         self.top_bar = TopBar(self)
@@ -40,8 +76,8 @@ class MainWindow(QMainWindow):
 
         self.train_page = TrainStatusPage(self)
         self.image_page = ImageDetailsPage(self)
-        self.visualizer_page = VisualizerPage(self)
-        self.viewer_split_page = create_viewer_split_page()
+        self.visualizer_page = VisualizerPage(self, volume_cache=self.volume_cache, disk_cache=self.disk_cache)
+        self.viewer_split_page = SplitViewerPage(self)
 
         self.stacked_widget = QStackedWidget()
         self.stacked_widget.addWidget(self.train_page)
@@ -156,7 +192,7 @@ class MainWindow(QMainWindow):
     def activate_default_interactor(self):
         default_style = AbstractInteractorStyle(self.visualizer_page.viewer)
         self.visualizer_page.viewer.image_interactor.SetInteractorStyle(default_style)
-        self.visualizer_page.viewer.Render()
+        self.visualizer_page.viewer.request_render()
         self.active_tool = None
 
     def handle_polygon_toggle(self):
@@ -172,9 +208,219 @@ class MainWindow(QMainWindow):
         # current_style = self.visualizer_page.viewer.interactor.GetInteractorStyle()
         # print("Current Interactor Style:", type(current_style).__name__)
         polygon_tool.On()
-        self.visualizer_page.viewer.Render()
+        self.visualizer_page.viewer.request_render()
         self.active_tool = 'polygon'
 
+    def handle_interpolate(self):
+        """
+        Interpolate the labels between their contoured slices in the background and preview the
+        result; clicking again while it runs cancels.
+        """
+        if self.interpolation_worker is not None:
+            self.interpolation_worker.cancel()
+            return
+        viewer = self.visualizer_page.viewer
+        if viewer is None:
+            return
+        label_store = viewer.label_store
+        if label_store is None:
+            return
+        label_axes = self.contour_axes(viewer)
+        snapshot = {label: dict(slices) for label, slices in label_store.slices.items()  # runs are never modified in place
+                    if len(key_planes(slices, label_store.shape, label_axes.get(label, 2))) >= 2}
+        if not snapshot:
+            print("Draw contours of a label on at least two slices to interpolate.")
+            return
+        self.discard_interpolation()
+        self.interpolation_store = label_store
+        self.interpolation_worker = TaskWorker(interpolate_labels, snapshot, label_store.shape,
+                                               spacing=viewer.vtk_image_data.GetSpacing(), label_axes=label_axes,
+                                               parent=self)
+        self.progress_steps.pop("Interpolation", None)
+        self.interpolation_worker.progress.connect(lambda done, total: self.report_progress("Interpolation", done, total))
+        self.interpolation_worker.result_ready.connect(
+            lambda preview_store: self.on_interpolation_done(label_store, preview_store))
+        self.interpolation_worker.failed.connect(lambda message: print("Interpolation failed; the labels are unchanged."))
+        self.interpolation_worker.cancelled.connect(lambda: print("Interpolation cancelled."))
+        self.interpolation_worker.finished.connect(self.on_interpolation_finished)
+        self.interpolation_worker.start()
+
+    def contour_axes(self, viewer):
+        """
+        Axis each label's contours were drawn on, to interpolate it across. A label contoured on
+        several axes goes with the one it has most contours on; labels without contours are axial.
+        """
+        counts = {}
+        for widget, (slice_axis, _) in viewer.annotations.widget_keys.items():
+            if isinstance(widget, ContourWidget) and widget.closed and widget.label is not None:
+                label_counts = counts.setdefault(widget.label, {})
+                label_counts[slice_axis] = label_counts.get(slice_axis, 0) + 1
+        return {label: max(label_counts, key=label_counts.get) for label, label_counts in counts.items()}
+
+    def report_progress(self, task, done, total):
+        """Print the progress of a background task in steps of 10%."""
+        step = 10 * done // max(total, 1)
+        if step != self.progress_steps.get(task):
+            self.progress_steps[task] = step
+            print(f"{task}: {10 * step}%")
+
+    def cancel_stale_workers(self, metadata, vtk_image_data):
+        """Slot for VisualizerPage.image_loaded: label jobs of a series that is no longer shown are cancelled."""
+        viewer = self.visualizer_page.viewer
+        label_store = viewer.label_store if viewer is not None else None
+        if self.interpolation_worker is not None and self.interpolation_store is not label_store:
+            self.interpolation_worker.cancel()
+        if self.inference_worker is not None and self.inference_store is not label_store:
+            self.inference_worker.cancel()
+
+    def on_interpolation_done(self, label_store, preview_store):
+        viewer = self.visualizer_page.viewer
+        if viewer is None or viewer.label_store is not label_store:  # another series was loaded meanwhile
+            return
+        self.interpolation_overlay = LabelOverlay(viewer, preview_store, color=(0.0, 0.8, 1.0), opacity=0.4)
+        viewer.add_label_overlay(self.interpolation_overlay)
+
+    def on_interpolation_finished(self):
+        self.interpolation_worker.deleteLater()
+        self.interpolation_worker = None
+        self.interpolation_store = None
+
+    def accept_interpolation(self):
+        """Merge the previewed interpolation into the viewer's labels."""
+        overlay = self.interpolation_overlay
+        viewer = self.visualizer_page.viewer
+        if overlay is None or viewer is None or overlay not in viewer.label_overlays:
+            return
+        label_store = viewer.get_label_store()
+        with label_store.edit('Interpolation'):
+            for label, slices in overlay.label_store.slices.items():
+                for slice_index, runs in slices.items():
+                    label_store.set_runs(label, slice_index,
+                                         combine_runs(label_store.get_runs(label, slice_index), runs, 'union'))
+        self.discard_interpolation()
+        viewer.update_label_overlays()
+
+    def discard_interpolation(self):
+        viewer = self.visualizer_page.viewer
+        if self.interpolation_overlay is not None and viewer is not None:
+            viewer.remove_label_overlay(self.interpolation_overlay)
+        self.interpolation_overlay = None
+
+    def handle_run_inference(self):
+        """Segment the displayed volume with an ONNX model in the background; clicking again cancels."""
+        if self.inference_worker is not None:
+            self.inference_worker.cancel()
+            return
+        viewer = self.visualizer_page.viewer
+        if viewer is None or viewer.lazy_volume is not None or self.visualizer_page.loader is not None:
+            print("AI segmentation needs the fully loaded volume.")
+            return
+        if 'onnx' not in available_backends():
+            print("AI segmentation needs onnxruntime: pip install onnxruntime")
+            return
+        model_path, _ = QFileDialog.getOpenFileName(self, "Select Segmentation Model", "", "ONNX models (*.onnx)")
+        if not model_path:
+            return
+        try:
+            backend = OnnxBackend(model_path)
+        except Exception as e:
+            print(f"Could not load model {model_path}: {e}")
+            return
+        if self.choose_model_input(backend):
+            self.run_inference(backend)
+
+    def choose_model_input(self, backend):
+        """
+        Ask for what the model's metadata does not state: the intensity normalization it was
+        trained with and, for dynamic input axes, the patch size. False if the user cancels.
+        """
+        if 'normalize' not in backend.metadata:
+            names = list(MODEL_NORMALIZATIONS)
+            name, ok = QInputDialog.getItem(self, "Model Normalization",
+                                            "Intensity normalization the model was trained with:", names, 0, False)
+            if not ok:
+                return False
+            backend.normalize = parse_normalization(MODEL_NORMALIZATIONS[name])
+        if backend.dynamic_patch_size and 'patch_size' not in backend.metadata:
+            default = ",".join(str(size) for size in backend.patch_size)
+            while True:
+                text, ok = QInputDialog.getText(self, "Model Patch Size", "Patch size (z,y,x) for the model input:",
+                                                text=default)
+                if not ok:
+                    return False
+                try:
+                    backend.set_patch_size(parse_patch_size(text))
+                    break
+                except ValueError as e:
+                    print(e)
+        print(f"AI segmentation: patch size {backend.patch_size}")
+        return True
+
+    def run_inference(self, backend):
+        """Run backend on the displayed volume; finished slabs show in an overlay, the result is merged as one edit."""
+        viewer = self.visualizer_page.viewer
+        label_store = viewer.get_label_store()
+        self.inference_overlay = LabelOverlay(viewer, LabelStore(label_store.shape), opacity=0.4)
+        viewer.add_label_overlay(self.inference_overlay)
+        volume = SourceNode.from_vtk(viewer.vtk_image_data).volume
+        self.inference_store = label_store
+        self.inference_worker = InferenceWorker(sliding_window_inference, volume, backend, parent=self)
+        self.progress_steps.pop("AI segmentation", None)
+        self.inference_worker.partial_result.connect(self.on_inference_partial)
+        self.inference_worker.progress.connect(lambda done, total: self.report_progress("AI segmentation", done, total))
+        self.inference_worker.result_ready.connect(lambda labels: self.on_inference_done(label_store))
+        self.inference_worker.failed.connect(lambda message: print("AI segmentation failed; the labels are unchanged."))
+        self.inference_worker.cancelled.connect(lambda: print("AI segmentation cancelled."))
+        self.inference_worker.finished.connect(self.on_inference_finished)
+        self.inference_worker.start()
+
+    def on_inference_partial(self, first_slice, labels):
+        viewer = self.visualizer_page.viewer
+        if viewer is None or self.inference_overlay not in viewer.label_overlays:  # another series was loaded
+            return
+        preview_store = self.inference_overlay.label_store
+        for label in np.unique(labels).tolist():
+            if label == 0:
+                continue
+            for offset, slice_labels in enumerate(labels):
+                preview_store.set_slice(label, first_slice + offset, slice_labels == label)
+        viewer.update_label_overlays()
+
+    def on_inference_done(self, label_store):
+        viewer = self.visualizer_page.viewer
+        if viewer is None or viewer.label_store is not label_store:
+            return
+        # model classes go to labels not in use, so they never merge into the user's own labels
+        model_classes = self.inference_overlay.label_store.labels()
+        free_labels = (label for label in itertools.count(1) if label not in label_store.slices)
+        label_map = dict(zip(model_classes, free_labels))
+        with label_store.edit('AI segmentation'):
+            for model_class, label in label_map.items():
+                for slice_index, runs in self.inference_overlay.label_store.slices[model_class].items():
+                    label_store.set_runs(label, slice_index, runs)
+        for model_class, label in label_map.items():
+            print(f"AI segmentation: model class {model_class} -> label {label}")
+
+    def on_inference_finished(self):
+        self.inference_worker.deleteLater()
+        self.inference_worker = None
+        self.inference_store = None
+        viewer = self.visualizer_page.viewer
+        if viewer is not None:
+            viewer.remove_label_overlay(self.inference_overlay)  # merged, or cancelled
+            viewer.update_label_overlays()
+        self.inference_overlay = None
+
+    def handle_undo(self):
+        viewer = self.visualizer_page.viewer
+        if viewer is not None:
+            viewer.undo_label_edit()
+
+    def handle_redo(self):
+        viewer = self.visualizer_page.viewer
+        if viewer is not None:
+            viewer.redo_label_edit()
+
     def handle_topbar_selection(self, name):
         self.current_menu_selection = name
         self.current_nav_selection = "Home"
@@ -196,8 +442,8 @@ class MainWindow(QMainWindow):
     def populate_imaging_tools_menu(self):
         self.navigation_sidebar.set_dynamic_buttons([
             ("Open Viewer Mode", lambda: self.switch_page(self.viewer_split_page, "Viewer", False)),
-            ("Filter", lambda: None),
-            ("Segment", lambda: None),
+            ("Filter", self.handle_filter),
+            ("Segment", self.handle_run_inference),
             ("Image Details", self.show_image_page)
         ])
         self.show_home_page()
@@ -226,6 +472,11 @@ class MainWindow(QMainWindow):
             self.render_home_buttons([
                 ("Import File", self.handle_file_open),
                 ("Polygon", lambda: self.handle_polygon_toggle()),
+                ("Interpolate", self.handle_interpolate),
+                ("Accept", self.accept_interpolation),
+                ("Undo", self.handle_undo),
+                ("Redo", self.handle_redo),
+                ("AI Segment", self.handle_run_inference),
                 ("Save Workstation", lambda: print("Save Clicked"))
             ])
         else:
@@ -257,6 +508,7 @@ class MainWindow(QMainWindow):
                 background-color: #ffa733;
             }
         """)
+        run_btn.clicked.connect(self.handle_run_inference)
         self.top_buttons_layout.addWidget(label)
         self.top_buttons_layout.addStretch()
         self.top_buttons_layout.addWidget(run_btn)
@@ -297,6 +549,120 @@ class MainWindow(QMainWindow):
     def connect_signals(self):
         self.navigation_sidebar.set_nav_callback(self.on_navigation_item_selected)
         self.visualizer_page.image_loaded.connect(self.image_page.update_details)
+        self.visualizer_page.image_loaded.connect(self.viewer_split_page.set_volume)
+        self.visualizer_page.image_loaded.connect(self.left_dock.histogram_widget.update_histogram)
+        self.left_dock.histogram_widget.window_level_selected.connect(self.apply_window_level)
+
+        filter_panel = self.right_dock.filter_panel
+        self.visualizer_page.image_loaded.connect(self.reset_filter_graph)
+        self.visualizer_page.image_loaded.connect(self.cancel_stale_workers)
+        filter_panel.filter_changed.connect(self.preview_filter)
+        filter_panel.preview_toggled.connect(self.toggle_filter_preview)
+        filter_panel.apply_requested.connect(self.apply_filter)
+        filter_panel.revert_requested.connect(self.revert_filter)
+
+    def handle_filter(self):
+        """
+        Adaptive histogram equalization (CLAHE) of the displayed volume with the filter panel's
+        CLAHE node, so a repeated run is served from its cache; a second click switches back.
+        """
+        viewer = self.visualizer_page.viewer
+        if viewer is None or self.visualizer_page.loader is not None or self.filter_worker is not None:
+            return
+        if viewer.lazy_volume is not None:
+            print("Filters need the full volume; this series is loaded slice by slice.")
+            return
+
+        source = viewer.metadata.get('source')
+        if source is not None:
+            self.visualizer_page.show_volume(*source)
+            return
+
+        self.run_filter(self.filter_node(Clahe.name))
+
+    def filter_node(self, name):
+        """
+        Node of filter `name` on the displayed volume (the unfiltered one while a filter result is
+        shown), or None while the full volume isn't available.
+        """
+        viewer = self.visualizer_page.viewer
+        if viewer is None or viewer.lazy_volume is not None or self.visualizer_page.loader is not None:
+            return None
+        if self.filter_source is None:
+            self.filter_source_image = (viewer.metadata.get('source') or (viewer.vtk_image_data,))[0]
+            self.filter_source = SourceNode.from_vtk(self.filter_source_image)
+        if name not in self.filter_nodes:
+            self.filter_nodes[name] = FILTERS[name](self.filter_source)
+        return self.filter_nodes[name]
+
+    def reset_filter_graph(self, metadata, vtk_image_data):
+        """
+        Slot for VisualizerPage.image_loaded: filters now apply to the new volume. A filter result
+        or the unfiltered volume coming back keeps the graph and its cached results.
+        """
+        if (metadata.get('source') or (vtk_image_data,))[0] is not self.filter_source_image:
+            self.filter_source = None
+            self.filter_source_image = None
+            self.filter_nodes = {}
+        filter_panel = self.right_dock.filter_panel
+        self.preview_filter(filter_panel.filter_name(), filter_panel.parameters())
+
+    def preview_filter(self, name, parameters):
+        """Filter the displayed slice only, while the filter panel's preview is on."""
+        if not self.right_dock.filter_panel.is_previewing() or self.filter_worker is not None:
+            return
+        filter_node = self.filter_node(name)
+        if filter_node is not None:
+            self.visualizer_page.viewer.filter_preview.request(filter_node, **parameters)
+
+    def toggle_filter_preview(self, checked):
+        filter_panel = self.right_dock.filter_panel
+        if checked:
+            if self.filter_node(filter_panel.filter_name()) is None:
+                print("Filter preview needs the fully loaded volume.")
+            self.preview_filter(filter_panel.filter_name(), filter_panel.parameters())
+        elif self.visualizer_page.viewer is not None:
+            self.visualizer_page.viewer.filter_preview.stop()
+
+    def apply_filter(self, name, parameters):
+        """Run the previewed filter on the whole volume in the background."""
+        filter_node = self.filter_node(name)
+        if filter_node is None or self.filter_worker is not None:
+            print("Filters need the fully loaded volume.")
+            return
+        self.right_dock.filter_panel.preview_check.setChecked(False)  # the result replaces the preview
+        filter_node.set_parameters(**parameters)
+        self.run_filter(filter_node)
+
+    def revert_filter(self):
+        viewer = self.visualizer_page.viewer
+        if viewer is not None and self.filter_worker is None and viewer.metadata.get('source') is not None:
+            self.visualizer_page.show_volume(*viewer.metadata['source'])
+
+    def run_filter(self, filter_node):
+        viewer = self.visualizer_page.viewer
+        self.filter_worker = TaskWorker(apply_filter_graph, filter_node, viewer.vtk_image_data, viewer.metadata,
+                                        parent=self)
+        self.filter_worker.result_ready.connect(self.on_filter_done)
+        self.filter_worker.finished.connect(self.on_filter_finished)
+        self.right_dock.filter_panel.set_busy(True)
+        self.filter_worker.start()
+
+    def on_filter_done(self, result):
+        self.visualizer_page.show_volume(*result)
+
+    def on_filter_finished(self):
+        self.filter_worker.deleteLater()
+        self.filter_worker = None
+        self.right_dock.filter_panel.set_busy(False)
+
+    def apply_window_level(self, window_center, window_width):
+        viewer = self.visualizer_page.viewer
+        if viewer is None:
+            return
+        viewer.flag_set_custom_window_level = True  # keep it while scrolling, like a right-drag
+        viewer.set_window_level(window_width, window_center)
+        viewer.request_render()
 
     def switch_page(self, page, title, show_docks_tools):
         if page:
@@ -2,6 +2,7 @@ from PySide6.QtWidgets import (
     QDockWidget, QTabWidget, QWidget,
     QVBoxLayout, QLabel
 )
+from ui.filter_panel import FilterPanel
 
 class RightDock(QDockWidget):
     def __init__(self, parent=None):
@@ -47,9 +48,8 @@ class RightDock(QDockWidget):
         visual_tools = QWidget()
         layout = QVBoxLayout(visual_tools)
 
-        label = QLabel("Visualizer Tools Area")
-        label.setStyleSheet("color: #ccc; font-size: 13px;")
-        layout.addWidget(label)
+        self.filter_panel = FilterPanel(visual_tools)
+        layout.addWidget(self.filter_panel)
 
         layout.addStretch()
         self.tabs.addTab(visual_tools, "Visualizer Tools")
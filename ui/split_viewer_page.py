@@ -1,22 +1,132 @@
-from PySide6.QtWidgets import QWidget, QHBoxLayout, QLabel
+from PySide6.QtWidgets import QWidget, QHBoxLayout, QVBoxLayout, QLabel
+from vtkmodules.qt.QVTKRenderWindowInteractor import QVTKRenderWindowInteractor
 
-def create_viewer_split_page():
-    page = QWidget()
-    page.setStyleSheet("background-color: #1e1e1e;")
-    layout = QHBoxLayout(page)
-    layout.setContentsMargins(0, 0, 0, 0)
-    layout.setSpacing(1)
+from viewers.viewer_2d import ImageViewer2D, ViewerType, SliceChangedEvent
+from viewers.crosshair import SliceCrosshair
+from interactors.abstract_interactor_style import AbstractInteractorStyle
 
-    left_sidebar = QLabel("📂 Image Sidebar")
-    left_sidebar.setStyleSheet("color: orange; background-color: #222; padding: 20px;")
-    left_sidebar.setFixedWidth(250)
 
-    right_view = QLabel("🖼️ Main Image Display")
-    right_view.setStyleSheet("color: white; background-color: #111; padding: 20px;")
+class SplitViewerPage(QWidget):
+    """
+    Axial, sagittal and coronal views of the loaded volume side by side. All three viewers read
+    the same vtkImageData (each reslices only its visible slice), so memory stays at one volume.
+    Changing the slice in one view moves the crosshair in the other two; Ctrl+click moves the
+    other two views to the clicked point.
+    """
 
-    left_sidebar.setStyleSheet("color: orange; background-color: #111; padding: 10px;")
-    right_view.setStyleSheet("color: white; background-color: #111; padding: 10px;")
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setStyleSheet("background-color: #1e1e1e;")
+        self.viewers = {}  # viewer type -> ImageViewer2D
+        self.crosshairs = {}  # viewer type -> SliceCrosshair
+        self.interactor_styles = {}
+        self.vtk_image_data = None
+        self.metadata = None
+        self.pending_volume = None  # (vtk_image_data, metadata) received while the page was hidden
+        self.cursor = [0, 0, 0]  # (x, y, z) slice indices in display index space
 
-    layout.addWidget(left_sidebar)
-    layout.addWidget(right_view)
-    return page
+        self.main_layout = QVBoxLayout(self)
+        self.main_layout.setContentsMargins(0, 0, 0, 0)
+        self.main_layout.setSpacing(1)
+
+        self.message_label = QLabel("No image loaded.")
+        self.message_label.setStyleSheet("color: #ccc; background-color: #111; padding: 10px;")
+        self.main_layout.addWidget(self.message_label)
+
+        views_layout = QHBoxLayout()
+        views_layout.setSpacing(1)
+        self.main_layout.addLayout(views_layout, 1)
+
+        self.vtk_widgets = {}
+        for viewer_type in ViewerType:
+            vtk_widget = QVTKRenderWindowInteractor(self)
+            views_layout.addWidget(vtk_widget)
+            self.vtk_widgets[viewer_type.value] = vtk_widget
+
+    def set_volume(self, metadata, vtk_image_data):
+        """Slot for VisualizerPage.image_loaded; the views are (re)built once the page is shown."""
+        if metadata.get('lazy_volume') is not None:
+            self.message_label.setText("Sagittal and coronal views need the full volume; "
+                                       "this series is loaded slice by slice.")
+            self.message_label.setVisible(True)
+            self.pending_volume = None
+            return
+        self.message_label.setVisible(False)
+        self.pending_volume = (vtk_image_data, metadata)
+        if self.isVisible():
+            self.build_views()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        if self.pending_volume is not None:
+            self.build_views()
+
+    def build_views(self):
+        self.vtk_image_data, self.metadata = self.pending_volume
+        self.pending_volume = None
+        dims = self.vtk_image_data.GetDimensions()
+        self.cursor = [dims[0] // 2, dims[1] // 2, self.metadata.get('initial_slice', dims[2] // 2)]
+
+        for viewer_type, vtk_widget in self.vtk_widgets.items():
+            viewer = self.viewers.get(viewer_type)
+            if viewer is None:
+                render_window = vtk_widget.GetRenderWindow()
+                interactor = render_window.GetInteractor()
+                viewer = ImageViewer2D(render_window, interactor, self.vtk_image_data, self.metadata)
+                viewer.AddObserver(SliceChangedEvent, self.on_slice_changed)
+                press_observer = interactor.AddObserver("LeftButtonPressEvent", self.on_left_button_press, 1.0)
+                viewer.press_command = interactor.GetCommand(press_observer)
+
+                self.viewers[viewer_type] = viewer
+                self.crosshairs[viewer_type] = SliceCrosshair(viewer)
+                self.interactor_styles[viewer_type] = AbstractInteractorStyle(viewer)
+                interactor.SetInteractorStyle(self.interactor_styles[viewer_type])
+                interactor.Initialize()
+            else:
+                viewer.reset_image_viewer(self.vtk_image_data, self.metadata)
+            viewer.set_viewer_type(viewer_type)
+            viewer.zoom_to_fit()
+
+        axial_viewer = self.viewers[ViewerType.AXIAL.value]
+        self.set_cursor(self.cursor)
+        for viewer in self.viewers.values():  # start sagittal/coronal with the axial default window
+            if viewer is not axial_viewer:
+                viewer.set_window_level(*axial_viewer.get_window_level())
+        for viewer in self.viewers.values():
+            viewer.render_scheduler.render_now()
+
+    def set_cursor(self, cursor):
+        """Show the slices through cursor (display index space) in all three views."""
+        self.cursor = list(cursor)
+        for viewer in self.viewers.values():
+            viewer.set_slice(self.cursor[viewer.slice_axis()])
+
+    def on_slice_changed(self, viewer, event):
+        self.cursor[viewer.slice_axis()] = viewer.get_slice()
+        for viewer_type, other_viewer in self.viewers.items():
+            self.crosshairs[viewer_type].set_position(self.cursor)
+            if other_viewer is not viewer:
+                other_viewer.request_render()
+
+    def on_left_button_press(self, interactor, event):
+        if not interactor.GetControlKey():
+            return
+        viewer = next((viewer for viewer in self.viewers.values() if viewer.image_interactor is interactor), None)
+        if viewer is None:
+            return
+        viewer.press_command.SetAbortFlag(1)  # don't start a slice drag
+
+        x, y = interactor.GetEventPosition()
+        viewer.renderer.SetDisplayPoint(x, y, 0)
+        viewer.renderer.DisplayToWorld()
+        world_point = viewer.renderer.GetWorldPoint()
+        world_point = [world_point[axis] / world_point[3] for axis in range(3)]
+
+        origin, spacing = viewer.output_geometry()
+        dims = self.vtk_image_data.GetDimensions()
+        cursor = list(self.cursor)
+        for axis in range(3):
+            if axis != viewer.slice_axis():
+                index = round((world_point[axis] - origin[axis]) / spacing[axis])
+                cursor[axis] = min(max(index, 0), dims[axis] - 1)
+        self.set_cursor(cursor)
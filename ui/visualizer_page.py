@@ -1,7 +1,8 @@
 import os
 os.environ["VTK_OPENGL_HYBRID"] = "1"  # Software rendering fallback
 
-from utils import read_dicom_folder
+from utils import folder_cache_key
+from ui.workers import VolumeLoader, ProgressiveVolumeLoader
 from viewers.viewer_2d import ImageViewer2D
 from PySide6.QtCore import Signal
 import vtkmodules.all as vtk
@@ -13,12 +14,20 @@ from vtkmodules.qt.QVTKRenderWindowInteractor import QVTKRenderWindowInteractor
 class VisualizerPage(QWidget):
     # Define a signal that will carry the metadata (dict) and image data
     image_loaded = Signal(dict, vtk.vtkImageData)
-    
-    def __init__(self, parent=None, import_folder_path=None):
+    loading_progress = Signal(str, int, int)  # stage, done slices, total slices
+
+    def __init__(self, parent=None, import_folder_path=None, volume_cache=None, disk_cache=None):
         super().__init__(parent)
         self.import_folder_path = import_folder_path
+        self.volume_cache = volume_cache  # utils.VolumeCache of recently opened studies, optional
+        self.disk_cache = disk_cache  # utils.DiskVolumeCache of decoded volumes, optional
         self.viewer = None
         self.interactor_style = None
+        self.loader = None
+        self.progressive_loading = True  # show the focus slice first, stream in the rest
+        self.lazy_threshold_bytes = 4 * 1024 ** 3  # larger series are decoded per slice on demand
+        if self.volume_cache is not None:
+            self.volume_cache.on_evict = self.release_volume
 
         self.main_layout = QVBoxLayout()
         self.setLayout(self.main_layout)
@@ -32,23 +41,108 @@ class VisualizerPage(QWidget):
         if self.import_folder_path:
             self.load_image(self.import_folder_path)
 
-    def load_image(self, folder_path):
+    def load_image(self, folder_path, focus_slice=None):
+        """
+        Start loading folder_path in the background; a load already in progress is cancelled.
+        With progressive_loading, focus_slice (default: middle) is shown as soon as it is decoded.
+        """
+        self.cancel_loading()
         self.import_folder_path = folder_path
-        vtk_image_data, metadata = read_dicom_folder(self.import_folder_path)
-
-        if vtk_image_data and metadata:
-            self.viewer = ImageViewer2D(self.render_window, self.image_interactor, vtk_image_data, metadata)
-            self.viewer.set_viewer_type('Axial')
-            
-            middle_slice = self.viewer.get_count_of_slices() // 2
-            self.viewer.set_slice(middle_slice)
-            
-            self.interactor_style = AbstractInteractorStyle(self.viewer)
-            self.image_interactor.SetInteractorStyle(self.interactor_style)
-            self.image_interactor.Initialize()
-            self.render_window.Render()
+
+        cache_key = folder_cache_key(folder_path) if self.volume_cache is not None else None
+        if cache_key is not None:
+            cached = self.volume_cache.get(cache_key)
+            if cached is not None:
+                vtk_image_data, metadata = cached
+                self.build_viewer(vtk_image_data, metadata)
+                self.image_loaded.emit(metadata, vtk_image_data)
+                return
+
+        if self.progressive_loading:
+            self.loader = ProgressiveVolumeLoader(folder_path, focus_slice, self, disk_cache=self.disk_cache,
+                                                  lazy_threshold_bytes=self.lazy_threshold_bytes)
+            self.loader.first_slice_ready.connect(self.on_first_slice_ready)
+            self.loader.slice_loaded.connect(self.on_slice_loaded)
+        else:
+            self.loader = VolumeLoader(folder_path, self, disk_cache=self.disk_cache)
+        self.loader.cache_key = cache_key
+        self.loader.progress.connect(self.loading_progress)
+        self.loader.loaded.connect(self.on_volume_loaded)
+        self.loader.failed.connect(self.on_volume_failed)
+        self.loader.finished.connect(self.loader.deleteLater)
+        self.loader.start()
+
+    def cancel_loading(self):
+        if self.loader is not None:
+            self.loader.cancel()
+            self.loader = None
+
+    def on_first_slice_ready(self, vtk_image_data, metadata):
+        if self.sender() is self.loader:
+            self.build_viewer(vtk_image_data, metadata)
+
+    def on_slice_loaded(self, slice_index):
+        if self.sender() is not self.loader or self.viewer is None:
+            return
+        self.viewer.mark_slice_loaded(slice_index)
+        self.loader.set_focus_slice(self.viewer.get_slice())  # keep decoding around what is on screen
+
+    def on_volume_loaded(self, vtk_image_data, metadata):
+        if self.sender() is not self.loader:  # result of a cancelled load
+            self.release_volume(vtk_image_data, metadata)
+            return
+        if self.volume_cache is not None:
+            self.volume_cache.put(self.loader.cache_key, vtk_image_data, metadata)
+        self.loader = None
+        if self.viewer is None or self.viewer.vtk_image_data is not vtk_image_data:
+            self.build_viewer(vtk_image_data, metadata)
+        self.image_loaded.emit(metadata, vtk_image_data)
+
+    def on_volume_failed(self, folder_path):
+        if self.sender() is self.loader:
+            self.loader = None
+            print(f"Failed to load image data from {folder_path}.")
+
+    def show_volume(self, vtk_image_data, metadata):
+        """Display a volume derived from the loaded one (e.g. a filter result) in its place, at the same slice."""
+        if self.viewer is None:
+            self.build_viewer(vtk_image_data, metadata)
         else:
-            print("Failed to load image data.")
+            slice_index = self.viewer.get_slice()
+            previous = self.viewer.vtk_image_data, self.viewer.metadata
+            self.viewer.reset_image_viewer(vtk_image_data, metadata)
+            self.release_volume(*previous)
+            self.viewer.set_slice(min(slice_index, self.viewer.get_count_of_slices() - 1))
+        self.image_loaded.emit(metadata, vtk_image_data)
+
+    def release_volume(self, vtk_image_data, metadata):
+        """
+        Stop the read-ahead threads of a lazily decoded volume that is neither displayed nor
+        cached any more. Called when the viewer drops a volume and when the cache evicts one.
+        """
+        lazy_volume = metadata.get('lazy_volume')
+        if lazy_volume is None:
+            return
+        if self.viewer is not None and self.viewer.lazy_volume is lazy_volume:
+            return
+        if self.volume_cache is not None and self.volume_cache.holds(vtk_image_data):
+            return
+        lazy_volume.close()
+
+    def build_viewer(self, vtk_image_data, metadata):
+        previous = (self.viewer.vtk_image_data, self.viewer.metadata) if self.viewer is not None else None
+        self.viewer = ImageViewer2D(self.render_window, self.image_interactor, vtk_image_data, metadata)
+        if previous is not None:
+            self.release_volume(*previous)
+        self.viewer.set_viewer_type('Axial')
+
+        initial_slice = metadata.get('initial_slice', self.viewer.get_count_of_slices() // 2)
+        self.viewer.set_slice(initial_slice)
+
+        self.interactor_style = AbstractInteractorStyle(self.viewer)
+        self.image_interactor.SetInteractorStyle(self.interactor_style)
+        self.image_interactor.Initialize()
+        self.render_window.Render()
 
     def set_slice(self, slice_index):
         if self.viewer:
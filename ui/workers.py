@@ -0,0 +1,232 @@
+import threading
+import time
+import SimpleITK as sitk
+from PySide6.QtCore import QThread, Signal
+
+from utils import (
+    read_dicom_folder, scan_dicom_metadata, read_dicom_slice, allocate_progressive_volume,
+    windows_levels_from_table, estimate_series_bytes, LazySliceVolume, LoadCancelled, VolumeHistogram,
+)
+
+
+class VolumeLoader(QThread):
+    """Reads a DICOM folder on a worker thread. Results are delivered through queued signals."""
+    progress = Signal(str, int, int)  # stage, done slices, total slices
+    loaded = Signal(object, object)  # vtkImageData, metadata dict (object keeps it uncopied)
+    failed = Signal(str)
+    cancelled = Signal()
+
+    def __init__(self, folder_path, parent=None, disk_cache=None):
+        super().__init__(parent)
+        self.folder_path = folder_path
+        self.disk_cache = disk_cache  # optional utils.DiskVolumeCache
+        self.cancel_event = threading.Event()
+
+    def cancel(self):
+        """Ask the loader to stop; it exits at the next slice boundary."""
+        self.cancel_event.set()
+
+    def is_cancelled(self):
+        return self.cancel_event.is_set()
+
+    def run(self):
+        try:
+            vtk_image_data, metadata = read_dicom_folder(self.folder_path,
+                                                         progress_callback=self.progress.emit,
+                                                         cancel_event=self.cancel_event,
+                                                         disk_cache=self.disk_cache)
+        except LoadCancelled:
+            self.cancelled.emit()
+            return
+
+        if self.is_cancelled():
+            self.cancelled.emit()
+        elif vtk_image_data and metadata:
+            self.loaded.emit(vtk_image_data, metadata)
+        else:
+            self.failed.emit(self.folder_path)
+
+
+class ProgressiveVolumeLoader(VolumeLoader):
+    """
+    Decodes the focus slice first (the middle one by default) and hands out a preallocated volume
+    right away via first_slice_ready. The remaining slices are decoded into it in order of distance
+    from the focus slice, which can be moved while loading with set_focus_slice.
+
+    Series larger than lazy_threshold_bytes are not materialized at all: loaded delivers the
+    slice image of a LazySliceVolume (metadata['lazy_volume']) that decodes slices on demand.
+    metadata['timings'] holds the seconds spent in each loading stage, as for read_dicom_folder;
+    'first_slice' is the time until first_slice_ready.
+    """
+    first_slice_ready = Signal(object, object)  # vtkImageData (partially filled), metadata dict
+    slice_loaded = Signal(int)
+
+    def __init__(self, folder_path, focus_slice=None, parent=None, disk_cache=None, lazy_threshold_bytes=None):
+        super().__init__(folder_path, parent, disk_cache)
+        self.focus_slice = focus_slice
+        self.lazy_threshold_bytes = lazy_threshold_bytes
+
+    def set_focus_slice(self, slice_index):
+        self.focus_slice = slice_index
+
+    def run(self):
+        try:
+            self.load_progressively()
+        except LoadCancelled:
+            self.cancelled.emit()
+        except Exception as e:
+            print(f"An error occurred while reading DICOM folder: {e}")
+            self.failed.emit(self.folder_path)
+
+    def load_progressively(self):
+        start = time.perf_counter()
+        dicom_names = sitk.ImageSeriesReader.GetGDCMSeriesFileNames(self.folder_path)
+        if not dicom_names:
+            print(f"No DICOM files found in {self.folder_path}")
+            self.failed.emit(self.folder_path)
+            return
+        count = len(dicom_names)
+        timings = {'file_discovery': time.perf_counter() - start}
+
+        cache_key = self.disk_cache.make_key(dicom_names) if self.disk_cache is not None else None
+        if cache_key is not None:
+            stage_start = time.perf_counter()
+            cached = self.disk_cache.load(cache_key)
+            if cached is not None:  # memory-mapped, nothing to stream in
+                vtk_image_data, metadata = cached
+                timings['disk_cache_load'] = time.perf_counter() - stage_start
+                timings['total'] = time.perf_counter() - start
+                metadata['timings'] = timings
+                self.loaded.emit(vtk_image_data, metadata)
+                return
+
+        stage_start = time.perf_counter()
+        slice_table = scan_dicom_metadata(dicom_names, cancel_event=self.cancel_event,
+                                          progress_callback=lambda done, total: self.progress.emit(
+                                              'metadata_scan', done, total))
+        timings['metadata_scan'] = time.perf_counter() - stage_start
+
+        if self.focus_slice is None or not 0 <= self.focus_slice < count:
+            self.focus_slice = count // 2
+        first_index = self.focus_slice
+
+        if self.lazy_threshold_bytes is not None and estimate_series_bytes(dicom_names) > self.lazy_threshold_bytes:
+            stage_start = time.perf_counter()
+            lazy_volume = LazySliceVolume(dicom_names, slice_table, first_index)
+            timings['first_slice'] = time.perf_counter() - stage_start
+            timings['total'] = time.perf_counter() - start
+            metadata = {
+                'windows_levels': windows_levels_from_table(slice_table),
+                'slice_table': slice_table,
+                'orientation': lazy_volume.orientation,
+                'lazy_volume': lazy_volume,
+                'histogram': lazy_volume.histogram,  # covers the slices decoded so far
+                'initial_slice': first_index,
+                'timings': timings,
+            }
+            self.loaded.emit(lazy_volume.slice_image, metadata)
+            return
+
+        stage_start = time.perf_counter()
+        volume, vtk_image_data, orientation = allocate_progressive_volume(dicom_names, slice_table, first_index)
+        loaded_slices = [False] * count
+        loaded_slices[first_index] = True
+        histogram = VolumeHistogram.for_dtype(volume.dtype, sample=volume[first_index])
+        histogram.add_slice(volume[first_index])
+        metadata = {
+            'windows_levels': windows_levels_from_table(slice_table),
+            'slice_table': slice_table,
+            'orientation': orientation,
+            'loaded_slices': loaded_slices,
+            'histogram': histogram,  # streams in with the slices
+            'initial_slice': first_index,
+            'timings': timings,
+        }
+        timings['first_slice'] = time.perf_counter() - stage_start
+        self.first_slice_ready.emit(vtk_image_data, metadata)
+        self.progress.emit('series_read', 1, count)
+
+        pending = [index for index in range(count) if index != first_index]
+        ordered_for = None
+        done = 1
+        timings['series_read'] = timings['histogram'] = 0.0  # the two alternate per slice
+        while pending:
+            if self.is_cancelled():
+                raise LoadCancelled()
+
+            focus = self.focus_slice
+            if focus != ordered_for:  # nearest slices last, so pop() takes the closest one
+                pending.sort(key=lambda index: abs(index - focus), reverse=True)
+                ordered_for = focus
+
+            slice_index = pending.pop()
+            stage_start = time.perf_counter()
+            volume[slice_index] = read_dicom_slice(dicom_names[slice_index])
+            read_end = time.perf_counter()
+            histogram.add_slice(volume[slice_index])
+            timings['series_read'] += read_end - stage_start
+            timings['histogram'] += time.perf_counter() - read_end
+            loaded_slices[slice_index] = True
+            done += 1
+            self.slice_loaded.emit(slice_index)
+            self.progress.emit('series_read', done, count)
+
+        timings['total'] = time.perf_counter() - start
+        self.loaded.emit(vtk_image_data, metadata)
+        if cache_key is not None:  # after the volume is handed out, so writing it adds no load time
+            stage_start = time.perf_counter()
+            self.disk_cache.store(cache_key, volume, vtk_image_data, metadata)
+            timings['disk_cache_store'] = time.perf_counter() - stage_start
+
+
+class TaskWorker(QThread):
+    """
+    Runs function(*args, progress_callback=..., cancel_event=..., **kwargs) on a worker thread,
+    e.g. a volume filter. The return value is delivered through result_ready.
+    """
+    progress = Signal(int, int)  # done, total
+    result_ready = Signal(object)
+    failed = Signal(str)
+    cancelled = Signal()
+
+    def __init__(self, function, *args, parent=None, **kwargs):
+        super().__init__(parent)
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+        self.cancel_event = threading.Event()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def is_cancelled(self):
+        return self.cancel_event.is_set()
+
+    def run(self):
+        try:
+            result = self.function(*self.args, progress_callback=self.progress.emit,
+                                   cancel_event=self.cancel_event, **self.kwargs)
+        except LoadCancelled:
+            self.cancelled.emit()
+            return
+        except Exception as e:
+            print(f"An error occurred while running {getattr(self.function, '__name__', 'task')}: {e}")
+            self.failed.emit(str(e))
+            return
+
+        if self.is_cancelled():
+            self.cancelled.emit()
+        else:
+            self.result_ready.emit(result)
+
+
+class InferenceWorker(TaskWorker):
+    """
+    TaskWorker for inference.sliding_window_inference: the labels of each finished slab of slices
+    arrive through partial_result while the rest is still running.
+    """
+    partial_result = Signal(int, object)  # first slice index, (slices, y, x) labels
+
+    def __init__(self, function, *args, parent=None, **kwargs):
+        super().__init__(function, *args, parent=parent, **kwargs)
+        self.kwargs['partial_callback'] = self.partial_result.emit
@@ -2,10 +2,49 @@ from .image_utils import (
     get_orientation_label,
     determine_orientation,
     convert_itk2vtk,
+    numpy_to_vtk_image,
 )
 
 from .io_utils import (
     read_dicom_folder,
+    read_dicom_series,
     read_nifti,
     get_window_level_from_dicom,
+    scan_dicom_metadata,
+    LoadCancelled,
+    read_dicom_slice,
+    estimate_series_bytes,
+    allocate_progressive_volume,
+    series_geometry,
+    windows_levels_from_table,
+    WINDOW_LEVEL_DTYPE,
+)
+
+from .volume_cache import (
+    VolumeCache,
+    folder_cache_key,
+    get_series_uid,
+)
+
+from .disk_cache import DiskVolumeCache
+
+from .dicom_index import DicomIndex
+
+from .lazy_volume import LazySliceVolume
+
+from .histogram import VolumeHistogram, WINDOW_PRESETS
+
+from .clahe import clahe_slice, clahe_volume
+
+from .filter_graph import (
+    SourceNode,
+    FilterNode,
+    GaussianSmoothing,
+    MedianSmoothing,
+    Resample,
+    Threshold,
+    Normalize,
+    Clahe,
+    FILTERS,
+    apply_filter_graph,
 )
@@ -0,0 +1,136 @@
+import os
+import multiprocessing
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+from .io_utils import LoadCancelled
+
+
+def _tile_edges(size, tiles):
+    return np.linspace(0, size, tiles + 1).round().astype(np.intp)
+
+
+def clahe_slice(slice_array: np.ndarray, value_range, clip_limit=0.01, tile_grid=(8, 8), bins=256):
+    """
+    Contrast limited adaptive histogram equalization of a 2D slice, returned as float32 in value_range.
+    Each tile gets its own clipped-histogram mapping; every pixel blends the mappings of the four
+    nearest tile centres bilinearly (the nearest tile(s) only along the border), so no tile seams.
+    clip_limit is the largest share of a tile's pixels one bin may hold before the excess is spread.
+    """
+    low, high = value_range
+    scale = (bins - 1) / (high - low) if high > low else 0.0
+    levels = (slice_array.astype(np.float32) - low) * scale
+    np.clip(levels, 0, bins - 1, out=levels)
+    levels = levels.astype(np.intp)
+
+    rows, columns = levels.shape
+    tiles_y, tiles_x = min(tile_grid[0], rows), min(tile_grid[1], columns)
+    y_edges, x_edges = _tile_edges(rows, tiles_y), _tile_edges(columns, tiles_x)
+
+    mappings = np.empty((tiles_y, tiles_x, bins), dtype=np.float32)
+    for tile_y in range(tiles_y):
+        for tile_x in range(tiles_x):
+            tile = levels[y_edges[tile_y]:y_edges[tile_y + 1], x_edges[tile_x]:x_edges[tile_x + 1]]
+            histogram = np.bincount(tile.ravel(), minlength=bins).astype(np.float64)
+            limit = max(clip_limit * tile.size, tile.size / bins)
+            excess = np.maximum(histogram - limit, 0.0).sum()
+            np.minimum(histogram, limit, out=histogram)
+            histogram += excess / bins
+            cdf = np.cumsum(histogram)
+            mappings[tile_y, tile_x] = cdf / cdf[-1]
+
+    # fractional tile coordinate of every row / column, clamped to the outer tile centres
+    y_centres = (y_edges[:-1] + y_edges[1:] - 1) / 2.0
+    x_centres = (x_edges[:-1] + x_edges[1:] - 1) / 2.0
+    tile_ys = np.interp(np.arange(rows), y_centres, np.arange(tiles_y))
+    tile_xs = np.interp(np.arange(columns), x_centres, np.arange(tiles_x))
+    y0 = tile_ys.astype(np.intp)
+    x0 = tile_xs.astype(np.intp)
+    y1 = np.minimum(y0 + 1, tiles_y - 1)
+    x1 = np.minimum(x0 + 1, tiles_x - 1)
+    weight_y = (tile_ys - y0).astype(np.float32)[:, None]
+    weight_x = (tile_xs - x0).astype(np.float32)[None, :]
+
+    top = mappings[y0[:, None], x0[None, :], levels] * (1 - weight_x) + mappings[y0[:, None], x1[None, :], levels] * weight_x
+    bottom = mappings[y1[:, None], x0[None, :], levels] * (1 - weight_x) + mappings[y1[:, None], x1[None, :], levels] * weight_x
+    equalized = top * (1 - weight_y) + bottom * weight_y
+    return low + equalized * (high - low)
+
+
+def _equalize_slices(volume, result, start, stop, parameters):
+    integer = result.dtype.kind in 'iu'
+    for index in range(start, stop):
+        equalized = clahe_slice(volume[index], **parameters)
+        result[index] = np.rint(equalized) if integer else equalized
+    return stop - start
+
+
+def _clahe_slab(input_name, output_name, shape, dtype, start, stop, parameters):
+    """Process pool task: equalize slices [start, stop) of the shared input into the shared output."""
+    input_memory = shared_memory.SharedMemory(name=input_name)
+    output_memory = shared_memory.SharedMemory(name=output_name)
+    try:
+        volume = np.ndarray(shape, dtype=dtype, buffer=input_memory.buf)
+        result = np.ndarray(shape, dtype=dtype, buffer=output_memory.buf)
+        _equalize_slices(volume, result, start, stop, parameters)
+        del volume, result  # release the buffers before closing
+    finally:
+        input_memory.close()
+        output_memory.close()
+    return stop - start
+
+
+def clahe_volume(volume: np.ndarray, clip_limit=0.01, tile_grid=(8, 8), bins=256, value_range=None,
+                 max_workers=None, slab_slices=None, progress_callback=None, cancel_event=None) -> np.ndarray:
+    """
+    CLAHE of every axial slice of a (z, y, x) volume on a process pool. The volume is placed in
+    shared memory once and the workers read and write slabs of slices in place, so no slab is
+    pickled. One value_range (default: the volume's min/max) is used for all slices.
+    With a single worker the slices are equalized in this process (no pool start-up).
+    progress_callback(done, total) counts slices; cancel_event raises LoadCancelled.
+    """
+    if value_range is None:
+        value_range = (float(np.min(volume)), float(np.max(volume)))
+    max_workers = max_workers or os.cpu_count() or 1
+    slab_slices = slab_slices or max(1, -(-len(volume) // (max_workers * 4)))  # a few slabs per worker
+    parameters = {'value_range': value_range, 'clip_limit': clip_limit, 'tile_grid': tile_grid, 'bins': bins}
+
+    if max_workers == 1:
+        result = np.empty_like(volume)
+        for start in range(0, len(volume), slab_slices):
+            if cancel_event is not None and cancel_event.is_set():
+                raise LoadCancelled()
+            stop = min(start + slab_slices, len(volume))
+            _equalize_slices(volume, result, start, stop, parameters)
+            if progress_callback:
+                progress_callback(stop, len(volume))
+        return result
+
+    input_memory = shared_memory.SharedMemory(create=True, size=max(volume.nbytes, 1))
+    output_memory = shared_memory.SharedMemory(create=True, size=max(volume.nbytes, 1))
+    try:
+        np.ndarray(volume.shape, dtype=volume.dtype, buffer=input_memory.buf)[:] = volume
+
+        # spawn: workers must not inherit the GUI's threads and locks
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+            futures = [
+                executor.submit(_clahe_slab, input_memory.name, output_memory.name, volume.shape, volume.dtype.str,
+                                start, min(start + slab_slices, len(volume)), parameters)
+                for start in range(0, len(volume), slab_slices)
+            ]
+            done = 0
+            for future in as_completed(futures):
+                if cancel_event is not None and cancel_event.is_set():
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    raise LoadCancelled()
+                done += future.result()
+                if progress_callback:
+                    progress_callback(done, len(volume))
+
+        return np.ndarray(volume.shape, dtype=volume.dtype, buffer=output_memory.buf).copy()
+    finally:
+        for memory in (input_memory, output_memory):
+            memory.close()
+            memory.unlink()
+
@@ -0,0 +1,255 @@
+import os
+import sqlite3
+from contextlib import closing
+from concurrent.futures import ThreadPoolExecutor
+
+import pydicom
+
+
+DEFAULT_INDEX_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'ai-medical', 'dicom_index.sqlite')
+
+INDEX_TAGS = [
+    'PatientID', 'PatientName',
+    'StudyInstanceUID', 'StudyDate', 'StudyDescription',
+    'SeriesInstanceUID', 'SeriesNumber', 'SeriesDescription', 'Modality',
+    'SOPInstanceUID', 'InstanceNumber', 'ImagePositionPatient', 'ImageOrientationPatient',
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS patients (
+    patient_id TEXT PRIMARY KEY,
+    patient_name TEXT
+);
+CREATE TABLE IF NOT EXISTS studies (
+    study_uid TEXT PRIMARY KEY,
+    patient_id TEXT,
+    study_date TEXT,
+    study_description TEXT
+);
+CREATE TABLE IF NOT EXISTS series (
+    series_uid TEXT PRIMARY KEY,
+    study_uid TEXT,
+    series_number INTEGER,
+    series_description TEXT,
+    modality TEXT
+);
+-- one row per file; series_uid is NULL for files that are not DICOM, so rescans skip them too
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER,
+    size INTEGER,
+    series_uid TEXT,
+    sop_instance_uid TEXT,
+    instance_number INTEGER,
+    slice_position REAL  -- ImagePositionPatient along the slice normal, the slice order
+);
+CREATE INDEX IF NOT EXISTS files_by_series ON files (series_uid, slice_position);
+CREATE INDEX IF NOT EXISTS series_by_study ON series (study_uid);
+CREATE INDEX IF NOT EXISTS studies_by_patient ON studies (patient_id);
+"""
+
+
+def _walk_files(folder_path):
+    """[(path, mtime_ns, size)] of all files below folder_path."""
+    found = []
+    pending = [folder_path]
+    while pending:
+        try:
+            entries = list(os.scandir(pending.pop()))
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                pending.append(entry.path)
+            elif entry.is_file():
+                stat = entry.stat()
+                found.append((entry.path, stat.st_mtime_ns, stat.st_size))
+    return found
+
+
+def _slice_position(meta_dicom):
+    """ImagePositionPatient projected onto the slice normal (row x column direction), None if either is missing."""
+    position = meta_dicom.get('ImagePositionPatient')
+    orientation = meta_dicom.get('ImageOrientationPatient')
+    try:
+        position = [float(value) for value in position]
+        orientation = [float(value) for value in orientation]
+    except (TypeError, ValueError):
+        return None
+    if len(position) != 3 or len(orientation) != 6:
+        return None
+    (rx, ry, rz), (cx, cy, cz) = orientation[:3], orientation[3:]
+    normal = (ry * cz - rz * cy, rz * cx - rx * cz, rx * cy - ry * cx)
+    return sum(p * n for p, n in zip(position, normal))
+
+
+def _read_index_header(file):
+    """Header fields used by the index (pixel data is not read), or None if file is not DICOM."""
+    try:
+        meta_dicom = pydicom.dcmread(file, stop_before_pixels=True, specific_tags=INDEX_TAGS)
+    except (pydicom.errors.InvalidDicomError, OSError, ValueError):
+        return None
+    if 'SeriesInstanceUID' not in meta_dicom:
+        return None
+
+    def get_int(keyword):
+        try:
+            return int(meta_dicom.get(keyword))
+        except (TypeError, ValueError):
+            return None
+
+    return {
+        'patient_id': str(meta_dicom.get('PatientID', '')),
+        'patient_name': str(meta_dicom.get('PatientName', '')),
+        'study_uid': str(meta_dicom.get('StudyInstanceUID', '')),
+        'study_date': str(meta_dicom.get('StudyDate', '')),
+        'study_description': str(meta_dicom.get('StudyDescription', '')),
+        'series_uid': str(meta_dicom.SeriesInstanceUID),
+        'series_number': get_int('SeriesNumber'),
+        'series_description': str(meta_dicom.get('SeriesDescription', '')),
+        'modality': str(meta_dicom.get('Modality', '')),
+        'sop_instance_uid': str(meta_dicom.get('SOPInstanceUID', '')),
+        'instance_number': get_int('InstanceNumber'),
+        'slice_position': _slice_position(meta_dicom),
+    }
+
+
+class DicomIndex:
+    """
+    Patient/study/series/instance index of DICOM directory trees in a local SQLite database.
+    Only headers are read; a rescan re-reads only files whose mtime or size changed.
+    """
+
+    def __init__(self, db_path=DEFAULT_INDEX_PATH, batch_size=500):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        with closing(self.connect()) as connection:
+            columns = [row['name'] for row in connection.execute("PRAGMA table_info(files)")]
+            if columns and 'slice_position' not in columns:  # index written before slice positions were kept
+                connection.execute("DROP INDEX IF EXISTS files_by_series")
+                connection.execute("ALTER TABLE files ADD COLUMN slice_position REAL")
+                connection.execute("DELETE FROM files")  # re-read on the next index_tree
+                connection.commit()
+            connection.executescript(SCHEMA)
+
+    def connect(self):
+        # a connection per call keeps the index usable from the GUI and from loader threads
+        connection = sqlite3.connect(self.db_path)
+        connection.row_factory = sqlite3.Row
+        connection.execute('PRAGMA journal_mode=WAL')
+        return connection
+
+    def index_tree(self, root_path, max_workers=None, progress_callback=None, cancel_event=None):
+        """
+        Index (or incrementally re-index) every file below root_path.
+        progress_callback(done, total) counts the files that needed their header read.
+        Returns {'scanned', 'updated', 'removed'} file counts.
+        """
+        root_path = os.path.abspath(root_path)
+        root_entries = list(os.scandir(root_path))
+        top_level = [entry.path for entry in root_entries if entry.is_dir(follow_symlinks=False)]
+        found = [(entry.path, entry.stat().st_mtime_ns, entry.stat().st_size)
+                 for entry in root_entries if entry.is_file()]
+        updated = 0
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for files in executor.map(_walk_files, top_level):
+                found.extend(files)
+
+            with closing(self.connect()) as connection:
+                prefix = os.path.join(root_path, '')
+                known = {
+                    row['path']: (row['mtime_ns'], row['size'])
+                    for row in connection.execute(
+                        "SELECT path, mtime_ns, size FROM files WHERE substr(path, 1, ?) = ?",
+                        (len(prefix), prefix))
+                }
+                changed = [(path, mtime_ns, size) for path, mtime_ns, size in found
+                           if known.get(path) != (mtime_ns, size)]
+                removed = known.keys() - {path for path, _, _ in found}
+
+                batch = []
+                for done, (header, (path, mtime_ns, size)) in enumerate(
+                        zip(executor.map(_read_index_header, [path for path, _, _ in changed]), changed), start=1):
+                    if cancel_event is not None and cancel_event.is_set():
+                        executor.shutdown(wait=False, cancel_futures=True)
+                        break
+                    batch.append((path, mtime_ns, size, header))
+                    updated += 1
+                    if len(batch) >= self.batch_size:
+                        self._write_batch(connection, batch)
+                        batch = []
+                    if progress_callback:
+                        progress_callback(done, len(changed))
+                self._write_batch(connection, batch)
+
+                connection.executemany("DELETE FROM files WHERE path = ?", [(path,) for path in removed])
+                self._prune(connection)
+                connection.commit()
+
+        return {'scanned': len(found), 'updated': updated, 'removed': len(removed)}
+
+    def _write_batch(self, connection, batch):
+        for path, mtime_ns, size, header in batch:
+            if header is None:
+                connection.execute(
+                    "INSERT OR REPLACE INTO files VALUES (?, ?, ?, NULL, NULL, NULL, NULL)", (path, mtime_ns, size))
+                continue
+            connection.execute(
+                "INSERT OR REPLACE INTO patients VALUES (:patient_id, :patient_name)", header)
+            connection.execute(
+                "INSERT OR REPLACE INTO studies VALUES (:study_uid, :patient_id, :study_date, :study_description)",
+                header)
+            connection.execute(
+                "INSERT OR REPLACE INTO series "
+                "VALUES (:series_uid, :study_uid, :series_number, :series_description, :modality)", header)
+            connection.execute(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (path, mtime_ns, size, header['series_uid'], header['sop_instance_uid'], header['instance_number'],
+                 header['slice_position']))
+        connection.commit()
+
+    @staticmethod
+    def _prune(connection):
+        """Remove series/studies/patients that no longer have any file."""
+        connection.execute("DELETE FROM series WHERE series_uid NOT IN "
+                           "(SELECT DISTINCT series_uid FROM files WHERE series_uid IS NOT NULL)")
+        connection.execute("DELETE FROM studies WHERE study_uid NOT IN (SELECT DISTINCT study_uid FROM series)")
+        connection.execute("DELETE FROM patients WHERE patient_id NOT IN (SELECT DISTINCT patient_id FROM studies)")
+
+    def _query(self, sql, parameters=()):
+        with closing(self.connect()) as connection:
+            return [dict(row) for row in connection.execute(sql, parameters)]
+
+    def patients(self):
+        return self._query(
+            "SELECT p.*, COUNT(s.study_uid) AS study_count FROM patients p "
+            "LEFT JOIN studies s ON s.patient_id = p.patient_id GROUP BY p.patient_id ORDER BY p.patient_name")
+
+    def studies(self, patient_id=None):
+        sql = ("SELECT st.*, COUNT(se.series_uid) AS series_count FROM studies st "
+               "LEFT JOIN series se ON se.study_uid = st.study_uid")
+        if patient_id is None:
+            return self._query(sql + " GROUP BY st.study_uid ORDER BY st.study_date")
+        return self._query(sql + " WHERE st.patient_id = ? GROUP BY st.study_uid ORDER BY st.study_date",
+                           (patient_id,))
+
+    def series(self, study_uid=None):
+        sql = ("SELECT se.*, COUNT(f.path) AS instance_count FROM series se "
+               "LEFT JOIN files f ON f.series_uid = se.series_uid")
+        if study_uid is None:
+            return self._query(sql + " GROUP BY se.series_uid ORDER BY se.series_number")
+        return self._query(sql + " WHERE se.study_uid = ? GROUP BY se.series_uid ORDER BY se.series_number",
+                           (study_uid,))
+
+    def series_files(self, series_uid):
+        """
+        File paths of a series in slice order, ready for read_dicom_series: by ImagePositionPatient
+        along the slice normal. Files without a position come last, by instance number.
+        """
+        rows = self._query("SELECT path FROM files WHERE series_uid = ? "
+                           "ORDER BY slice_position IS NULL, slice_position, instance_number, path",
+                           (series_uid,))
+        return [row['path'] for row in rows]
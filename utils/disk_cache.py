@@ -0,0 +1,136 @@
+import os
+import json
+import hashlib
+
+import numpy as np
+import vtkmodules.all as vtk
+from .image_utils import numpy_to_vtk_image
+from .io_utils import windows_levels_from_table
+from .histogram import VolumeHistogram
+
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'ai-medical', 'volumes')
+
+
+class DiskVolumeCache:
+    """
+    Decoded volumes on local disk: <key>.raw holds the C-ordered (z, y, x) voxels,
+    <key>.json the geometry/orientation, <key>.table.npy the per-slice table (window levels are
+    derived from it again on load) and <key>.hist.npy the counts of the volume histogram.
+    Volumes are reloaded with np.memmap, so nothing is decoded or copied up front.
+    The key covers the file list with mtimes and sizes; the total size is bounded by max_bytes
+    with least-recently-used entries removed first.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=20 * 1024 ** 3):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(dicom_names):
+        digest = hashlib.sha1()
+        for name in dicom_names:
+            stat = os.stat(name)
+            digest.update(f"{os.path.abspath(name)}|{stat.st_mtime_ns}|{stat.st_size}\n".encode())
+        return digest.hexdigest()
+
+    def paths(self, key):
+        base = os.path.join(self.cache_dir, key)
+        return base + '.raw', base + '.json', base + '.table.npy', base + '.hist.npy'
+
+    def load(self, key):
+        """Return (vtk_image_data, metadata) backed by a memory map, or None on a miss."""
+        raw_path, sidecar_path, table_path, histogram_path = self.paths(key)
+        try:
+            with open(sidecar_path, 'r') as sidecar_file:
+                sidecar = json.load(sidecar_file)
+            # copy-on-write: pages are shared with the page cache, and the cache file is never modified
+            volume = np.memmap(raw_path, dtype=np.dtype(sidecar['dtype']), mode='c', shape=tuple(sidecar['shape']))
+        except (FileNotFoundError, ValueError, KeyError) as e:
+            if not isinstance(e, FileNotFoundError):
+                print(f"Discarding unreadable cache entry {key}: {e}")
+                self.remove(key)
+            return None
+
+        os.utime(sidecar_path)  # mark as recently used
+        vtk_image = numpy_to_vtk_image(volume, sidecar['spacing'], sidecar['origin'], owner=volume)
+        metadata = {'orientation': sidecar['orientation']}
+        if os.path.exists(table_path):
+            metadata['slice_table'] = np.load(table_path)
+            metadata['windows_levels'] = windows_levels_from_table(metadata['slice_table'])
+        if 'histogram' in sidecar and os.path.exists(histogram_path):
+            metadata['histogram'] = VolumeHistogram.from_state(sidecar['histogram'], np.load(histogram_path))
+        else:  # entry written before histograms were cached
+            metadata['histogram'] = VolumeHistogram.from_volume(volume)
+        return vtk_image, metadata
+
+    def store(self, key, volume: np.ndarray, vtk_image_data: vtk.vtkImageData, metadata):
+        """Write volume (the array behind vtk_image_data) and its metadata, then enforce max_bytes."""
+        if volume.nbytes > self.max_bytes:
+            return
+        raw_path, sidecar_path, table_path, histogram_path = self.paths(key)
+        sidecar = {
+            'dtype': volume.dtype.str,
+            'shape': list(volume.shape),
+            'spacing': list(vtk_image_data.GetSpacing()),
+            'origin': list(vtk_image_data.GetOrigin()),
+            'orientation': metadata.get('orientation'),
+        }
+        try:
+            # write under temporary names first so a crash never leaves a half-written entry behind
+            np.ascontiguousarray(volume).tofile(raw_path + '.tmp')
+            os.replace(raw_path + '.tmp', raw_path)
+            if metadata.get('slice_table') is not None:
+                with open(table_path + '.tmp', 'wb') as table_file:
+                    np.save(table_file, metadata['slice_table'])
+                os.replace(table_path + '.tmp', table_path)
+            if metadata.get('histogram') is not None:
+                sidecar['histogram'], counts = metadata['histogram'].state()
+                with open(histogram_path + '.tmp', 'wb') as histogram_file:
+                    np.save(histogram_file, counts)
+                os.replace(histogram_path + '.tmp', histogram_path)
+            with open(sidecar_path + '.tmp', 'w') as sidecar_file:
+                json.dump(sidecar, sidecar_file)
+            os.replace(sidecar_path + '.tmp', sidecar_path)
+        except OSError as e:
+            print(f"Could not write volume cache entry {key}: {e}")
+            self.remove(key)
+            return
+        self.evict_to(self.max_bytes)
+
+    def remove(self, key):
+        for path in self.paths(key):
+            for candidate in (path, path + '.tmp'):
+                if os.path.exists(candidate):
+                    os.remove(candidate)
+
+    def entries(self):
+        """[(last used time, key, size in bytes)] for complete entries, oldest first."""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.json'):
+                continue
+            key = name[:-len('.json')]
+            raw_path, sidecar_path, *optional_paths = self.paths(key)
+            try:
+                size = os.path.getsize(raw_path) + os.path.getsize(sidecar_path)
+                for path in optional_paths:
+                    if os.path.exists(path):
+                        size += os.path.getsize(path)
+                entries.append((os.path.getmtime(sidecar_path), key, size))
+            except FileNotFoundError:
+                continue
+        return sorted(entries)
+
+    def total_bytes(self):
+        return sum(size for _, _, size in self.entries())
+
+    def evict_to(self, max_bytes):
+        entries = self.entries()
+        total = sum(size for _, _, size in entries)
+        for _, key, size in entries:
+            if total <= max_bytes:
+                break
+            self.remove(key)
+            total -= size
@@ -0,0 +1,307 @@
+import math
+import uuid
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+import SimpleITK as sitk
+import vtkmodules.all as vtk
+from vtkmodules.util import numpy_support
+from .io_utils import LoadCancelled
+from .image_utils import convert_itk2vtk
+from .histogram import VolumeHistogram
+from .clahe import clahe_volume
+
+
+class SourceNode:
+    """
+    Root of a filter graph: a (z, y, x) volume with its geometry. sitk.Images are built from it
+    per slab, or for the whole volume when a full run starts, so it is not duplicated up front.
+    Its key identifies the volume (e.g. a DiskVolumeCache key); by default every SourceNode gets a new one.
+    """
+
+    def __init__(self, volume: np.ndarray, spacing, origin, key=None):
+        self.volume = volume
+        self.spacing = tuple(spacing)
+        self.origin = tuple(origin)
+        self._key = key or uuid.uuid4().hex
+        self._value_range = None
+
+    @classmethod
+    def from_vtk(cls, vtk_image_data: vtk.vtkImageData, key=None):
+        dims = vtk_image_data.GetDimensions()
+        volume = numpy_support.vtk_to_numpy(vtk_image_data.GetPointData().GetScalars()).reshape(dims[::-1])
+        return cls(volume, vtk_image_data.GetSpacing(), vtk_image_data.GetOrigin(), key)
+
+    def key(self):
+        return self._key
+
+    def source(self):
+        return self
+
+    def z_radius(self):
+        return 0
+
+    def depth(self):
+        return len(self.volume)
+
+    def value_range(self):
+        if self._value_range is None:
+            self._value_range = (float(np.min(self.volume)), float(np.max(self.volume)))
+        return self._value_range
+
+    def output_spacing(self):
+        return self.spacing
+
+    def physical_point(self, slice_index):
+        return self.origin[0], self.origin[1], self.origin[2] + slice_index * self.spacing[2]
+
+    def evaluate(self):
+        return self.evaluate_slab(0, self.depth())
+
+    def evaluate_slab(self, start, stop, cancel_event=None):
+        image = sitk.GetImageFromArray(self.volume[start:stop])
+        image.SetSpacing(self.spacing)
+        image.SetOrigin(self.physical_point(start))
+        return image
+
+
+class FilterNode:
+    """
+    One step of a filter graph on sitk.Images. Subclasses implement apply(image) and, for 3D
+    kernels, slice_radius(spacing): how many neighbouring slices one output slice depends on.
+
+    Outputs are cached per node under a Merkle-style key: a hash of the node type, its parameters
+    and the key of its upstream node. Changing a parameter changes the keys of this node and of
+    everything downstream, while upstream nodes keep theirs and answer from their caches; nodes
+    sharing an upstream node form a tree. A node keeps its latest full-volume output and up to
+    cache_entries slab outputs (previews), so scrolling a preview never evicts a full result.
+    """
+    name = 'filter'
+
+    def __init__(self, upstream, cache_entries=8, **parameters):
+        self.upstream = upstream
+        self.parameters = parameters
+        self.cache_entries = cache_entries
+        self.cache = OrderedDict()  # (key, (start, stop)) -> sitk.Image of a slab
+        self.full_output = (None, None)  # (key, sitk.Image)
+        self.computed = 0
+        self.hits = 0
+
+    def set_parameters(self, **parameters):
+        self.parameters.update(parameters)
+
+    def key(self):
+        digest = hashlib.sha1()
+        digest.update(type(self).__name__.encode())
+        digest.update(repr(sorted(self.parameters.items())).encode())
+        digest.update(self.upstream.key().encode())
+        return digest.hexdigest()
+
+    def source(self):
+        return self.upstream.source()
+
+    def chain(self):
+        """Nodes from the first filter down to this one."""
+        nodes = [] if isinstance(self.upstream, SourceNode) else self.upstream.chain()
+        return nodes + [self]
+
+    def slice_radius(self, spacing):
+        return 0
+
+    def value_range(self):
+        """(min, max) of the full-volume output when known without computing it, else None."""
+        return self.upstream.value_range()  # true for smoothing and linear resampling
+
+    def output_spacing(self):
+        return self.upstream.output_spacing()
+
+    def z_radius(self):
+        """Neighbouring source slices one output slice depends on, through the whole chain."""
+        return self.slice_radius(self.source().spacing) + self.upstream.z_radius()
+
+    def apply(self, image: sitk.Image) -> sitk.Image:
+        raise NotImplementedError
+
+    def evaluate(self):
+        """Full-volume output."""
+        key = self.key()
+        if self.full_output[0] == key:
+            self.hits += 1
+            return self.full_output[1]
+        output = self.apply(self.upstream.evaluate())
+        self.computed += 1
+        self.full_output = (key, output)
+        return output
+
+    def evaluate_slab(self, start, stop, cancel_event=None):
+        """
+        Output for source slices [start, stop) only; exact away from the slab ends.
+        cancel_event is checked before each node of the chain computes and raises LoadCancelled.
+        """
+        cache_key = (self.key(), (start, stop))
+        output = self.cache.get(cache_key)
+        if output is not None:
+            self.cache.move_to_end(cache_key)
+            self.hits += 1
+            return output
+        upstream_output = self.upstream.evaluate_slab(start, stop, cancel_event)
+        if cancel_event is not None and cancel_event.is_set():
+            raise LoadCancelled()
+        output = self.apply(upstream_output)
+        self.computed += 1
+        self.cache[cache_key] = output
+        while len(self.cache) > self.cache_entries:
+            self.cache.popitem(last=False)
+        return output
+
+    def evaluate_slice(self, slice_index, cancel_event=None) -> np.ndarray:
+        """
+        The output slice at the position of source slice slice_index, computed from a slab of
+        z_radius() slices around it. Nodes that derive statistics from their input (normalization,
+        CLAHE without a value_range) see only the slab, so the preview can differ slightly.
+        """
+        source = self.source()
+        radius = self.z_radius()
+        start, stop = max(0, slice_index - radius), min(source.depth(), slice_index + radius + 1)
+        slab = self.evaluate_slab(start, stop, cancel_event)
+
+        slab_index = round(slab.TransformPhysicalPointToContinuousIndex(source.physical_point(slice_index))[2])
+        slab_index = min(max(slab_index, 0), slab.GetDepth() - 1)
+        return sitk.GetArrayViewFromImage(slab)[slab_index]
+
+    def clear_cache(self):
+        self.cache.clear()
+        self.full_output = (None, None)
+
+
+class GaussianSmoothing(FilterNode):
+    """Gaussian blur, sigma in mm (a finite kernel, so slab previews match the full run)."""
+    name = 'Gaussian smoothing'
+
+    def __init__(self, upstream, sigma=1.0, **options):
+        super().__init__(upstream, sigma=sigma, **options)
+
+    def slice_radius(self, spacing):
+        return math.ceil(3.0 * self.parameters['sigma'] / spacing[2])
+
+    def apply(self, image):
+        return sitk.DiscreteGaussian(image, variance=self.parameters['sigma'] ** 2, maximumKernelWidth=64,
+                                     useImageSpacing=True)
+
+
+class MedianSmoothing(FilterNode):
+    """Median over a (2 radius + 1)^3 voxel neighbourhood."""
+    name = 'Median smoothing'
+
+    def __init__(self, upstream, radius=1, **options):
+        super().__init__(upstream, radius=radius, **options)
+
+    def slice_radius(self, spacing):
+        return self.parameters['radius']
+
+    def apply(self, image):
+        return sitk.Median(image, [self.parameters['radius']] * 3)
+
+
+class Resample(FilterNode):
+    """Linear resampling to spacing (mm) over the same physical extent."""
+    name = 'Resample'
+
+    def __init__(self, upstream, spacing=(1.0, 1.0, 1.0), **options):
+        super().__init__(upstream, spacing=tuple(spacing), **options)
+
+    def slice_radius(self, spacing):
+        return math.ceil(self.parameters['spacing'][2] / spacing[2])
+
+    def output_spacing(self):
+        return self.parameters['spacing']
+
+    def apply(self, image):
+        new_spacing = self.parameters['spacing']
+        new_size = [max(1, round(size * spacing / new_value))
+                    for size, spacing, new_value in zip(image.GetSize(), image.GetSpacing(), new_spacing)]
+        return sitk.Resample(image, new_size, sitk.Transform(), sitk.sitkLinear, image.GetOrigin(), new_spacing,
+                             image.GetDirection(), 0.0, image.GetPixelID())
+
+
+class Threshold(FilterNode):
+    """Binary mask (uint8, 1 inside) of the voxels within [lower, upper]; upper=None: no upper bound."""
+    name = 'Threshold'
+
+    def __init__(self, upstream, lower=0.0, upper=1000.0, **options):
+        super().__init__(upstream, lower=lower, upper=upper, **options)
+
+    def value_range(self):
+        return 0.0, 1.0
+
+    def apply(self, image):
+        lower, upper = self.parameters['lower'], self.parameters['upper']
+        if upper is None:  # the image maximum; ITK casts the thresholds to the pixel type
+            upper = max(float(np.max(sitk.GetArrayViewFromImage(image))), lower)
+        return sitk.BinaryThreshold(image, lowerThreshold=lower, upperThreshold=upper, insideValue=1, outsideValue=0)
+
+
+class Normalize(FilterNode):
+    """float32 intensities rescaled to zero mean / unit variance ('zscore') or to [0, 1] ('minmax')."""
+    name = 'Normalize'
+
+    def __init__(self, upstream, mode='zscore', **options):
+        super().__init__(upstream, mode=mode, **options)
+
+    def value_range(self):
+        return (0.0, 1.0) if self.parameters['mode'] == 'minmax' else None
+
+    def apply(self, image):
+        image = sitk.Cast(image, sitk.sitkFloat32)
+        if self.parameters['mode'] == 'minmax':
+            return sitk.RescaleIntensity(image, 0.0, 1.0)
+        return sitk.Normalize(image)
+
+
+class Clahe(FilterNode):
+    """
+    Adaptive histogram equalization per axial slice (see utils.clahe_volume). Without a value_range
+    the upstream range is used when known, so a preview slab is quantized like the full volume.
+    """
+    name = 'CLAHE'
+
+    def __init__(self, upstream, clip_limit=0.01, tile_grid=(8, 8), value_range=None, **options):
+        super().__init__(upstream, clip_limit=clip_limit, tile_grid=tuple(tile_grid), value_range=value_range,
+                         **options)
+
+    def apply(self, image):
+        volume = sitk.GetArrayViewFromImage(image)
+        max_workers = 1 if len(volume) <= 4 else None  # a preview slab is not worth a process pool
+        parameters = dict(self.parameters)
+        parameters['value_range'] = parameters['value_range'] or self.upstream.value_range()
+        result = sitk.GetImageFromArray(clahe_volume(volume, max_workers=max_workers, **parameters))
+        result.CopyInformation(image)
+        return result
+
+
+FILTERS = {node_type.name: node_type for node_type in (GaussianSmoothing, MedianSmoothing, Resample,
+                                                       Threshold, Normalize, Clahe)}
+
+
+def apply_filter_graph(node: FilterNode, vtk_image_data, metadata, progress_callback=None, cancel_event=None):
+    """
+    Full-volume output of node as (vtk_image_data, metadata) for the viewer; vtk_image_data/metadata
+    describe the displayed volume the graph was built on. Cached nodes are not recomputed;
+    cancel_event is checked between nodes and raises LoadCancelled.
+    """
+    chain = node.chain()
+    for done, chain_node in enumerate(chain, start=1):
+        if cancel_event is not None and cancel_event.is_set():
+            raise LoadCancelled()
+        output = chain_node.evaluate()
+        if progress_callback:
+            progress_callback(done, len(chain))
+
+    result_image, _ = convert_itk2vtk(output)
+    result_metadata = {
+        'orientation': metadata.get('orientation'),
+        'histogram': VolumeHistogram.from_volume(sitk.GetArrayViewFromImage(output)),
+        'source': metadata.get('source') or (vtk_image_data, metadata),  # the unfiltered volume
+    }
+    return result_image, result_metadata
@@ -0,0 +1,148 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+
+# (window center, window width) in Hounsfield units, for CT
+WINDOW_PRESETS = {
+    'lung': (-600.0, 1500.0),
+    'bone': (400.0, 1800.0),
+    'brain': (40.0, 80.0),
+}
+
+
+class VolumeHistogram:
+    """
+    Intensity histogram of a volume, filled once at load time (add_volume, in slabs on a thread
+    pool) or slice by slice as slices are decoded (add_slice). Integer images of up to 16 bits get
+    one bin per value; other images get `bins` bins over value_range, values outside it count in
+    the end bins. Percentiles, auto window/level and presets come from the cached cumulative
+    counts, so they cost a binary search rather than a pass over the voxels.
+    """
+
+    def __init__(self, value_range, bins=4096, integer_bins=False):
+        self.lower, self.upper = float(value_range[0]), float(value_range[1])
+        self.integer_bins = integer_bins
+        if integer_bins:
+            bins = int(self.upper - self.lower) + 1
+        self.bins = bins
+        self.bin_width = 1.0 if integer_bins else (self.upper - self.lower) / bins or 1.0
+        self.counts = np.zeros(bins, dtype=np.int64)
+        self.lock = threading.Lock()
+        self._cumulative = None  # cached np.cumsum(counts), reset by every add
+
+    @classmethod
+    def for_dtype(cls, dtype, sample=None, bins=4096):
+        """Histogram suited to images of dtype; for non 16-bit dtypes the range is taken from sample."""
+        dtype = np.dtype(dtype)
+        if dtype.kind in 'iu' and dtype.itemsize <= 2:
+            info = np.iinfo(dtype)
+            return cls((info.min, info.max), integer_bins=True)
+        if sample is None or sample.size == 0:
+            return cls((0.0, 1.0), bins=bins)
+        return cls((float(np.min(sample)), float(np.max(sample))), bins=bins)
+
+    @classmethod
+    def from_volume(cls, volume: np.ndarray, max_workers=None, slab_slices=16, bins=4096):
+        """Histogram of a whole (z, y, x) volume, computed in parallel over slabs of slab_slices slices."""
+        dtype = np.dtype(volume.dtype)
+        if dtype.kind in 'iu' and dtype.itemsize <= 2:
+            histogram = cls.for_dtype(dtype)
+        else:
+            slabs = [volume[start:start + slab_slices] for start in range(0, len(volume), slab_slices)]
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                ranges = list(executor.map(lambda slab: (np.min(slab), np.max(slab)), slabs))
+            histogram = cls((min(low for low, _ in ranges), max(high for _, high in ranges)), bins=bins)
+        histogram.add_volume(volume, max_workers, slab_slices)
+        return histogram
+
+    def _count(self, values: np.ndarray):
+        values = values.ravel()
+        if self.integer_bins:
+            if values.dtype == np.int16:  # flip the sign bit: int16 -> offset uint16 without a wider copy
+                return np.bincount(values.view(np.uint16) ^ 0x8000, minlength=self.bins)
+            if self.lower == 0:
+                return np.bincount(values, minlength=self.bins)
+            return np.bincount(values.astype(np.intp) - int(self.lower), minlength=self.bins)
+        indices = ((values - self.lower) / self.bin_width).astype(np.intp)
+        np.clip(indices, 0, self.bins - 1, out=indices)
+        return np.bincount(indices, minlength=self.bins)
+
+    def add_slice(self, slice_array: np.ndarray):
+        counts = self._count(slice_array)
+        with self.lock:
+            self.counts += counts
+            self._cumulative = None
+
+    def add_volume(self, volume: np.ndarray, max_workers=None, slab_slices=16):
+        slabs = [volume[start:start + slab_slices] for start in range(0, len(volume), slab_slices)]
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for counts in executor.map(self._count, slabs):
+                with self.lock:
+                    self.counts += counts
+        with self.lock:
+            self._cumulative = None
+
+    def total(self):
+        return int(self.cumulative()[-1])
+
+    def cumulative(self):
+        with self.lock:
+            if self._cumulative is None:
+                self._cumulative = np.cumsum(self.counts)
+            return self._cumulative
+
+    def bin_edges(self):
+        return self.lower + np.arange(self.bins + 1) * self.bin_width - (0.5 if self.integer_bins else 0.0)
+
+    def percentile(self, q):
+        """Intensity below which q percent of the voxels lie (resolution: one bin)."""
+        cumulative = self.cumulative()
+        if cumulative[-1] == 0:
+            return None
+        target = max(cumulative[-1] * q / 100.0, 1)  # q=0 -> the lowest value present
+        index = int(np.searchsorted(cumulative, target))
+        return self.lower + min(index, self.bins - 1) * self.bin_width
+
+    def auto_window_level(self, low_percentile=1.0, high_percentile=99.0):
+        """(window center, window width) spanning the given percentiles, or None while empty."""
+        low, high = self.percentile(low_percentile), self.percentile(high_percentile)
+        if low is None:
+            return None
+        width = max(high - low, self.bin_width)
+        return low + width / 2.0, width
+
+    def is_hounsfield(self):
+        """True for CT-like intensities: air (about -1000 HU) is present."""
+        low = self.percentile(0.1)
+        return low is not None and low <= -900
+
+    def preset(self, name):
+        """(window center, window width) of a WINDOW_PRESETS tissue preset, None unless the volume is CT."""
+        if not self.is_hounsfield():
+            return None
+        return WINDOW_PRESETS[name]
+
+    def state(self):
+        """(parameters, counts) for storing the histogram; see from_state."""
+        parameters = {'value_range': [self.lower, self.upper], 'bins': self.bins, 'integer_bins': self.integer_bins}
+        return parameters, self.counts
+
+    @classmethod
+    def from_state(cls, parameters, counts):
+        histogram = cls(parameters['value_range'], parameters['bins'], parameters['integer_bins'])
+        histogram.counts[:] = counts
+        return histogram
+
+    def reduced(self, bins=256):
+        """(counts, bin_edges) merged down to about `bins` bins over the occupied range, for display."""
+        cumulative = self.cumulative()
+        if cumulative[-1] == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(1)
+        occupied = np.flatnonzero(self.counts)
+        first, last = occupied[0], occupied[-1] + 1
+        step = max(1, -(-(last - first) // bins))
+        boundaries = np.append(np.arange(first, last, step), last)
+        counts = np.diff(np.concatenate(([0], cumulative))[boundaries])
+        return counts, self.bin_edges()[boundaries]
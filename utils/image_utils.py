@@ -24,19 +24,36 @@ def determine_orientation(itk_image: sitk.Image):
     return get_orientation_label(x_dir) + get_orientation_label(y_dir) + get_orientation_label(z_dir)
 
 
-def convert_itk2vtk(itk_image: sitk.Image) -> tuple:
-    dims = itk_image.GetSize()
-    spacing = itk_image.GetSpacing()
-    origin = itk_image.GetOrigin()
-
-    image_array = sitk.GetArrayFromImage(itk_image)
-    vtk_array = numpy_support.numpy_to_vtk(image_array.ravel(order='C'), deep=True, array_type=vtk.VTK_FLOAT)
+def numpy_to_vtk_image(image_array, spacing, origin, owner=None) -> vtk.vtkImageData:
+    """
+    Wrap a C-ordered (z, y, x) array as vtkImageData without copying.
+    owner is any object that must outlive the buffer (e.g. the sitk.Image behind an array view);
+    it is kept alive by the vtk array for as long as VTK uses it.
+    """
+    flat_array = image_array.reshape(-1)  # a view for contiguous arrays
+    vtk_array = numpy_support.numpy_to_vtk(flat_array, deep=False)
+    if owner is not None:
+        vtk_array._buffer_owner = owner
 
     vtk_image = vtk.vtkImageData()
-    vtk_image.SetDimensions(dims)
+    vtk_image.SetDimensions(image_array.shape[::-1])
     vtk_image.SetSpacing(spacing)
     vtk_image.SetOrigin(origin)
     vtk_image.GetPointData().SetScalars(vtk_array)
+    return vtk_image
+
+
+def convert_itk2vtk(itk_image: sitk.Image, as_float=False) -> tuple:
+    """
+    Convert a SimpleITK image to vtkImageData sharing the ITK pixel buffer.
+    The native scalar type (e.g. int16 for CT) is kept; as_float=True casts to float32 first,
+    which is the only copy made.
+    """
+    if as_float and itk_image.GetPixelID() != sitk.sitkFloat32:
+        itk_image = sitk.Cast(itk_image, sitk.sitkFloat32)
+
+    image_array = sitk.GetArrayViewFromImage(itk_image)
+    vtk_image = numpy_to_vtk_image(image_array, itk_image.GetSpacing(), itk_image.GetOrigin(), owner=itk_image)
 
     orientation = determine_orientation(itk_image)
     return vtk_image, orientation
@@ -1,54 +1,294 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
 import pydicom
 import SimpleITK as sitk
 import vtkmodules.all as vtk
-from .image_utils import convert_itk2vtk
+from .image_utils import convert_itk2vtk, determine_orientation, numpy_to_vtk_image
+from .histogram import VolumeHistogram
+
+
+class LoadCancelled(Exception):
+    """Raised when a load (or a volume filter) is cancelled through its cancel_event."""
+
+
+# Only the tags below are parsed by the metadata scan; pixel data is never read.
+SLICE_METADATA_TAGS = [
+    'InstanceNumber',
+    'ImagePositionPatient',
+    'WindowCenter',
+    'WindowWidth',
+    'RescaleSlope',
+    'RescaleIntercept',
+]
+
+
+SLICE_TABLE_DTYPE = np.dtype([
+    ('instance_number', np.int32),
+    ('image_position', np.float64, (3,)),
+    ('window_center', np.float64),
+    ('window_width', np.float64),
+    ('rescale_slope', np.float64),
+    ('rescale_intercept', np.float64),
+])
+
+# metadata['windows_levels']: one row per slice, in slice order
+WINDOW_LEVEL_DTYPE = np.dtype([
+    ('window_center', np.float64),
+    ('window_width', np.float64),
+])
+
+
+def _first_value(value):
+    """WindowCenter/WindowWidth may be multi-valued; the first entry is the default."""
+    if isinstance(value, pydicom.multival.MultiValue):
+        return value[0] if len(value) else None
+    return value
+
+
+def _read_slice_header(file):
+    """Read one slice header (stops before pixel data) and return its table row."""
+    row = (-1, (np.nan, np.nan, np.nan), np.nan, np.nan, 1.0, 0.0)
+    try:
+        meta_dicom = pydicom.dcmread(file, stop_before_pixels=True, specific_tags=SLICE_METADATA_TAGS)
+    except (FileNotFoundError, pydicom.errors.InvalidDicomError) as e:
+        print(f"Could not read DICOM header from {file}: {e}")
+        return row
+
+    def get_float(keyword, default):
+        try:
+            value = _first_value(meta_dicom.get(keyword))
+            return default if value is None else float(value)
+        except (TypeError, ValueError):
+            return default
+
+    position = meta_dicom.get('ImagePositionPatient')
+    if position is None or len(position) != 3:
+        position = (np.nan, np.nan, np.nan)
+
+    return (
+        int(get_float('InstanceNumber', -1)),
+        tuple(float(p) for p in position),
+        get_float('WindowCenter', np.nan),
+        get_float('WindowWidth', np.nan),
+        get_float('RescaleSlope', 1.0),
+        get_float('RescaleIntercept', 0.0),
+    )
+
+
+def scan_dicom_metadata(dicom_names, max_workers=None, progress_callback=None, cancel_event=None) -> np.ndarray:
+    """
+    Read the headers of a DICOM series on a thread pool.
+    Returns a structured array (SLICE_TABLE_DTYPE) with one row per file, in the order of dicom_names.
+    Missing window/position values are NaN.
+    progress_callback(done, total) is called from the calling thread after each slice.
+    """
+    slice_table = np.zeros(len(dicom_names), dtype=SLICE_TABLE_DTYPE)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(_read_slice_header, name): index for index, name in enumerate(dicom_names)}
+        for done, future in enumerate(as_completed(futures), start=1):
+            if cancel_event is not None and cancel_event.is_set():
+                executor.shutdown(wait=False, cancel_futures=True)
+                raise LoadCancelled()
+            slice_table[futures[future]] = future.result()
+            if progress_callback:
+                progress_callback(done, len(dicom_names))
+    return slice_table
+
+
+def windows_levels_from_table(slice_table):
+    """
+    Per-slice window levels (WINDOW_LEVEL_DTYPE) aligned to slice index. Slices without the tags
+    get values interpolated from their neighbours (the nearest one at either end of the series);
+    they stay NaN only if no slice in the series has a window level.
+    """
+    windows_levels = np.full(len(slice_table), np.nan, dtype=WINDOW_LEVEL_DTYPE)
+    has_window = ~(np.isnan(slice_table['window_center']) | np.isnan(slice_table['window_width']))
+    if not has_window.any():
+        return windows_levels
+
+    slice_indices = np.arange(len(slice_table))
+    for field in WINDOW_LEVEL_DTYPE.names:
+        windows_levels[field] = np.interp(slice_indices, slice_indices[has_window], slice_table[field][has_window])
+    return windows_levels
+
+
+def estimate_series_bytes(dicom_names):
+    """Decoded size of a series estimated from the first header (rows x columns x bytes per pixel)."""
+    meta_dicom = pydicom.dcmread(dicom_names[0], stop_before_pixels=True,
+                                 specific_tags=['Rows', 'Columns', 'BitsAllocated', 'SamplesPerPixel'])
+    bytes_per_pixel = max(int(meta_dicom.get('BitsAllocated', 16)) // 8, 1) * int(meta_dicom.get('SamplesPerPixel', 1))
+    return int(meta_dicom.Rows) * int(meta_dicom.Columns) * bytes_per_pixel * len(dicom_names)
+
+
+def read_dicom_slice(file) -> np.ndarray:
+    """Decode a single DICOM file (rescale applied) into a 2D (rows, columns) array."""
+    return sitk.GetArrayFromImage(sitk.ReadImage(file))[0]
+
+
+def series_geometry(slice_image: sitk.Image, slice_table, slice_index):
+    """
+    (spacing, origin) of the series that slice_image (file dicom_names[slice_index]) belongs to.
+    The slice spacing comes from the positions of the first two slices when available.
+    """
+    spacing = list(slice_image.GetSpacing())
+    positions = slice_table['image_position']
+    if len(slice_table) > 1 and not np.isnan(positions[:2]).any():
+        spacing[2] = float(np.linalg.norm(positions[1] - positions[0])) or spacing[2]
+
+    if not np.isnan(positions[0]).any():
+        origin = positions[0]
+    else:
+        origin = np.array(slice_image.GetOrigin()) - np.array([0.0, 0.0, slice_index * spacing[2]])
+    return tuple(spacing), tuple(float(o) for o in origin)
+
+
+def allocate_progressive_volume(dicom_names, slice_table, first_index):
+    """
+    Decode dicom_names[first_index] and preallocate the full volume around it.
+    Slices not decoded yet hold the minimum of the first slice, so they render as background.
+    Returns (volume array, vtkImageData sharing it, orientation).
+    """
+    first_image = sitk.ReadImage(dicom_names[first_index])
+    first_slice = sitk.GetArrayViewFromImage(first_image)[0]
+
+    volume = np.full((len(dicom_names),) + first_slice.shape, first_slice.min(), dtype=first_slice.dtype)
+    volume[first_index] = first_slice
+
+    spacing, origin = series_geometry(first_image, slice_table, first_index)
+    vtk_image = numpy_to_vtk_image(volume, spacing, origin)
+    return volume, vtk_image, determine_orientation(first_image)
 
 
 def get_window_level_from_dicom(file):
     """Safely read window level from a DICOM file."""
     try:
-        meta_dicom = pydicom.dcmread(file)
-        window_center = float(meta_dicom.WindowCenter)
-        window_width = float(meta_dicom.WindowWidth)
+        meta_dicom = pydicom.dcmread(file, stop_before_pixels=True, specific_tags=['WindowCenter', 'WindowWidth'])
+        window_center = float(_first_value(meta_dicom.WindowCenter))
+        window_width = float(_first_value(meta_dicom.WindowWidth))
         return {'window_center': window_center, 'window_width': window_width}
-    except (FileNotFoundError, AttributeError, ValueError) as e:
+    except (FileNotFoundError, AttributeError, TypeError, ValueError) as e:
         print(f"Could not read DICOM metadata from {file}: {e}")
         return None
 
 
-def read_nifti(path) -> vtk.vtkImageData:
-    """Reads a NIfTI series from a folder and extracts metadata."""
+def read_nifti(path):
+    """
+    Reads a NIfTI image and extracts metadata. NIfTI has no window level, so the viewer
+    falls back to metadata['histogram'].
+    """
     itk_image = sitk.ReadImage(path)
-    vtk_image, _ = convert_itk2vtk(itk_image=itk_image)
-    return vtk_image
+    vtk_image, orientation = convert_itk2vtk(itk_image=itk_image)
+    metadata = {
+        'orientation': orientation,
+        'histogram': VolumeHistogram.from_volume(sitk.GetArrayViewFromImage(itk_image)),
+    }
+    return vtk_image, metadata
+
 
+def read_dicom_folder(folder_path, progress_callback=None, cancel_event=None, disk_cache=None):
+    """
+    Reads a DICOM series from a folder and extracts metadata.
+    metadata['timings'] holds the seconds spent in each loading stage.
+    With a DiskVolumeCache, a previously decoded series is memory-mapped instead of decoded,
+    and newly decoded series are written to it.
 
-def read_dicom_folder(folder_path):
-    """Reads a DICOM series from a folder and extracts metadata."""
+    progress_callback(stage, done, total) reports per-slice progress of the 'metadata_scan' and
+    'series_read' stages. Setting cancel_event (threading.Event) aborts the load with LoadCancelled.
+    """
     if not os.path.isdir(folder_path):
         print(f"Error: Directory not found at {folder_path}")
         return None, None
 
+    start = time.perf_counter()
+    try:
+        dicom_names = sitk.ImageSeriesReader.GetGDCMSeriesFileNames(folder_path)
+    except Exception as e:
+        print(f"An error occurred while reading DICOM folder: {e}")
+        return None, None
+    if not dicom_names:
+        print(f"No DICOM files found in {folder_path}")
+        return None, None
+    timings = {'file_discovery': time.perf_counter() - start}
+
+    return read_dicom_series(dicom_names, progress_callback, cancel_event, disk_cache, timings)
+
+
+def read_dicom_series(dicom_names, progress_callback=None, cancel_event=None, disk_cache=None, timings=None):
+    """
+    Reads the given slice files (already sorted, e.g. from DicomIndex.series_files) as one volume.
+    Arguments and return value as for read_dicom_folder.
+    """
+    def report(stage):
+        if progress_callback is None:
+            return None
+        return lambda done, total: progress_callback(stage, done, total)
+
     try:
+        start = time.perf_counter()
+        timings = dict(timings or {})
+
+        cache_key = disk_cache.make_key(dicom_names) if disk_cache is not None else None
+        if cache_key is not None:
+            stage_start = time.perf_counter()
+            cached = disk_cache.load(cache_key)
+            if cached is not None:
+                vtk_image_data, metadata = cached
+                timings['disk_cache_load'] = time.perf_counter() - stage_start
+                timings['total'] = time.perf_counter() - start + timings.get('file_discovery', 0.0)
+                metadata['timings'] = timings
+                return vtk_image_data, metadata
+
+        stage_start = time.perf_counter()
+        slice_table = scan_dicom_metadata(dicom_names, progress_callback=report('metadata_scan'),
+                                          cancel_event=cancel_event)
+        timings['metadata_scan'] = time.perf_counter() - stage_start
+
+        stage_start = time.perf_counter()
         reader = sitk.ImageSeriesReader()
-        dicom_names = reader.GetGDCMSeriesFileNames(folder_path)
-        if not dicom_names:
-            print(f"No DICOM files found in {folder_path}")
-            return None, None
-        reader.SetFileNames(dicom_names)
-        itk_image: sitk.Image = reader.Execute()
-
-        lst_windows_levels = []
-        for slice_file in dicom_names:
-            window_level = get_window_level_from_dicom(slice_file)
-            if window_level:
-                lst_windows_levels.append(window_level)
-
-        metadata = {'windows_levels': lst_windows_levels}
+        reader.SetFileNames(list(dicom_names))
+        on_series_progress = report('series_read')
+
+        def on_reader_progress():
+            if cancel_event is not None and cancel_event.is_set():
+                reader.Abort()
+            elif on_series_progress:
+                on_series_progress(round(reader.GetProgress() * len(dicom_names)), len(dicom_names))
+
+        reader.AddCommand(sitk.sitkProgressEvent, on_reader_progress)
+        try:
+            itk_image: sitk.Image = reader.Execute()
+        except RuntimeError:
+            if cancel_event is not None and cancel_event.is_set():
+                raise LoadCancelled()
+            raise
+        finally:
+            reader.RemoveAllCommands()
+        timings['series_read'] = time.perf_counter() - stage_start
+
+        metadata = {'windows_levels': windows_levels_from_table(slice_table), 'slice_table': slice_table}
+
+        stage_start = time.perf_counter()
         vtk_image_data, metadata['orientation'] = convert_itk2vtk(itk_image)
+        timings['conversion'] = time.perf_counter() - stage_start
 
+        stage_start = time.perf_counter()
+        metadata['histogram'] = VolumeHistogram.from_volume(sitk.GetArrayViewFromImage(itk_image))
+        timings['histogram'] = time.perf_counter() - stage_start
+
+        if cache_key is not None:
+            stage_start = time.perf_counter()
+            disk_cache.store(cache_key, sitk.GetArrayViewFromImage(itk_image), vtk_image_data, metadata)
+            timings['disk_cache_store'] = time.perf_counter() - stage_start
+
+        timings['total'] = time.perf_counter() - start + timings.get('file_discovery', 0.0)
+        metadata['timings'] = timings
         return vtk_image_data, metadata
 
+    except LoadCancelled:
+        raise
     except Exception as e:
-        print(f"An error occurred while reading DICOM folder: {e}")
+        print(f"An error occurred while reading DICOM series: {e}")
         return None, None
@@ -0,0 +1,118 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, CancelledError
+
+import numpy as np
+import SimpleITK as sitk
+from .image_utils import determine_orientation, numpy_to_vtk_image
+from .io_utils import read_dicom_slice, series_geometry
+from .histogram import VolumeHistogram
+
+
+class LazySliceVolume:
+    """
+    Axial slices of a DICOM series decoded per file on demand, as an alternative to a fully
+    materialized vtkImageData. Decoded slices live in a bounded LRU cache and the next slices in
+    the scroll direction are read ahead on a small thread pool, so memory scales with
+    cache_slices rather than with the length of the series.
+
+    slice_image is a single-slice vtkImageData that show_slice fills for the viewer; its origin
+    stays at the series origin, the slice index is the logical position in the series.
+    histogram grows with every slice decoded for the first time.
+    """
+
+    def __init__(self, dicom_names, slice_table, first_index=None, cache_slices=64, read_ahead=8, max_workers=2):
+        self.dicom_names = list(dicom_names)
+        self.count = len(self.dicom_names)
+        self.cache_slices = max(cache_slices, read_ahead + 1)
+        self.read_ahead = read_ahead
+
+        if first_index is None:
+            first_index = self.count // 2
+        first_image = sitk.ReadImage(self.dicom_names[first_index])
+        first_slice = sitk.GetArrayFromImage(first_image)[0]
+        self.spacing, self.origin = series_geometry(first_image, slice_table, first_index)
+        self.orientation = determine_orientation(first_image)
+        self.shape = (self.count,) + first_slice.shape
+        self.dtype = first_slice.dtype
+
+        self.lock = threading.Lock()
+        self.cache = OrderedDict({first_index: first_slice})  # slice index -> 2D array
+        self.pending = {}  # slice index -> Future of a read-ahead decode
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.last_index = first_index
+        self.hits = 0
+        self.misses = 0
+        self.histogram = VolumeHistogram.for_dtype(self.dtype, sample=first_slice)
+        self.histogram.add_slice(first_slice)
+        self.histogram_slices = {first_index}  # slices already counted in histogram
+
+        self.slice_buffer = np.empty((1,) + first_slice.shape, dtype=self.dtype)
+        self.slice_image = numpy_to_vtk_image(self.slice_buffer, self.spacing, self.origin)
+
+    def get_slice(self, index) -> np.ndarray:
+        """Decoded slice index; blocks only when it is neither cached nor already being read ahead."""
+        with self.lock:
+            slice_array = self.cache.get(index)
+            if slice_array is not None:
+                self.cache.move_to_end(index)
+                self.hits += 1
+                return slice_array
+            future = self.pending.get(index)
+            self.misses += 1
+
+        if future is not None:
+            try:
+                return future.result()
+            except CancelledError:
+                pass
+        return self._decode(index)
+
+    def show_slice(self, index):
+        """Copy slice index into slice_image and read ahead in the direction of travel."""
+        np.copyto(self.slice_buffer[0], self.get_slice(index), casting='unsafe')
+        self.slice_image.GetPointData().GetScalars().Modified()
+
+        direction = 1 if index >= self.last_index else -1
+        self.last_index = index
+        self.prefetch(index + direction * step for step in range(1, self.read_ahead + 1))
+
+    def prefetch(self, indices):
+        with self.lock:
+            for index in indices:
+                if 0 <= index < self.count and index not in self.cache and index not in self.pending:
+                    self.pending[index] = self.executor.submit(self._decode, index)
+
+    def cancel_prefetch(self, keep=()):
+        """Drop queued read-ahead work except for the slice indices in keep."""
+        keep = set(keep)
+        with self.lock:
+            for index, future in list(self.pending.items()):
+                if index not in keep and future.cancel():
+                    del self.pending[index]
+
+    def is_cached(self, index):
+        return index in self.cache
+
+    def _decode(self, index):
+        slice_array = read_dicom_slice(self.dicom_names[index])
+        with self.lock:
+            first_decode = index not in self.histogram_slices
+            self.histogram_slices.add(index)
+        if first_decode:
+            self.histogram.add_slice(slice_array)
+        with self.lock:
+            self.pending.pop(index, None)
+            self.cache[index] = slice_array
+            self.cache.move_to_end(index)
+            while len(self.cache) > self.cache_slices:
+                self.cache.popitem(last=False)
+        return slice_array
+
+    def cached_bytes(self):
+        with self.lock:
+            return sum(slice_array.nbytes for slice_array in self.cache.values())
+
+    def close(self):
+        """Stop the read-ahead threads and drop their queued work; slices are still decoded on request."""
+        self.executor.shutdown(wait=False, cancel_futures=True)
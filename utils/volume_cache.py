@@ -0,0 +1,109 @@
+import os
+from collections import OrderedDict
+
+import pydicom
+import vtkmodules.all as vtk
+
+
+def get_series_uid(folder_path):
+    """SeriesInstanceUID of the first readable DICOM file in folder_path (header only), or None."""
+    for entry in sorted(os.scandir(folder_path), key=lambda e: e.name):
+        if not entry.is_file():
+            continue
+        try:
+            meta_dicom = pydicom.dcmread(entry.path, stop_before_pixels=True, specific_tags=['SeriesInstanceUID'])
+            return str(meta_dicom.SeriesInstanceUID)
+        except (pydicom.errors.InvalidDicomError, AttributeError, OSError):
+            continue
+    return None
+
+
+def folder_cache_key(folder_path):
+    """(series UID, folder mtime); the mtime changes whenever files are added or removed."""
+    series_uid = get_series_uid(folder_path)
+    if series_uid is None:
+        return None
+    return series_uid, os.stat(folder_path).st_mtime_ns
+
+
+class VolumeCache:
+    """In-memory LRU cache of loaded volumes (vtkImageData + metadata) bounded by a byte budget."""
+
+    def __init__(self, max_bytes=2 * 1024 ** 3):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # key -> (vtk_image_data, metadata, size in bytes)
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.on_evict = None  # called with (vtk_image_data, metadata) of every entry that leaves the cache
+
+    def get(self, key):
+        """Return (vtk_image_data, metadata) for key or None; a hit marks the entry most recently used."""
+        entry = self.entries.get(key) if key is not None else None
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[0], entry[1]
+
+    def put(self, key, vtk_image_data: vtk.vtkImageData, metadata):
+        if key is None:
+            return
+        size = vtk_image_data.GetActualMemorySize() * 1024  # reported in KiB
+        if size > self.max_bytes:
+            return
+
+        self.remove(key)
+        self.entries[key] = (vtk_image_data, metadata, size)
+        self.current_bytes += size
+        self.evict_to(self.max_bytes)
+
+    def remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.current_bytes -= entry[2]
+            self.evicted(entry)
+
+    def set_max_bytes(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.evict_to(max_bytes)
+
+    def evict_to(self, max_bytes):
+        while self.current_bytes > max_bytes and self.entries:
+            _, entry = self.entries.popitem(last=False)
+            self.current_bytes -= entry[2]
+            self.evictions += 1
+            self.evicted(entry)
+
+    def clear(self):
+        entries = list(self.entries.values())
+        self.entries.clear()
+        self.current_bytes = 0
+        for entry in entries:
+            self.evicted(entry)
+
+    def evicted(self, entry):
+        if self.on_evict is not None:
+            self.on_evict(entry[0], entry[1])
+
+    def holds(self, vtk_image_data):
+        """True if vtk_image_data is the volume of a cached entry."""
+        return any(entry[0] is vtk_image_data for entry in self.entries.values())
+
+    def stats(self):
+        return {
+            'entries': len(self.entries),
+            'bytes': self.current_bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
@@ -0,0 +1,64 @@
+class AnnotationRegistry:
+    """
+    Annotation widgets (measurements, contours) bucketed by (slice axis, slice index). Only the
+    bucket of the displayed slice is enabled; a slice change disables the outgoing bucket and
+    enables the incoming one, so its cost depends on the widgets of those two slices only, not
+    on how many annotations the study has. Widgets need On() / Off().
+    """
+
+    def __init__(self):
+        self.buckets = {}  # (slice axis, slice index) -> {widget: None}, an insertion-ordered set
+        self.widget_keys = {}  # widget -> its bucket key
+        self.visible_key = None
+
+    def add(self, widget, slice_axis, slice_index):
+        """Register widget on a slice; it is shown only while that slice is displayed. No-op if registered."""
+        if widget in self.widget_keys:
+            return
+        key = (slice_axis, slice_index)
+        self.buckets.setdefault(key, {})[widget] = None
+        self.widget_keys[widget] = key
+        if key == self.visible_key:
+            widget.On()
+        else:
+            widget.Off()
+
+    def remove(self, widget):
+        key = self.widget_keys.pop(widget, None)
+        if key is None:
+            return
+        bucket = self.buckets[key]
+        del bucket[widget]
+        if not bucket:
+            del self.buckets[key]
+
+    def key_of(self, widget):
+        return self.widget_keys.get(widget)
+
+    def widgets(self, slice_axis, slice_index):
+        return list(self.buckets.get((slice_axis, slice_index), ()))
+
+    def show(self, slice_axis, slice_index):
+        """Make (slice_axis, slice_index) the displayed slice. Returns the number of widgets toggled."""
+        key = (slice_axis, slice_index)
+        if key == self.visible_key:
+            return 0
+        outgoing = self.buckets.get(self.visible_key, ())
+        incoming = self.buckets.get(key, ())
+        for widget in outgoing:
+            widget.Off()
+        for widget in incoming:
+            widget.On()
+        self.visible_key = key
+        return len(outgoing) + len(incoming)
+
+    def clear(self):
+        """Disable and forget every widget, e.g. when another volume is loaded."""
+        for widget in self.widget_keys:
+            widget.Off()
+        self.buckets.clear()
+        self.widget_keys.clear()
+        self.visible_key = None
+
+    def __len__(self):
+        return len(self.widget_keys)
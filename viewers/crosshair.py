@@ -0,0 +1,60 @@
+import vtkmodules.all as vtk
+
+
+class SliceCrosshair:
+    """
+    Two lines in a 2D view marking where the slices of the other two MPR views cut it.
+    Drawn as a 2D overlay (world coordinates transformed per render), so it never hides behind
+    the image plane whatever the slice position along the viewing axis.
+    """
+
+    def __init__(self, viewer, color=(1.0, 0.55, 0.0)):
+        self.viewer = viewer
+        self.points = vtk.vtkPoints()
+        self.points.SetNumberOfPoints(4)
+        lines = vtk.vtkCellArray()
+        for first in (0, 2):
+            lines.InsertNextCell(2)
+            lines.InsertCellPoint(first)
+            lines.InsertCellPoint(first + 1)
+
+        self.poly_data = vtk.vtkPolyData()
+        self.poly_data.SetPoints(self.points)
+        self.poly_data.SetLines(lines)
+
+        world_coordinate = vtk.vtkCoordinate()
+        world_coordinate.SetCoordinateSystemToWorld()
+        mapper = vtk.vtkPolyDataMapper2D()
+        mapper.SetInputData(self.poly_data)
+        mapper.SetTransformCoordinate(world_coordinate)
+
+        self.actor = vtk.vtkActor2D()
+        self.actor.SetMapper(mapper)
+        self.actor.GetProperty().SetColor(*color)
+        self.actor.GetProperty().SetLineWidth(1.0)
+        self.actor.GetProperty().SetOpacity(0.8)
+        self.actor.PickableOff()
+        self.viewer.renderer.AddViewProp(self.actor)
+
+    def set_position(self, cursor):
+        """cursor: (x, y, z) slice indices in the resliced (display) index space shared by the views."""
+        origin, spacing = self.viewer.output_geometry()
+        dims = self.viewer.vtk_image_data.GetDimensions()
+        center = [origin[axis] + cursor[axis] * spacing[axis] for axis in range(3)]
+        low = [origin[axis] - 0.5 * spacing[axis] for axis in range(3)]
+        high = [origin[axis] + (dims[axis] - 0.5) * spacing[axis] for axis in range(3)]
+
+        slice_axis = self.viewer.slice_axis()
+        point_id = 0
+        for line_axis in (axis for axis in range(3) if axis != slice_axis):
+            # the line runs along line_axis through the cursor
+            for end in (low, high):
+                point = list(center)
+                point[line_axis] = end[line_axis]
+                self.points.SetPoint(point_id, point)
+                point_id += 1
+        self.points.Modified()
+        self.poly_data.Modified()
+
+    def set_visible(self, visible):
+        self.actor.SetVisibility(visible)
@@ -0,0 +1,193 @@
+import threading
+import numpy as np
+import vtkmodules.all as vtk
+from vtkmodules.util import numpy_support
+from PySide6.QtCore import QThread, QTimer, Signal
+from utils import LoadCancelled
+
+
+class SlicePreviewWorker(QThread):
+    """Computes node.evaluate_slice(slice_index) off the GUI thread; cancel() stops it before the next node runs."""
+    computed = Signal(object)  # (y, x) array
+
+    running = set()  # workers are kept alive until they finish, even if their preview is gone
+
+    def __init__(self, node, slice_index):
+        super().__init__()
+        self.node = node
+        self.slice_index = slice_index
+        self.cancel_event = threading.Event()
+        self.running.add(self)
+        self.finished.connect(lambda: self.running.discard(self))
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def run(self):
+        try:
+            slice_array = np.array(self.node.evaluate_slice(self.slice_index, self.cancel_event))  # off the slab cache
+        except LoadCancelled:
+            return
+        except Exception as e:
+            print(f"An error occurred while previewing {self.node.name}: {e}")
+            return
+        if not self.cancel_event.is_set():
+            self.computed.emit(slice_array)
+
+
+class FilterPreview:
+    """
+    Shows a filter graph node (see utils.FilterNode) applied to the displayed axial slice only,
+    computed by node.evaluate_slice from a slab of the slices its kernels reach. The result is
+    drawn by its own image actor in place of the viewer's, so the volume is never modified.
+
+    Requests are not computed immediately: the latest one is kept and computed when the event
+    loop is idle, so a slider drag that queues several requests computes only the last of them
+    and requests made stale by a newer one are dropped without being computed. The computation
+    runs on a SlicePreviewWorker; a newer request cancels it between the nodes of the chain,
+    its result is discarded, and the newest request is computed once it has stopped.
+    """
+
+    def __init__(self, viewer):
+        self.viewer = viewer
+        self.node = None
+        self.pending_parameters = {}
+        self.same_intensities = True  # output in the volume's intensities: follows the viewer's W/L
+
+        self.image = vtk.vtkImageData()
+        # same two stages as ImageViewer2D, so the preview looks like the slice it replaces: a linear
+        # window/level to grey values (its WindowLevelLUT), then the viewer's grey ramp; viewers
+        # without a WindowLevelLUT apply window/level in the second stage
+        self.window_level = vtk.vtkImageMapToWindowLevelColors()
+        self.window_level.SetInputData(self.image)
+        self.window_level.SetOutputFormatToLuminance()
+        self.display_colors = vtk.vtkImageMapToWindowLevelColors()
+        self.display_colors.SetLookupTable(viewer.GetLookupTable())
+        self.actor = vtk.vtkImageActor()
+        self.actor.GetMapper().SetInputConnection(self.display_colors.GetOutputPort())
+        self.actor.VisibilityOff()
+        self.viewer.renderer.AddViewProp(self.actor)
+
+        self.timer = QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.update)
+
+        self.requested = 0
+        self.computed = 0
+        self.generation = 0  # counts requests, slice changes and stops; a result of an older one is stale
+        self.worker = None
+        self.worker_generation = None
+
+    def is_active(self):
+        return self.node is not None
+
+    def request(self, node, **parameters):
+        """Preview node with parameters (set on the node when the preview is computed)."""
+        self.requested += 1
+        if node is not self.node:
+            self.pending_parameters = {}
+        self.node = node
+        self.pending_parameters.update(parameters)
+        self.generation += 1
+        self.timer.start(0)
+
+    def refresh(self):
+        """Recompute for the displayed slice, e.g. after a slice change."""
+        if self.node is not None:
+            self.generation += 1
+            self.timer.start(0)
+
+    def stop(self):
+        self.timer.stop()
+        self.generation += 1
+        if self.worker is not None:
+            self.worker.cancel()
+        self.node = None
+        self.pending_parameters = {}
+        self.actor.VisibilityOff()
+        self.viewer.GetImageActor().VisibilityOn()
+        self.viewer.request_render()
+
+    def stale_requests(self):
+        """Requests replaced by a newer one before they were computed."""
+        return self.requested - self.computed
+
+    def update(self):
+        if self.node is None:
+            return
+        if self.viewer.slice_axis() != 2:  # filter graphs evaluate axial slices
+            self.stop()
+            return
+        if self.worker is not None:  # superseded: the newest request runs once it has stopped
+            self.worker.cancel()
+            return
+        if self.pending_parameters:  # never while a worker reads the node
+            self.node.set_parameters(**self.pending_parameters)
+            self.pending_parameters = {}
+
+        slice_index = self.viewer.get_slice()
+        self.worker_generation = self.generation
+        self.worker = SlicePreviewWorker(self.node, slice_index)
+        self.worker.computed.connect(
+            lambda slice_array, generation=self.generation: self.on_computed(generation, slice_array, slice_index))
+        self.worker.finished.connect(self.on_worker_finished)
+        self.worker.start()
+
+    def on_computed(self, generation, slice_array, slice_index):
+        if generation != self.generation or self.node is None:
+            return  # a newer request is pending
+        self.computed += 1
+        self.show_slice(slice_array, slice_index)
+
+        self.actor.VisibilityOn()
+        self.viewer.GetImageActor().VisibilityOff()
+        self.viewer.request_render()
+
+    def on_worker_finished(self):
+        self.worker.deleteLater()
+        self.worker = None
+        if self.node is not None and self.worker_generation != self.generation:
+            self.timer.start(0)
+
+    def show_slice(self, slice_array: np.ndarray, slice_index):
+        """Place a (y, x) slice of the node output where the viewer draws slice slice_index."""
+        x_sign, y_sign, _ = self.viewer.image_reslice.axis_signs
+        slice_array = slice_array[::y_sign, ::x_sign]  # into display orientation like ImageReslice
+        rows, columns = slice_array.shape
+
+        source = self.node.source()
+        _, volume_rows, volume_columns = source.volume.shape
+        slice_spacing = self.node.output_spacing()
+        origin, spacing = self.viewer.output_geometry()
+        # a resampled slice keeps the volume's first voxel; on a flipped axis that is the displayed last one
+        first_x, first_y = origin[0], origin[1]
+        if x_sign < 0:
+            first_x += (volume_columns - 1) * source.spacing[0] - (columns - 1) * slice_spacing[0]
+        if y_sign < 0:
+            first_y += (volume_rows - 1) * source.spacing[1] - (rows - 1) * slice_spacing[1]
+
+        self.image.SetDimensions(columns, rows, 1)
+        self.image.SetExtent(0, columns - 1, 0, rows - 1, slice_index, slice_index)
+        self.image.SetOrigin(first_x, first_y, origin[2])
+        self.image.SetSpacing(slice_spacing[0], slice_spacing[1], spacing[2])
+        self.image.GetPointData().SetScalars(numpy_support.numpy_to_vtk(slice_array.ravel(), deep=True))
+        self.actor.SetDisplayExtent(self.image.GetExtent())
+        if self.viewer.window_level_lut is not None:
+            self.display_colors.SetInputConnection(self.window_level.GetOutputPort())
+            self.display_colors.SetWindow(255.0)
+            self.display_colors.SetLevel(127.5)
+        else:
+            self.display_colors.SetInputData(self.image)
+
+        self.same_intensities = slice_array.dtype == source.volume.dtype
+        if self.same_intensities:
+            self.set_window_level(*self.viewer.get_window_level())
+        else:  # e.g. a mask or normalized intensities
+            value_range = self.node.value_range() or (float(np.min(slice_array)), float(np.max(slice_array)))
+            window = max(value_range[1] - value_range[0], 1e-6)
+            self.set_window_level(window, value_range[0] + window / 2.0)
+
+    def set_window_level(self, window_width, window_center):
+        window_level = self.window_level if self.viewer.window_level_lut is not None else self.display_colors
+        window_level.SetWindow(window_width)
+        window_level.SetLevel(window_center)
@@ -0,0 +1,196 @@
+import numpy as np
+import vtkmodules.all as vtk
+from vtkmodules.util import numpy_support
+from interactors.segmentation.rasterizer import label_dtype
+
+
+# colors of labels 1, 2, ... (cycled); LabelOverlay.set_label_color overrides them
+LABEL_COLORS = [
+    (1.0, 0.55, 0.0), (0.0, 0.8, 1.0), (0.3, 0.9, 0.3), (1.0, 0.25, 0.35), (0.7, 0.45, 1.0),
+    (1.0, 0.9, 0.2), (0.0, 0.6, 0.55), (1.0, 0.5, 0.8), (0.55, 0.35, 0.15), (0.6, 0.6, 1.0),
+]
+
+
+class LabelOverlay:
+    """
+    Labels of a LabelStore drawn over the displayed slice in the viewer's overlay layer (a second
+    renderer sharing the camera, so it needs no depth offset).
+
+    Only the displayed plane is decoded (LabelStore.decode_plane), into a label buffer that is
+    mapped to an RGBA image through a label -> RGBA table (per-label color, opacity, visibility;
+    filled or outlined). Both buffers persist: a slice change decodes the new plane, a label edit
+    (LabelStore.changes_since) re-decodes and recolors only the rows it touched, and style
+    changes only recolor. The RGBA buffer is the image's scalar array and is written through a
+    flipped view, so it is in display orientation without a reslice.
+    """
+
+    def __init__(self, viewer, label_store, color=None, opacity=0.5, mode='fill'):
+        self.viewer = viewer
+        self.label_store = label_store
+        self.color = color  # one color for every label (e.g. a preview), else LABEL_COLORS
+        self.opacity = opacity
+        self.mode = mode  # 'fill' or 'outline'
+        self.label_colors = {}
+        self.label_opacities = {}
+        self.hidden_labels = set()
+
+        self.table = None  # RGBA per label value, packed into uint32
+        self.padded_labels = None  # decoded plane with a zero border (neighbours for the outline)
+        self.labels = None  # the plane inside padded_labels, in volume orientation
+        self.rgba = None  # (rows, columns) packed RGBA in display orientation, the image's scalars
+        self.rgba_view = None  # rgba in volume orientation
+        self.plane_key = None  # (axis, volume slice index, shape, dtype) of the decoded plane
+        self.version = None  # label_store.version of the decoded plane
+
+        self.image = vtk.vtkImageData()
+        self.actor = vtk.vtkImageActor()
+        self.actor.GetMapper().SetInputData(self.image)
+        self.actor.InterpolateOff()
+        self.actor.ForceOpaqueOn()  # drawn alpha-blended all the same, but without a translucent render pass
+        self.actor.VisibilityOff()
+        self.viewer.get_overlay_renderer().AddViewProp(self.actor)
+
+    def build_table(self):
+        max_label = self.label_store.max_label()
+        table = np.zeros((max(max_label, 1) + 1, 4), dtype=np.uint8)
+        for label in range(1, len(table)):
+            if label in self.hidden_labels:
+                continue
+            color = self.label_colors.get(label) or self.color or LABEL_COLORS[(label - 1) % len(LABEL_COLORS)]
+            opacity = self.label_opacities.get(label, self.opacity)
+            table[label] = np.round(np.array((*color, opacity)) * 255)
+        self.table = table.view(np.uint32).ravel()
+
+    def set_label_color(self, label, color):
+        self.label_colors[label] = tuple(color)
+        self.restyle()
+
+    def set_label_opacity(self, label, opacity):
+        self.label_opacities[label] = opacity
+        self.restyle()
+
+    def set_label_visible(self, label, visible):
+        if visible:
+            self.hidden_labels.discard(label)
+        else:
+            self.hidden_labels.add(label)
+        self.restyle()
+
+    def set_mode(self, mode):
+        """'fill' draws label areas, 'outline' only their border pixels."""
+        self.mode = mode
+        self.restyle()
+
+    def restyle(self):
+        """Recolor the decoded plane after a style change; nothing is decoded."""
+        self.build_table()
+        if self.labels is not None:
+            self.color_rows(0, len(self.labels) - 1)
+            self.image.Modified()
+            self.viewer.request_render()
+
+    def update(self):
+        """Bring the overlay up to date with the displayed slice and the label store, then re-render."""
+        viewer = self.viewer
+        label_store = self.label_store
+        if not label_store.slices and self.version == label_store.version:
+            return  # nothing to draw, nothing drawn
+        axis = viewer.slice_axis()
+        index = viewer.volume_slice_index()
+        depth, rows, columns = label_store.shape
+        shape = {2: (rows, columns), 0: (depth, rows), 1: (depth, columns)}[axis]
+        plane_key = (axis, index, shape, label_dtype(label_store.max_label()))
+
+        if plane_key != self.plane_key:
+            self.decode(plane_key)
+        elif label_store.version != self.version:
+            dirty_rows = self.dirty_rows(axis, index)
+            if dirty_rows is None:
+                self.decode(plane_key)
+            elif dirty_rows:
+                first_row, last_row = dirty_rows
+                if self.table is None or label_store.max_label() >= len(self.table):
+                    self.build_table()
+                self.labels[first_row:last_row + 1] = label_store.decode_plane(axis, index,
+                                                                               rows=(first_row, last_row + 1))
+                self.color_rows(first_row - 1, last_row + 1)  # neighbours of the edit change their outline
+        else:
+            return
+        self.version = label_store.version
+        self.actor.SetVisibility(bool(self.labels.any()))  # an empty plane costs no drawing
+        self.image.Modified()
+        viewer.request_render()
+
+    def dirty_rows(self, axis, index):
+        """(first, last) plane rows changed since the decoded version, () if none, None for a full decode."""
+        changes = self.label_store.changes_since(self.version)
+        if changes is None:
+            return None
+        if axis == 2:
+            changed = [(first_row, last_row) for slice_index, first_row, last_row in changes
+                       if slice_index is None or slice_index == index]
+        else:  # plane rows are slices; a coronal plane is one row of them
+            changed = [(slice_index, slice_index) for slice_index, first_row, last_row in changes
+                       if axis == 0 or first_row <= index <= last_row]
+        if not changed:
+            return ()
+        if any(row is None for row, _ in changed):
+            return None
+        return min(first for first, _ in changed), max(last for _, last in changed)
+
+    def decode(self, plane_key):
+        """Decode the whole displayed plane, (re)allocating the buffers and placing the image for a new plane."""
+        axis, index, shape, dtype = plane_key
+        if self.plane_key is None or self.plane_key[2:] != plane_key[2:]:
+            self.padded_labels = np.zeros((shape[0] + 2, shape[1] + 2), dtype=dtype)
+            self.labels = self.padded_labels[1:-1, 1:-1]
+            self.rgba = np.zeros(shape, dtype=np.uint32)
+            self.image.GetPointData().SetScalars(
+                numpy_support.numpy_to_vtk(self.rgba.view(np.uint8).reshape(-1, 4), deep=False))
+        if self.plane_key is None or self.plane_key[0] != axis or self.plane_key[2:] != plane_key[2:]:
+            # rows of the plane run along y (axial) or z, columns along x (axial, coronal) or y;
+            # flip the axes the viewer's reslice flips (z never is)
+            x_sign, y_sign, _ = self.viewer.image_reslice.axis_signs
+            row_sign, column_sign = {2: (y_sign, x_sign), 0: (1, y_sign), 1: (1, x_sign)}[axis]
+            self.rgba_view = self.rgba[::row_sign, ::column_sign]
+        self.plane_key = plane_key
+        self.place()
+
+        self.build_table()
+        self.labels[:] = self.label_store.decode_plane(axis, index)
+        self.color_rows(0, shape[0] - 1)
+
+    def place(self):
+        """Put the image where the viewer draws the displayed slice, in the resliced image's geometry."""
+        viewer = self.viewer
+        viewer.image_reslice.UpdateInformation()
+        info = viewer.image_reslice.GetOutputInformation(0)
+        extent = list(info.Get(vtk.vtkStreamingDemandDrivenPipeline.WHOLE_EXTENT()))
+        axis = viewer.slice_axis()
+        extent[2 * axis] = extent[2 * axis + 1] = viewer.GetSlice()  # 0 on axial slices of lazy volumes
+        self.image.SetExtent(extent)
+        self.image.SetOrigin(info.Get(vtk.vtkDataObject.ORIGIN()))
+        self.image.SetSpacing(info.Get(vtk.vtkDataObject.SPACING()))
+        self.actor.SetDisplayExtent(extent)
+
+    def color_rows(self, first_row, last_row):
+        """Map plane rows first_row..last_row (clipped) of the label buffer to RGBA."""
+        first_row = max(first_row, 0)
+        last_row = min(last_row, len(self.labels) - 1)
+        if first_row > last_row:
+            return
+        labels = self.labels[first_row:last_row + 1]
+        rgba = np.take(self.table, labels)
+        if self.mode == 'outline':
+            padded = self.padded_labels
+            above = padded[first_row:last_row + 1, 1:-1]
+            below = padded[first_row + 2:last_row + 3, 1:-1]
+            left = padded[first_row + 1:last_row + 2, :-2]
+            right = padded[first_row + 1:last_row + 2, 2:]
+            border = (labels != above) | (labels != below) | (labels != left) | (labels != right)
+            rgba[~border] = 0
+        self.rgba_view[first_row:last_row + 1] = rgba
+
+    def remove(self):
+        self.viewer.get_overlay_renderer().RemoveViewProp(self.actor)
+        self.viewer.request_render()
@@ -0,0 +1,64 @@
+import time
+from PySide6.QtCore import QTimer
+
+
+class RenderScheduler:
+    """
+    Collapses render requests into at most one render per frame at target_fps.
+    A request while a frame is already scheduled is counted as coalesced. A render that takes
+    longer than one frame interval counts the missed intervals as dropped frames.
+    """
+
+    def __init__(self, render_callback, target_fps=60):
+        self.render_callback = render_callback
+        self.frame_interval = 1.0 / target_fps
+        self.last_render_time = 0.0
+        self.pending = False
+
+        self.timer = QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.render_now)
+
+        self.requested = 0
+        self.rendered = 0
+        self.coalesced = 0
+        self.dropped = 0
+
+    def set_target_fps(self, target_fps):
+        self.frame_interval = 1.0 / target_fps
+
+    def request_render(self):
+        self.requested += 1
+        if self.pending:
+            self.coalesced += 1
+            return
+        self.pending = True
+        wait = self.frame_interval - (time.perf_counter() - self.last_render_time)
+        self.timer.start(max(0, int(wait * 1000)))
+
+    def render_now(self):
+        """Render immediately (e.g. before grabbing the frame); a scheduled frame is folded into it."""
+        self.timer.stop()
+        self.pending = False
+
+        start = time.perf_counter()
+        self.render_callback()
+        self.last_render_time = time.perf_counter()
+        self.rendered += 1
+        self.dropped += int((self.last_render_time - start) / self.frame_interval)
+
+    def flush(self):
+        if self.pending:
+            self.render_now()
+
+    def cancel(self):
+        self.timer.stop()
+        self.pending = False
+
+    def stats(self):
+        return {
+            'requested': self.requested,
+            'rendered': self.rendered,
+            'coalesced': self.coalesced,
+            'dropped': self.dropped,
+        }
@@ -0,0 +1,61 @@
+import time
+
+
+class SlicePrefetcher:
+    """
+    Warms the slices ahead of a scroll. The interactor reports every slice request; the scroll
+    speed (slices per second, smoothed) decides how far ahead to warm, and a direction reversal
+    cancels queued work that is now behind the user.
+
+    Warming is done by the slice source through prefetch(indices) / cancel_prefetch(keep) /
+    is_cached(index) (see utils.LazySliceVolume); fully materialized volumes need no warming.
+    """
+
+    def __init__(self, slice_source, min_ahead=4, max_ahead=32, lookahead_seconds=0.25, smoothing=0.5):
+        self.slice_source = slice_source
+        self.min_ahead = min_ahead
+        self.max_ahead = max_ahead
+        self.lookahead_seconds = lookahead_seconds
+        self.smoothing = smoothing
+
+        self.last_index = None
+        self.last_time = None
+        self.velocity = 0.0  # slices per second, signed
+        self.direction = 0
+        self.hits = 0
+        self.misses = 0
+
+    def on_slice_request(self, slice_index, timestamp=None):
+        """Call before slice_index is displayed; records a hit/miss and schedules the next slices."""
+        timestamp = time.perf_counter() if timestamp is None else timestamp
+        if self.slice_source.is_cached(slice_index):
+            self.hits += 1
+        else:
+            self.misses += 1
+
+        if self.last_index is not None and slice_index != self.last_index:
+            elapsed = max(timestamp - self.last_time, 1e-3)
+            instant_velocity = (slice_index - self.last_index) / elapsed
+            self.velocity = self.smoothing * self.velocity + (1.0 - self.smoothing) * instant_velocity
+
+            direction = 1 if slice_index > self.last_index else -1
+            if direction != self.direction:
+                self.velocity = instant_velocity  # don't let the old direction damp the new one
+                self.slice_source.cancel_prefetch(keep=())  # queued slices are behind the user now
+            self.direction = direction
+
+        self.last_index = slice_index
+        self.last_time = timestamp
+        if self.direction == 0:
+            return
+
+        ahead = int(min(self.max_ahead, self.min_ahead + abs(self.velocity) * self.lookahead_seconds))
+        self.slice_source.prefetch(slice_index + self.direction * step for step in range(1, ahead + 1))
+
+    def hit_rate(self):
+        requests = self.hits + self.misses
+        return self.hits / requests if requests else 0.0
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
@@ -1,5 +1,17 @@
 import enum
+import logging
 import vtkmodules.all as vtk
+from viewers.slice_prefetcher import SlicePrefetcher
+from viewers.render_scheduler import RenderScheduler
+from viewers.window_level_lut import WindowLevelLUT
+from viewers.filter_preview import FilterPreview
+from viewers.annotation_registry import AnnotationRegistry
+from interactors.segmentation.label_store import LabelStore
+from interactors.segmentation.edit_history import EditHistory
+from viewers.label_overlay import LabelOverlay
+
+
+logger = logging.getLogger(__name__)
 
 
 class ViewerType(enum.Enum):
@@ -8,22 +20,51 @@ class ViewerType(enum.Enum):
     CORONAL = "Coronal"
 
 
+# display plane -> index of the volume axis the slices are taken along
+SLICE_AXES = {
+    ViewerType.AXIAL.value: 2,
+    ViewerType.SAGITTAL.value: 0,
+    ViewerType.CORONAL.value: 1,
+}
+
+# fired by ImageViewer2D.set_slice, so linked views (e.g. the MPR page) can follow
+SliceChangedEvent = vtk.vtkCommand.UserEvent + 1
+
+
+# labels from utils.determine_orientation name the side an axis starts from ('R' = index runs R -> L).
+# Screen x should run R -> L (radiological), A -> P or S -> I; screen y (upwards) should run P -> A or I -> S.
+FLIP_X_LABELS = ('L', 'P', 'I')
+FLIP_Y_LABELS = ('A', 'S', 'R')
+
+
 class ImageReslice(vtk.vtkImageReslice):  # for set orientation and return image as 2D or 3D
+    """
+    Maps the volume into display orientation by in-plane flips. The reslice is only connected to
+    the viewer pipeline, never updated as a whole: the image actor requests its display extent,
+    so only the visible slice is resliced, on demand, and no second volume is allocated.
+    The slice axis is never flipped so slice indices keep matching the series.
+    """
+
     def __init__(self, vtk_image_data: vtk.vtkImageData, metadata):
         super().__init__()
         self.vtk_image_data = vtk_image_data
         self.metadata = metadata
+        self.axis_signs = (1, 1, 1)
         self.SetInputData(self.vtk_image_data)
         self.SetOutputDimensionality(3)  # output is 3d image
-        self.SetResliceAxesDirectionCosines(1, 0, 0, 0, -1, 0, 0, 0, 1)  # Roll 180 degrees (RAI)
 
         self.apply_orientation()
-        self.Update()
 
     def apply_orientation(self):
-        orientation = self.metadata['orientation']
-        print('orientation:', orientation)
-        pass
+        orientation = self.metadata.get('orientation') or 'RAI'
+        if len(orientation) != 3:
+            orientation = 'RAI'
+        logger.debug('orientation: %s', orientation)
+
+        x_sign = -1 if orientation[0] in FLIP_X_LABELS else 1
+        y_sign = -1 if orientation[1] in FLIP_Y_LABELS else 1
+        self.axis_signs = (x_sign, y_sign, 1)
+        self.SetResliceAxesDirectionCosines(x_sign, 0, 0, 0, y_sign, 0, 0, 0, 1)  # 'RAI' -> roll 180 degrees
 
 
 class ImageViewer2D(vtk.vtkResliceImageViewer):
@@ -39,15 +80,37 @@ class ImageViewer2D(vtk.vtkResliceImageViewer):
         self.image_interactor: vtk.vtkRenderWindowInteractor = interactor
 
         self.renderer: vtk.vtkRenderer = self.GetRenderer()
+        self.render_scheduler = RenderScheduler(self.Render)  # at most one render per frame
         self.vtk_image_data = vtk_image_data
         self.metadata = metadata
+        # utils.LazySliceVolume when slices are decoded on demand; vtk_image_data is then its slice_image
+        self.lazy_volume = metadata.get('lazy_volume')
+        self.prefetcher = self.create_prefetcher()
+        self.current_slice = 0
+        self.window_centers, self.window_widths = self.load_default_window_levels()
+        self.window_level_lut = None  # table-lookup window/level for integer images up to 16 bits
+        self.label_store = None  # segmentation labels shared by the tools, see get_label_store
+        self.label_overlay = None  # draws label_store
+        self.edit_history = None  # undo / redo of label_store edits
+        self.annotations = AnnotationRegistry()  # measurement / contour widgets by slice
+        self.overlay_renderer = None  # layer above the image for label overlays, see get_overlay_renderer
+        self.label_overlays = []
 
         self.SetRenderWindow(self.image_render_window)
         self.SetupInteractor(self.image_interactor)
         self.renderer.SetBackground(0, 0, 0)
 
         self.image_reslice = ImageReslice(vtk_image_data, metadata)
-        self.SetInputData(self.image_reslice.GetOutput())  # without color map (window level)
+        self.connect_input(self.image_reslice.GetOutputPort())  # without color map (window level)
+
+        # placeholder text for slices that a progressive load has not decoded yet
+        self.loading_annotation = vtk.vtkCornerAnnotation()
+        self.loading_annotation.SetText(vtk.vtkCornerAnnotation.UpperRight, "Loading slice...")
+        self.loading_annotation.GetTextProperty().SetColor(1.0, 0.55, 0.0)
+        self.loading_annotation.VisibilityOff()
+        self.renderer.AddViewProp(self.loading_annotation)
+
+        self.filter_preview = FilterPreview(self)  # filter applied to the displayed slice only
 
         # self.apply_window_level()
         self.UpdateDisplayExtent()
@@ -60,15 +123,98 @@ class ImageViewer2D(vtk.vtkResliceImageViewer):
         CORONAL = "Coronal"
         '''
 
+    def connect_input(self, output_port):
+        """
+        Connect the pipeline instead of handing over a static output copy, so changes to
+        vtk_image_data reach the display. vtkResliceImageViewer only accepts SetInputData
+        (its reslice cursor is unused in axis-aligned mode), hence the vtkImageViewer2 call.
+        Integer images up to 16 bits go through a WindowLevelLUT first.
+        """
+        window_level = self.get_window_level()
+        scalar_type = self.vtk_image_data.GetScalarType()
+        if WindowLevelLUT.supports(scalar_type):
+            self.window_level_lut = WindowLevelLUT(scalar_type)
+            self.window_level_lut.set_input_connection(output_port)
+            self.window_level_lut.set_window_level(*window_level)
+            vtk.vtkImageViewer2.SetInputConnection(self, self.window_level_lut.get_output_port())
+            # the viewer's own window/level filter only passes the mapped grey values through
+            self.SetColorWindow(255.0)
+            self.SetColorLevel(127.5)
+        else:
+            self.window_level_lut = None
+            vtk.vtkImageViewer2.SetInputConnection(self, output_port)
+            self.SetColorWindow(window_level[0])
+            self.SetColorLevel(window_level[1])
+
     def set_slice(self, slice_index):
-        if not self.flag_set_custom_window_level:
+        if not self.flag_set_custom_window_level and self.slice_axis() == 2:
             # if user doesn't work with right click for change window width/center
+            # (the DICOM window levels belong to axial slices)
             self.apply_default_window_level(slice_index)
 
-        self.SetSlice(slice_index)
-        self.Render()
+        self.current_slice = slice_index
+        if self.lazy_volume is not None:
+            self.lazy_volume.show_slice(slice_index)  # the displayed image always has a single slice
+        else:
+            self.SetSlice(slice_index)
+        self.update_loading_annotation()
+        self.annotations.show(self.slice_axis(), slice_index)
+        self.update_label_overlays()
+        self.filter_preview.refresh()
+        self.request_render()
+        self.InvokeEvent(SliceChangedEvent)
+
+    def request_render(self):
+        """Schedule a render; requests within one frame are coalesced (see RenderScheduler)."""
+        self.render_scheduler.request_render()
+
+    def create_prefetcher(self):
+        """Scroll-driven read-ahead for lazily decoded volumes; it replaces the volume's fixed read-ahead."""
+        if self.lazy_volume is None:
+            return None
+        self.lazy_volume.read_ahead = 0
+        return SlicePrefetcher(self.lazy_volume)
+
+    def get_slice(self):
+        """Index of the displayed slice in the series (GetSlice is always 0 for lazy volumes)."""
+        if self.lazy_volume is not None:
+            return self.current_slice
+        return self.GetSlice()
+
+    def volume_slice_index(self, slice_index=None):
+        """Index along slice_axis() in the volume of a displayed slice (the reslice may flip the axis)."""
+        slice_index = self.get_slice() if slice_index is None else slice_index
+        axis = self.slice_axis()
+        if self.image_reslice.axis_signs[axis] < 0:
+            return self.volume_dimensions()[axis] - 1 - slice_index
+        return slice_index
+
+    def slice_axis(self):
+        """Volume axis the displayed slices are taken along (2 for axial, 0 sagittal, 1 coronal)."""
+        return SLICE_AXES.get(self.viewer_type, 2)
+
+    def is_slice_loaded(self, slice_index):
+        loaded_slices = self.metadata.get('loaded_slices')
+        if loaded_slices is None:
+            return True
+        if self.slice_axis() != 2:  # a sagittal/coronal slice crosses every axial slice
+            return all(loaded_slices)
+        return loaded_slices[slice_index]
+
+    def mark_slice_loaded(self, slice_index):
+        """Called while a progressive load fills vtk_image_data; re-renders if the slice is on screen."""
+        self.vtk_image_data.GetPointData().GetScalars().Modified()
+        if self.slice_axis() != 2 or slice_index == self.get_slice():
+            self.update_loading_annotation()
+            self.request_render()
+
+    def update_loading_annotation(self):
+        self.loading_annotation.SetVisibility(not self.is_slice_loaded(self.get_slice()))
 
     def set_viewer_type(self, viewer_type):
+        if self.lazy_volume is not None and viewer_type != ViewerType.AXIAL.name.capitalize():
+            print(f"{viewer_type} view needs the full volume; lazily loaded series are axial only.")
+            return
         self.viewer_type = viewer_type
 
         if viewer_type == ViewerType.AXIAL.name.capitalize():
@@ -77,28 +223,53 @@ class ImageViewer2D(vtk.vtkResliceImageViewer):
             self.SetSliceOrientationToYZ()
         elif viewer_type == ViewerType.CORONAL.name.capitalize():
             self.SetSliceOrientationToXZ()
-        self.Render()
+        self.annotations.show(self.slice_axis(), self.get_slice())
+        self.update_label_overlays()
+        self.filter_preview.refresh()  # stops it off the axial plane
+        self.request_render()
+
+    def load_default_window_levels(self):
+        """
+        Per-slice DICOM window center/width as plain lists, so the lookup on every slice change
+        is a list index (no NumPy scalar is created). NaN where the series has no window level.
+        """
+        windows_levels = self.metadata.get('windows_levels')
+        if windows_levels is None:
+            return [], []
+        return windows_levels['window_center'].tolist(), windows_levels['window_width'].tolist()
 
     def apply_default_window_level(self, slice_index):
-        # get window width and window center from lst_windows_levels
-        # belongs to the slice[index]
-
-        window_level = self.metadata['windows_levels'][slice_index]
-        window_width = window_level['window_width']  # width
-        window_center = window_level['window_center']  # level
-
-        print(f'slice: {slice_index}\t width: {window_width}\t center: {window_center}')
-        self.set_window_level(window_width, window_center, flag_default=True)
+        # window width and window center of metadata['windows_levels'] that belong to the slice[index]
+        if slice_index < len(self.window_centers):
+            window_center = self.window_centers[slice_index]  # level
+            window_width = self.window_widths[slice_index]  # width
+            if window_center == window_center:  # not NaN
+                logger.debug('slice: %d\t width: %s\t center: %s', slice_index, window_width, window_center)
+                self.set_window_level(window_width, window_center, flag_default=True)
+                return
+
+        # no window level in the series (or NIfTI): percentiles of the volume histogram
+        histogram = self.metadata.get('histogram')
+        auto_window_level = histogram.auto_window_level() if histogram is not None else None
+        if auto_window_level is not None:
+            window_center, window_width = auto_window_level
+            self.set_window_level(window_width, window_center)
 
     def set_window_level(self, window_width, window_center, flag_default=False):
-        self.SetColorWindow(window_width)
-
         if flag_default is True:
-            self.SetColorLevel(window_center / 2.0)
+            window_center = window_center / 2.0
+
+        if self.window_level_lut is not None:
+            self.window_level_lut.set_window_level(window_width, window_center)
         else:
+            self.SetColorWindow(window_width)
             self.SetColorLevel(window_center)
+        if self.filter_preview.is_active() and self.filter_preview.same_intensities:
+            self.filter_preview.set_window_level(window_width, window_center)
 
     def get_window_level(self):
+        if self.window_level_lut is not None:
+            return self.window_level_lut.window, self.window_level_lut.level
         window_width = self.GetColorWindow()
         window_center = self.GetColorLevel()
         # print('window_center:', window_center)
@@ -106,17 +277,101 @@ class ImageViewer2D(vtk.vtkResliceImageViewer):
         return window_width, window_center
 
     def get_count_of_slices(self):
+        if self.lazy_volume is not None:
+            return self.lazy_volume.count
         self.vtk_image_data: vtk.vtkImageData
         dims = self.vtk_image_data.GetDimensions()  # (dimX, dimY, dimZ)
-        return dims[2]
+        return dims[self.slice_axis()]
+
+    def volume_dimensions(self):
+        """(dimX, dimY, dimZ) of the series, also for lazily decoded volumes."""
+        dims = self.vtk_image_data.GetDimensions()
+        if self.lazy_volume is not None:
+            return dims[0], dims[1], self.lazy_volume.count
+        return dims
+
+    def get_label_store(self):
+        """Run-length encoded segmentation labels of the series (see LabelStore), created on first use."""
+        if self.label_store is None:
+            self.label_store = LabelStore(self.volume_dimensions()[::-1])
+            self.edit_history = EditHistory(self.label_store)
+            self.label_overlay = LabelOverlay(self, self.label_store)
+            self.add_label_overlay(self.label_overlay)
+        return self.label_store
+
+    def undo_label_edit(self):
+        """Undo the latest label edit; returns its description or None."""
+        description = self.edit_history.undo() if self.edit_history is not None else None
+        self.update_label_overlays()
+        return description
+
+    def redo_label_edit(self):
+        description = self.edit_history.redo() if self.edit_history is not None else None
+        self.update_label_overlays()
+        return description
+
+    def get_label_volume(self):
+        """Dense (z, y, x) label volume (0 = background), uint8 or uint16 by the highest label ID."""
+        return self.get_label_store().to_dense()
+
+    def get_overlay_renderer(self):
+        """Renderer on a second layer of the render window, drawn over the image with the same camera."""
+        if self.overlay_renderer is None:
+            self.overlay_renderer = vtk.vtkRenderer()
+            self.overlay_renderer.SetLayer(1)
+            self.overlay_renderer.SetActiveCamera(self.renderer.GetActiveCamera())
+            self.overlay_renderer.InteractiveOff()
+            self.image_render_window.SetNumberOfLayers(max(self.image_render_window.GetNumberOfLayers(), 2))
+            self.image_render_window.AddRenderer(self.overlay_renderer)
+        return self.overlay_renderer
+
+    def add_label_overlay(self, label_overlay):
+        self.label_overlays.append(label_overlay)
+        label_overlay.update()
+
+    def remove_label_overlay(self, label_overlay):
+        if label_overlay in self.label_overlays:
+            self.label_overlays.remove(label_overlay)
+            label_overlay.remove()
+
+    def update_label_overlays(self):
+        for label_overlay in self.label_overlays:
+            label_overlay.update()
+
+    def output_geometry(self):
+        """(origin, spacing) of the resliced image, i.e. of the world space the slices are drawn in."""
+        self.image_reslice.UpdateInformation()
+        info = self.image_reslice.GetOutputInformation(0)
+        return info.Get(vtk.vtkDataObject.ORIGIN()), info.Get(vtk.vtkDataObject.SPACING())
+
+    def is_same_series(self, vtk_image_data, metadata):
+        """True for another version of the displayed series on the same voxel grid (e.g. filtered)."""
+        def original(image_data, image_metadata):
+            return (image_metadata.get('source') or (image_data,))[0]
+        return (original(vtk_image_data, metadata) is original(self.vtk_image_data, self.metadata)
+                and vtk_image_data.GetDimensions() == self.vtk_image_data.GetDimensions())
 
     def reset_image_viewer(self, vtk_image_data, metadata):
+        self.filter_preview.stop()
+        if not self.is_same_series(vtk_image_data, metadata):  # annotations and labels belong to the series
+            self.annotations.clear()
+            self.label_store = None
+            self.label_overlay = None
+            self.edit_history = None
+            for label_overlay in list(self.label_overlays):
+                self.remove_label_overlay(label_overlay)
+        self.vtk_image_data = vtk_image_data
+        self.metadata = metadata
+        self.window_centers, self.window_widths = self.load_default_window_levels()
+        self.lazy_volume = metadata.get('lazy_volume')
+        self.prefetcher = self.create_prefetcher()
         del self.image_reslice
         self.image_reslice = ImageReslice(vtk_image_data, metadata)
-        self.SetInputData(self.image_reslice.GetOutput())
+        self.connect_input(self.image_reslice.GetOutputPort())
         self.flag_set_custom_window_level = False
 
         self.UpdateDisplayExtent()
+        self.update_loading_annotation()
         self.Render()
         self.zoom_to_fit()
 
@@ -129,15 +384,14 @@ class ImageViewer2D(vtk.vtkResliceImageViewer):
             camera.ParallelProjectionOn()
 
             dims = self.vtk_image_data.GetDimensions()
-            image_width, image_height = dims[0], dims[1]
+            spacing = self.vtk_image_data.GetSpacing()
+            axis_u, axis_v = [axis for axis in range(3) if axis != self.slice_axis()]  # in-plane axes
 
             window_size = self.image_render_window.GetSize()
             window_width, window_height = window_size[0], window_size[1]
 
-            spacing = self.vtk_image_data.GetSpacing()
-
-            physical_width = image_width * spacing[0]
-            physical_height = image_height * spacing[1]
+            physical_width = dims[axis_u] * spacing[axis_u]
+            physical_height = dims[axis_v] * spacing[axis_v]
 
             image_aspect = physical_width / physical_height
             window_aspect = window_width / window_height
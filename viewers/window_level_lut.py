@@ -0,0 +1,68 @@
+import numpy as np
+import vtkmodules.all as vtk
+from vtkmodules.util import numpy_support
+
+
+# scalar type -> (first value, number of values) covered by the table
+LUT_SCALAR_RANGES = {
+    vtk.VTK_CHAR: (-128, 256),
+    vtk.VTK_SIGNED_CHAR: (-128, 256),
+    vtk.VTK_UNSIGNED_CHAR: (0, 256),
+    vtk.VTK_SHORT: (-32768, 65536),
+    vtk.VTK_UNSIGNED_SHORT: (0, 65536),
+}
+
+
+class WindowLevelLUT:
+    """
+    Window/level for integer images of up to 16 bits as a table lookup: one grey value per
+    possible pixel value, mapped by vtkImageMapToColors. A W/L change only rewrites the table
+    (65536 entries, vectorized) instead of re-scaling pixels in floating point, and since the
+    filter sits in the streaming pipeline only the visible slice is mapped.
+    Output is unsigned char luminance, which vtkImageViewer2's own window/level filter passes
+    through unchanged at window 255 / level 127.5.
+    """
+
+    def __init__(self, scalar_type):
+        first_value, value_count = LUT_SCALAR_RANGES[scalar_type]
+        self.values = np.arange(first_value, first_value + value_count, dtype=np.float32)
+        self.window = 1.0
+        self.level = 0.5
+
+        self.lookup_table = vtk.vtkLookupTable()
+        self.lookup_table.SetNumberOfTableValues(value_count)
+        self.lookup_table.SetTableRange(first_value, first_value + value_count)  # one entry per value
+        self.lookup_table.Build()
+        self.table = numpy_support.vtk_to_numpy(self.lookup_table.GetTable())  # (value_count, 4) view
+        self.table[:, 3] = 255
+
+        self.map_to_colors = vtk.vtkImageMapToColors()
+        self.map_to_colors.SetLookupTable(self.lookup_table)
+        self.map_to_colors.SetOutputFormatToLuminance()
+
+    @staticmethod
+    def supports(scalar_type):
+        return scalar_type in LUT_SCALAR_RANGES
+
+    def set_input_connection(self, output_port):
+        self.map_to_colors.SetInputConnection(output_port)
+
+    def get_output_port(self):
+        return self.map_to_colors.GetOutputPort()
+
+    def set_window_level(self, window, level):
+        """
+        Same mapping as vtkImageMapToWindowLevelColors (level - window / 2 -> 0, level + window / 2 -> 255),
+        up to rounding of the pixel values right at the window edges.
+        """
+        self.window, self.level = window, level
+        window = window if abs(window) > 1e-6 else 1e-6
+        grey = (self.values - (level - window / 2.0)) * (255.0 / window)
+        np.clip(grey, 0, 255, out=grey)
+        self.table[:, 0] = grey
+        self.table[:, 1] = self.table[:, 0]
+        self.table[:, 2] = self.table[:, 0]
+
+        # SetTableValue marks the table as user-provided, so Build() won't regenerate it
+        self.lookup_table.SetTableValue(0, *(self.table[0] / 255.0))
+        self.lookup_table.GetTable().Modified()